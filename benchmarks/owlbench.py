@@ -0,0 +1,261 @@
+"""
+
+Owl/benchmarks/owlbench
+---
+
+A retirement planner using linear programming optimization.
+
+Performance benchmarks run over the cases in the examples directory:
+latency of single solves, time to build the constraints, iterations of
+the self-consistent loop, throughput of Monte Carlo simulations and of
+historical ranges, and cost of shipping a plan to worker processes.
+Each benchmark returns a dictionary that can be saved as JSON,
+so that runs can be compared across commits.
+
+Copyright &copy; 2024 - Martin-D. Lacasse
+
+Disclaimers: This code is for educational purposes only and does not constitute financial advice.
+
+"""
+
+import glob
+import io
+import os
+import pickle
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from importlib.metadata import PackageNotFoundError, version
+
+import numpy as np
+
+import owlplanner as owl
+from owlplanner.planspec import PlanSpec
+
+
+exdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "examples")
+
+defaultSolvers = ("HiGHS", "HiGHS-native", "PuLP/CBC")
+
+
+class SilentProgress(object):
+    """
+    Progress indicator that does not print anything.
+    """
+
+    def start(self):
+        pass
+
+    def show(self, x):
+        pass
+
+    def finish(self):
+        pass
+
+
+def caseNames():
+    """
+    Return names of all cases in the examples directory.
+    """
+    return sorted(os.path.basename(file)[:-5] for file in glob.glob(os.path.join(exdir, "case_*.toml")))
+
+
+def loadCase(name):
+    """
+    Return plan read from case ``name``, silenced and without the solution cache.
+    Cases referring to a contributions file that cannot be found are read without contributions.
+    """
+    file = os.path.join(exdir, name)
+    try:
+        plan = owl.readConfig(file, verbose=False, logstreams=[io.StringIO()])
+    except FileNotFoundError:
+        plan = owl.readConfig(file, verbose=False, logstreams=[io.StringIO()], readContributions=False)
+    plan.setSolutionCache(False)
+
+    return plan
+
+
+def freshCopy(plan):
+    """
+    Return an unsolved and silent copy of ``plan``.
+    """
+    return owl.clone(plan, verbose=False, logstreams=[io.StringIO()])
+
+
+def _timeit(func, repeat):
+    """
+    Call ``func`` ``repeat`` times and return min and median of wall times in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+
+    return {"repeat": repeat, "min": min(times), "median": statistics.median(times)}
+
+
+def _buildTime(stats):
+    """
+    Return time spent building constraints, from the statistics of solves.
+    """
+    return sum(value for name, value in stats["timings"].items()
+               if name.startswith(("_add_", "_configure_")) or name in ("adjustParameters", "objective"))
+
+
+def benchSolve(name, solver, repeat=3):
+    """
+    Latency of solving case ``name`` from scratch with ``solver``.
+    """
+    base = loadCase(name)
+    options = dict(base.solverOptions, solver=solver)
+    plans = []
+
+    def run():
+        plan = freshCopy(base)
+        plan.solve(base.objective, options)
+        plans.append(plan)
+
+    result = {"benchmark": "solve", "case": name, "solver": solver, **_timeit(run, repeat)}
+    plan = plans[-1]
+    stats = plan.solveStats
+    result.update(status=plan.caseStatus, iterations=plan.scIterations, buildTime=_buildTime(stats),
+                  solverTime=stats["timings"].get("solver", 0.0), phases=stats["timings"],
+                  counters=stats["counters"])
+
+    return result
+
+
+def peakMemory(func):
+    """
+    Call ``func`` once and return peak memory allocated by Python during the call, in bytes.
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchBuild(name, repeat=10):
+    """
+    Time and peak memory to build all constraints of case ``name``, independently of the solver,
+    and to export the constraint matrix in the sparse form given to the solvers.
+    """
+    plan = loadCase(name)
+    options = dict(plan.solverOptions)
+    plan._setupSolve(plan.objective, options)
+    plan._computeNLstuff(None, options.get("withMedicare", "loop") == "loop")
+
+    def build():
+        plan._buildConstraints(plan.objective, options)
+
+    result = {"benchmark": "build", "case": name, **_timeit(build, repeat)}
+    exports = _timeit(plan.A.sparse, repeat)
+    result.update(rows=int(plan.A.ncons), nonzeros=int(plan.A.nnz), variables=int(plan.nvars),
+                  binaries=int(plan.nbins), peakMemory=peakMemory(build), exportTime=exports["median"],
+                  exportPeakMemory=peakMemory(plan.A.sparse))
+
+    return result
+
+
+def benchMC(name, solver, N, seed=1234, workers=None):
+    """
+    Throughput of ``N`` Monte Carlo scenarios of case ``name`` with histochastic rates.
+    """
+    plan = loadCase(name)
+    plan.setRates("histochastic", 1928, 2024, seed=seed)
+    options = dict(plan.solverOptions, solver=solver)
+
+    t0 = time.perf_counter()
+    plan.runMC(plan.objective, options, N, progcall=SilentProgress(), workers=workers)
+    elapsed = time.perf_counter() - t0
+
+    res = plan.scenarioResults
+    stats = plan.solveStats
+
+    return {"benchmark": "mc", "case": name, "solver": solver, "N": N, "workers": workers or 1,
+            "time": elapsed, "scenariosPerSecond": N / elapsed, "successRate": res.successRate(),
+            "meanIterations": float(np.mean(res.iterations)), "phases": stats["timings"],
+            "counters": stats["counters"]}
+
+
+def benchHistorical(name, solver, frm=1928, to=None, workers=None):
+    """
+    Throughput of a historical range of case ``name`` starting from ``frm`` to ``to``, inclusively.
+    """
+    plan = loadCase(name)
+    options = dict(plan.solverOptions, solver=solver)
+    if to is None:
+        to = plan.year_n[0] - plan.N_n - 1
+
+    t0 = time.perf_counter()
+    N, df = plan.runHistoricalRange(plan.objective, options, frm, to, progcall=SilentProgress(), workers=workers)
+    elapsed = time.perf_counter() - t0
+
+    res = plan.scenarioResults
+    stats = plan.solveStats
+
+    return {"benchmark": "historical", "case": name, "solver": solver, "N": N, "workers": workers or 1,
+            "time": elapsed, "scenariosPerSecond": N / elapsed, "successRate": res.successRate(),
+            "meanIterations": float(np.mean(res.iterations)), "phases": stats["timings"],
+            "counters": stats["counters"]}
+
+
+def benchSpec(name, repeat=200):
+    """
+    Cost of shipping case ``name`` to a worker: pickling a PlanSpec, and rebuilding a plan from it.
+    """
+    plan = loadCase(name)
+    data = pickle.dumps(PlanSpec.fromPlan(plan))
+
+    result = {"benchmark": "spec", "case": name, "bytes": len(data)}
+    dumps = _timeit(lambda: pickle.dumps(PlanSpec.fromPlan(plan)), repeat)
+    loads = _timeit(lambda: pickle.loads(data).toPlan(), repeat)
+    result.update(repeat=repeat, dumpTime=dumps["median"], loadTime=loads["median"])
+
+    return result
+
+
+def environment():
+    """
+    Return description of the environment the benchmarks are run in.
+    """
+    env = {"owlplanner": owl.__version__, "python": platform.python_version(),
+           "platform": platform.platform(), "processor": platform.processor(),
+           "cpus": os.cpu_count(), "numpy": np.__version__, "date": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+    for module in ("scipy", "highspy", "pulp"):
+        try:
+            env[module] = version(module)
+        except PackageNotFoundError:
+            env[module] = None
+
+    try:
+        env["commit"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=exdir, capture_output=True,
+                                       text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        env["commit"] = None
+
+    return env
+
+
+def resultKey(result):
+    """
+    Return key identifying the same benchmark in different runs.
+    """
+    return tuple(str(result.get(field)) for field in ("benchmark", "case", "solver", "N", "workers"))
+
+
+def resultTime(result):
+    """
+    Return main time measured by a benchmark, in seconds.
+    """
+    for field in ("median", "time", "loadTime"):
+        if field in result:
+            return result[field]
+
+    return None
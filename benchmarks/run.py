@@ -0,0 +1,136 @@
+"""
+
+Owl/benchmarks/run
+---
+
+A retirement planner using linear programming optimization.
+
+Standalone runner of the benchmarks defined in owlbench.
+Results are printed and saved as JSON. A previous JSON file
+can be given for comparing timings with those of another commit.
+
+Usage:
+    python benchmarks/run.py -o bench.json
+    python benchmarks/run.py --quick --compare bench.json
+
+Copyright &copy; 2024 - Martin-D. Lacasse
+
+Disclaimers: This code is for educational purposes only and does not constitute financial advice.
+
+"""
+
+import argparse
+import json
+import sys
+
+import owlbench
+
+
+def _summary(result):
+    if "error" in result:
+        return f"ERROR: {result['error']}"
+    if result["benchmark"] == "solve":
+        return (f"median {result['median']:.3f}s, build {result['buildTime']:.3f}s,"
+                f" solver {result['solverTime']:.3f}s, {result['iterations']} iterations, {result['status']}")
+    if result["benchmark"] == "build":
+        return (f"median {result['median'] * 1000:.2f}ms, peak {result['peakMemory'] / 1e6:.2f}MB,"
+                f" export {result['exportTime'] * 1000:.2f}ms, peak {result['exportPeakMemory'] / 1e6:.2f}MB,"
+                f" {result['rows']} rows, {result['nonzeros']} nonzeros")
+    if result["benchmark"] in ("mc", "historical"):
+        return (f"{result['N']} scenarios in {result['time']:.2f}s, {result['scenariosPerSecond']:.2f}/s,"
+                f" {result['meanIterations']:.2f} iterations, success {100 * result['successRate']:.1f}%")
+    if result["benchmark"] == "spec":
+        return (f"{result['bytes']} bytes, dump {result['dumpTime'] * 1e6:.0f}us,"
+                f" rebuild {result['loadTime'] * 1e6:.0f}us")
+
+    return ""
+
+
+def _run(results, func, *args, **kwargs):
+    label = " ".join(str(arg) for arg in (func.__name__,) + args)
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        result = {"benchmark": func.__name__.replace("bench", "").lower(), "case": args[0],
+                  "solver": args[1] if len(args) > 1 else None, "error": f"{type(e).__name__}: {e}"}
+    results.append(result)
+    print(f"{label:>50s}: {_summary(result)}", flush=True)
+
+
+def compare(results, basefile):
+    """
+    Print ratios of times of ``results`` to those found in JSON file ``basefile``.
+    """
+    with open(basefile, "r") as f:
+        base = json.load(f)
+    baseTimes = {owlbench.resultKey(r): owlbench.resultTime(r) for r in base["results"] if "error" not in r}
+
+    print(f"\nComparison with {basefile} ({base['environment'].get('commit')}):")
+    for result in results:
+        key = owlbench.resultKey(result)
+        old = baseTimes.get(key)
+        new = owlbench.resultTime(result)
+        if old and new:
+            label = " ".join(k for k in key if k != "None")
+            print(f"{label:>50s}: {old:9.4f}s -> {new:9.4f}s ({new / old:.2f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Owl performance benchmarks.")
+    parser.add_argument("-o", "--output", help="JSON file where results are saved")
+    parser.add_argument("--compare", help="JSON file of a previous run to compare with")
+    parser.add_argument("--cases", nargs="+", default=None, help="cases to solve (default: all examples)")
+    parser.add_argument("--solvers", nargs="+", default=list(owlbench.defaultSolvers), help="solvers to use")
+    parser.add_argument("--only", nargs="+", choices=["solve", "build", "mc", "historical", "spec"],
+                        default=["solve", "build", "mc", "historical", "spec"], help="benchmarks to run")
+    parser.add_argument("--repeat", type=int, default=3, help="number of repetitions of single solves")
+    parser.add_argument("--mc", type=int, nargs="+", default=[100, 1000], help="Monte Carlo sizes")
+    parser.add_argument("--scenario-case", default="case_joe", help="case used for Monte Carlo and historical")
+    parser.add_argument("--years", type=int, default=None, help="number of years in historical range")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes for scenarios")
+    parser.add_argument("--quick", action="store_true", help="short run: 1 repetition, 10 scenarios, 5 years")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.repeat = 1
+        args.mc = [10]
+        args.years = args.years or 5
+
+    cases = args.cases or owlbench.caseNames()
+    results = []
+    if "solve" in args.only:
+        for case in cases:
+            for solver in args.solvers:
+                _run(results, owlbench.benchSolve, case, solver, repeat=args.repeat)
+
+    if "build" in args.only:
+        for case in cases:
+            _run(results, owlbench.benchBuild, case)
+
+    if "spec" in args.only:
+        for case in cases:
+            _run(results, owlbench.benchSpec, case)
+
+    for solver in args.solvers:
+        if "mc" in args.only:
+            for N in args.mc:
+                _run(results, owlbench.benchMC, args.scenario_case, solver, N, workers=args.workers)
+        if "historical" in args.only:
+            to = None if args.years is None else 1928 + args.years - 1
+            _run(results, owlbench.benchHistorical, args.scenario_case, solver, 1928, to, workers=args.workers)
+
+    output = {"environment": owlbench.environment(), "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            # Numpy scalars are saved as Python numbers.
+            json.dump(output, f, indent=1, default=lambda value: value.item() if hasattr(value, "item") else str(value))
+        print(f"Results saved to {args.output}.")
+
+    if args.compare:
+        compare(results, args.compare)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
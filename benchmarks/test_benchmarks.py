@@ -0,0 +1,69 @@
+"""
+Benchmarks for pytest-benchmark. These are not part of the regression tests.
+Run them explicitly with:
+    pytest benchmarks/test_benchmarks.py --benchmark-json=bench.json
+"""
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import owlbench  # noqa: E402
+
+
+@pytest.mark.parametrize("solver", owlbench.defaultSolvers)
+@pytest.mark.parametrize("case", owlbench.caseNames())
+def test_solve(benchmark, case, solver):
+    base = owlbench.loadCase(case)
+    options = dict(base.solverOptions, solver=solver)
+
+    def setup():
+        return (owlbench.freshCopy(base),), {}
+
+    def run(plan):
+        plan.solve(base.objective, options)
+        return plan
+
+    plan = benchmark.pedantic(run, setup=setup, rounds=3)
+    assert plan.caseStatus == "solved"
+    benchmark.extra_info.update(iterations=plan.scIterations, counters=plan.solveStats["counters"])
+
+
+@pytest.mark.parametrize("case", owlbench.caseNames())
+def test_build(benchmark, case):
+    plan = owlbench.loadCase(case)
+    options = dict(plan.solverOptions)
+    plan._setupSolve(plan.objective, options)
+    plan._computeNLstuff(None, options.get("withMedicare", "loop") == "loop")
+
+    def build():
+        plan._buildConstraints(plan.objective, options)
+
+    benchmark(build)
+    benchmark.extra_info.update(rows=int(plan.A.ncons), nonzeros=int(plan.A.nnz),
+                                peakMemory=owlbench.peakMemory(build))
+
+
+@pytest.mark.parametrize("solver", ["HiGHS", "PuLP/CBC"])
+@pytest.mark.parametrize("N", [100, 1000])
+def test_mc(benchmark, N, solver):
+    result = benchmark.pedantic(owlbench.benchMC, args=("case_joe", solver, N), rounds=1, iterations=1)
+    benchmark.extra_info.update(scenariosPerSecond=result["scenariosPerSecond"],
+                                meanIterations=result["meanIterations"])
+
+
+@pytest.mark.parametrize("solver", ["HiGHS", "PuLP/CBC"])
+def test_historical(benchmark, solver):
+    result = benchmark.pedantic(owlbench.benchHistorical, args=("case_joe", solver), rounds=1, iterations=1)
+    benchmark.extra_info.update(scenariosPerSecond=result["scenariosPerSecond"],
+                                meanIterations=result["meanIterations"])
+
+
+def test_spec(benchmark):
+    import pickle
+
+    from owlplanner.planspec import PlanSpec
+
+    data = pickle.dumps(PlanSpec.fromPlan(owlbench.loadCase("case_joe")))
+    benchmark(lambda: pickle.loads(data).toPlan())
+    benchmark.extra_info.update(bytes=len(data))
@@ -1,8 +1,9 @@
 from owlplanner.plan import Plan                                              # noqa: F401
 from owlplanner.plan import clone                                             # noqa: F401
+from owlplanner.planspec import PlanSpec                                      # noqa: F401
 from owlplanner.config import readConfig                                      # noqa: F401
 from owlplanner.rates import getRatesDistributions                            # noqa: F401
 from owlplanner.version import __version__                                    # noqa: F401
 
 # Make the package importable as 'owlplanner'
-__all__ = ['Plan', 'clone', 'readConfig', 'getRatesDistributions', '__version__']
+__all__ = ['Plan', 'clone', 'PlanSpec', 'readConfig', 'getRatesDistributions', '__version__']
@@ -9,7 +9,8 @@ See companion document for a complete explanation and description
 of all variables and parameters.
 
 This file contains basic functions to build a constraint matrix and
-objective function line by line. This is used to abstract the
+objective function line by line. The constraint matrix is stored in
+sparse format. This is used to abstract the
 building of the constraint matrix in order to be able to use various
 solvers for comparison.
 
@@ -25,6 +26,31 @@ Disclaimers: This code is for educational purposes only and does not constitute
 import numpy as np
 
 
+def _boundKeys(lb, ub):
+    """
+    Return list of MOSEK-style keys describing the bounds in arrays ``lb`` and ``ub``.
+    """
+    lb = np.asarray(lb)
+    ub = np.asarray(ub)
+    keys = np.select(
+        [lb == ub, (ub == np.inf) & (lb == -np.inf), ub == np.inf, lb == -np.inf],
+        ["fx", "fr", "lo", "up"],
+        "ra",
+    )
+
+    return keys.tolist()
+
+
+class BlockShapeError(RuntimeError):
+    """
+    Raised when rewriting a block changes its structure, which requires rebuilding the problem.
+    """
+
+    def __init__(self, name):
+        super().__init__(f"Structure of block {name} changed while rewriting.")
+        self.block = name
+
+
 class Row(object):
     """
     Solver-neutral API to accomodate Mosek/HiGHS.
@@ -61,19 +87,100 @@ class Row(object):
 class ConstraintMatrix(object):
     """
     Solver-neutral API for expressing constraints.
+    Elements are stored as sparse (row, column, value) triplets
+    in preallocated arrays that grow geometrically as rows are added.
+    Rows can be grouped in named blocks which can later be rewritten
+    in place, as long as their sparsity pattern is unchanged.
     """
 
-    def __init__(self, nvars):
+    def __init__(self, nvars, nnz=None):
         """
         Constructor only requires the number of decision variables.
+        An estimate of the number of non-zero elements can be given for preallocation.
         """
         self.ncons = 0
         self.nvars = nvars
-        self.Aind = []
-        self.Aval = []
-        self.lb = []
-        self.ub = []
+        self.nnz = 0
+        size = 8 * nvars if nnz is None else max(int(nnz), 1)
+        self._irow = np.empty(size, dtype=np.int32)
+        self._icol = np.empty(size, dtype=np.int32)
+        self._val = np.empty(size)
+        rsize = max(nvars, 1)
+        self._lb = np.empty(rsize)
+        self._ub = np.empty(rsize)
         self.key = []
+        self.blocks = {}
+        self._block = None
+        self._patch = None
+
+    def _reserve(self, nrows, nelems):
+        """
+        Make sure storage can accomodate ``nrows`` more rows
+        and ``nelems`` more non-zero elements.
+        """
+        if self.nnz + nelems > len(self._val):
+            size = max(2 * len(self._val), self.nnz + nelems)
+            self._irow = np.resize(self._irow, size)
+            self._icol = np.resize(self._icol, size)
+            self._val = np.resize(self._val, size)
+        if self.ncons + nrows > len(self._lb):
+            size = max(2 * len(self._lb), self.ncons + nrows)
+            self._lb = np.resize(self._lb, size)
+            self._ub = np.resize(self._ub, size)
+
+    def beginBlock(self, name):
+        """
+        Start a named block of rows.
+        """
+        self._block = (name, self.ncons, self.nnz)
+
+    def endBlock(self):
+        """
+        Close the block of rows previously started.
+        """
+        name, r0, k0 = self._block
+        self.blocks[name] = (r0, self.ncons, k0, self.nnz)
+        self._block = None
+
+    def rewind(self, name):
+        """
+        Rewind to the beginning of block ``name`` so that rows added next
+        overwrite the values and bounds of that block in place.
+        Call restore() once all rows of the block have been rewritten.
+        """
+        if name not in self.blocks:
+            raise ValueError(f"Unknown block {name}.")
+        r0, r1, k0, k1 = self.blocks[name]
+        self._patch = (name, self.ncons, self.nnz)
+        self.ncons, self.nnz = r0, k0
+
+    def restore(self):
+        """
+        Return to the end of the matrix after rewriting a block.
+        """
+        name, ncons, nnz = self._patch
+        r0, r1, k0, k1 = self.blocks[name]
+        self._patch = None
+        if (self.ncons, self.nnz) != (r1, k1):
+            self.ncons, self.nnz = ncons, nnz
+            raise BlockShapeError(name)
+        self.ncons, self.nnz = ncons, nnz
+
+    def _checkPatch(self, icol, nrows):
+        """
+        Verify that rows being rewritten keep the sparsity pattern of the block.
+        """
+        name = self._patch[0]
+        r0, r1, k0, k1 = self.blocks[name]
+        end = self.nnz + len(icol)
+        if self.ncons + nrows > r1 or end > k1 or not np.array_equal(self._icol[self.nnz:end], icol):
+            raise BlockShapeError(name)
+
+    def _putKeys(self, keys):
+        if self._patch is None:
+            self.key.extend(keys)
+        else:
+            self.key[self.ncons:self.ncons + len(keys)] = keys
 
     def newRow(self, rowDic=None):
         """
@@ -90,20 +197,27 @@ class ConstraintMatrix(object):
         Add row ``row`` to the constraint matrix with the lower ``lb`` and
         upper bound ``ub`` provided.
         """
-        self.Aind.append(row.ind)
-        self.Aval.append(row.val)
-        self.lb.append(lb)
-        self.ub.append(ub)
+        nelems = len(row.ind)
+        if self._patch is not None:
+            self._checkPatch(row.ind, 1)
+        self._reserve(1, nelems)
+        end = self.nnz + nelems
+        self._irow[self.nnz:end] = self.ncons
+        self._icol[self.nnz:end] = row.ind
+        self._val[self.nnz:end] = row.val
+        self._lb[self.ncons] = lb
+        self._ub[self.ncons] = ub
         if lb == ub:
-            self.key.append("fx")
+            self._putKeys(["fx"])
         elif ub == np.inf and lb == -np.inf:
-            self.key.append("fr")
+            self._putKeys(["fr"])
         elif ub == np.inf:
-            self.key.append("lo")
+            self._putKeys(["lo"])
         elif lb == -np.inf:
-            self.key.append("up")
+            self._putKeys(["up"])
         else:
-            self.key.append("ra")
+            self._putKeys(["ra"])
+        self.nnz = end
         self.ncons += 1
 
     def addNewRow(self, rowDic, lb, ub):
@@ -115,37 +229,98 @@ class ConstraintMatrix(object):
         row = self.newRow(rowDic)
         self.addRow(row, lb, ub)
 
+    def addRows(self, ind, val, lb, ub):
+        """
+        Add a family of rows at once. Arrays ``ind`` and ``val`` have shape
+        (nrows, nelems) and hold the indices and values of the elements of each row.
+        Rows having fewer elements can be padded with an index of -1, in which
+        case the corresponding value is ignored. Bounds ``lb`` and ``ub``
+        can be scalars or arrays of length nrows.
+        """
+        ind = np.asarray(ind)
+        if ind.ndim != 2:
+            raise ValueError(f"Indices must be a 2-D array, not {ind.ndim}-D.")
+        val = np.broadcast_to(np.asarray(val, dtype=float), ind.shape)
+        if np.any(ind < -1) or np.any(ind >= self.nvars):
+            raise ValueError("Index out of range.")
+
+        nrows = ind.shape[0]
+        lb = np.broadcast_to(np.asarray(lb, dtype=float), (nrows,))
+        ub = np.broadcast_to(np.asarray(ub, dtype=float), (nrows,))
+
+        mask = ind >= 0
+        nelems = np.count_nonzero(mask)
+        if self._patch is not None:
+            self._checkPatch(ind[mask], nrows)
+        self._reserve(nrows, nelems)
+        end = self.nnz + nelems
+        irow = np.broadcast_to(np.arange(self.ncons, self.ncons + nrows)[:, None], ind.shape)
+        self._irow[self.nnz:end] = irow[mask]
+        self._icol[self.nnz:end] = ind[mask]
+        self._val[self.nnz:end] = val[mask]
+        self._lb[self.ncons:self.ncons + nrows] = lb
+        self._ub[self.ncons:self.ncons + nrows] = ub
+        self._putKeys(_boundKeys(lb, ub))
+        self.nnz = end
+        self.ncons += nrows
+
     def keys(self):
         """
         Return list of keys for each row used by MOSEK.
         """
         return self.key
 
+    def triplets(self):
+        """
+        Return arrays of row indices, column indices, and values of non-zero
+        elements (COO format), followed by arrays of lower and upper bounds.
+        This is the sparse representation used by MOSEK.
+        """
+        return (self._irow[:self.nnz], self._icol[:self.nnz], self._val[:self.nnz],
+                self._lb[:self.ncons], self._ub[:self.ncons])
+
+    def sparse(self, prune=True):
+        """
+        Return constraint matrix as a sparse CSR array for Scipy/HiGHS,
+        followed by arrays of lower and upper bounds.
+        Duplicate elements on the same row and column are summed.
+        Explicit zeros are removed unless ``prune`` is False, in which case
+        the sparsity pattern only depends on the structure of the rows added.
+        """
+        from scipy import sparse
+
+        irow, icol, val, lb, ub = self.triplets()
+        Alu = sparse.csr_array((val, (irow, icol)), shape=(self.ncons, self.nvars))
+        Alu.sum_duplicates()
+        if prune:
+            Alu.eliminate_zeros()
+
+        return Alu, np.array(lb), np.array(ub)
+
     def lists(self):
         """
-        Return lists of indices and values for MOSEK sparse representation.
+        Return lists of indices and values of each row, and lists of bounds.
         """
-        return self.Aind, self.Aval, self.lb, self.ub
+        Alu, lb, ub = self.sparse()
+        Aind = [Alu.indices[Alu.indptr[ii]:Alu.indptr[ii + 1]].tolist() for ii in range(self.ncons)]
+        Aval = [Alu.data[Alu.indptr[ii]:Alu.indptr[ii + 1]].tolist() for ii in range(self.ncons)]
+
+        return Aind, Aval, lb.tolist(), ub.tolist()
 
     def arrays(self):
         """
-        Return full arrays for Scipy/HiGHS.
+        Return full dense arrays. Prefer sparse() for large problems.
         """
-        Alu = np.zeros((self.ncons, self.nvars))
-        lb = np.array(self.lb)
-        ub = np.array(self.ub)
-        for ii in range(self.ncons):
-            ind = self.Aind[ii]
-            val = self.Aval[ii]
-            for jj in range(len(ind)):
-                Alu[ii, ind[jj]] = val[jj]
+        Alu, lb, ub = self.sparse()
 
-        return Alu, lb, ub
+        return Alu.toarray(), lb, ub
 
 
 class Bounds(object):
     """
     Solver-neutral API for bounds on variables.
+    Bounds set later override those set earlier on the same variable.
+    As for constraints, settings can be grouped in named blocks to be rewritten later.
     """
 
     def __init__(self, nvars, nbins):
@@ -154,59 +329,109 @@ class Bounds(object):
         self.ind = []
         self.lb = []
         self.ub = []
-        self.key = []
-        self.integrality = []
-        for ii in range(nvars-nbins, nvars):
-            self.setBinary(ii)
+        self.blocks = {}
+        self._block = None
+        self._patch = None
+        binaries = np.arange(nvars-nbins, nvars)
+        self.setRanges(binaries, 0, 1)
+        self.integrality = binaries.tolist()
+
+    def beginBlock(self, name):
+        """
+        Start a named block of bounds.
+        """
+        self._block = (name, len(self.ind))
+
+    def endBlock(self):
+        """
+        Close the block of bounds previously started.
+        """
+        name, c0 = self._block
+        self.blocks[name] = (c0, len(self.ind))
+        self._block = None
+
+    def rewind(self, name):
+        """
+        Rewind to the beginning of block ``name`` so that bounds set next
+        replace those of that block. Call restore() when done.
+        """
+        if name not in self.blocks:
+            raise ValueError(f"Unknown block {name}.")
+        self._patch = [name, self.blocks[name][0]]
+
+    def restore(self):
+        """
+        Return to the end of the bounds after rewriting a block.
+        """
+        name, cursor = self._patch
+        self._patch = None
+        if cursor != self.blocks[name][1]:
+            raise BlockShapeError(name)
+
+    def _put(self, ind, lb, ub):
+        if self._patch is None:
+            self.ind.append(ind)
+            self.lb.append(lb)
+            self.ub.append(ub)
+            return
+
+        name, cursor = self._patch
+        if cursor >= self.blocks[name][1] or not np.array_equal(self.ind[cursor], ind):
+            raise BlockShapeError(name)
+        self.lb[cursor] = lb
+        self.ub[cursor] = ub
+        self._patch[1] += 1
 
     def setBinary(self, ii):
         if not (0 <= ii < self.nvars):
             raise ValueError(f"Index {ii} out of range.")
-        self.ind.append(ii)
-        self.lb.append(0)
-        self.ub.append(1)
-        self.key.append("ra")
-        self.integrality.append(ii)
+        if self._patch is None:
+            self.integrality.append(ii)
+        self._put(np.array([ii]), np.zeros(1), np.ones(1))
 
     def setRange(self, ii, lb, ub):
         if not (0 <= ii < self.nvars):
             raise ValueError(f"Index {ii} out of range.")
         if lb > ub:
             raise ValueError(f"Lower bound {lb} > upper bound {ub}.")
-        self.ind.append(ii)
-        self.lb.append(lb)
-        self.ub.append(ub)
-        if lb == ub:
-            self.key.append("fx")
-        elif ub == np.inf and lb == -np.inf:
-            self.key.append("fr")
-        elif ub == np.inf:
-            self.key.append("lo")
-        elif lb == -np.inf:
-            self.key.append("up")
-        else:
-            self.key.append("ra")
+        self._put(np.array([ii]), np.array([lb], dtype=float), np.array([ub], dtype=float))
+
+    def setRanges(self, ind, lb, ub):
+        """
+        Set bounds of all variables in array ``ind`` at once.
+        Bounds ``lb`` and ``ub`` can be scalars or arrays of the same length.
+        """
+        ind = np.asarray(ind)
+        lb = np.broadcast_to(np.asarray(lb, dtype=float), ind.shape).ravel()
+        ub = np.broadcast_to(np.asarray(ub, dtype=float), ind.shape).ravel()
+        ind = ind.ravel()
+        if np.any(ind < 0) or np.any(ind >= self.nvars):
+            raise ValueError("Index out of range.")
+        if np.any(lb > ub):
+            raise ValueError("Lower bound > upper bound.")
+        self._put(ind, lb, ub)
 
     def keys(self):
-        keys = ["lo"] * self.nvars
-        for ii in range(len(self.ind)):
-            keys[self.ind[ii]] = self.key[ii]
+        lb, ub = self.arrays()
 
-        return keys
+        return _boundKeys(lb, ub)
 
     def arrays(self):
         lb = np.zeros(self.nvars)
         ub = np.ones(self.nvars) * np.inf
-        for ii in range(len(self.ind)):
-            lb[self.ind[ii]] = self.lb[ii]
-            ub[self.ind[ii]] = self.ub[ii]
+        if len(self.ind) > 0:
+            ind = np.concatenate(self.ind)
+            # Keep last setting of each variable.
+            _, last = np.unique(ind[::-1], return_index=True)
+            last = len(ind) - 1 - last
+            lb[ind[last]] = np.concatenate(self.lb)[last]
+            ub[ind[last]] = np.concatenate(self.ub)[last]
 
         return lb, ub
 
     def integralityArray(self):
         integrality = np.zeros(self.nvars, dtype=int)
-        for ii in range(len(self.integrality)):
-            integrality[self.integrality[ii]] = 1
+        integrality[self.integrality] = 1
 
         return integrality
 
@@ -74,6 +74,8 @@ def saveConfig(myplan, file, mylog):
     if myplan.rateMethod in ["stochastic"]:
         diconf["Rates Selection"]["Standard deviations"] = (100 * myplan.rateStdev).tolist()
         diconf["Rates Selection"]["Correlations"] = myplan.rateCorr.tolist()
+    if myplan.rateMethod in ["stochastic", "histochastic"] and myplan.rateSeed is not None:
+        diconf["Rates Selection"]["Seed"] = int(myplan.rateSeed)
     if myplan.rateMethod in ["historical average", "historical", "histochastic"]:
         diconf["Rates Selection"]["From"] = int(myplan.rateFrm)
         diconf["Rates Selection"]["To"] = int(myplan.rateTo)
@@ -235,6 +237,7 @@ def readConfig(file, *, verbose=True, logstreams=None, readContributions=True):
     rateValues = None
     stdev = None
     rateCorr = None
+    rateSeed = None
     rateMethod = diconf["Rates Selection"]["Method"]
     if rateMethod in ["historical average", "historical", "histochastic"]:
         frm = diconf["Rates Selection"]["From"]
@@ -248,7 +251,9 @@ def readConfig(file, *, verbose=True, logstreams=None, readContributions=True):
     if rateMethod in ["stochastic"]:
         stdev = np.array(diconf["Rates Selection"]["Standard deviations"], dtype=np.float32)
         rateCorr = np.array(diconf["Rates Selection"]["Correlations"], dtype=np.float32)
-    p.setRates(rateMethod, frm, to, rateValues, stdev, rateCorr)
+    if rateMethod in ["stochastic", "histochastic"]:
+        rateSeed = diconf["Rates Selection"].get("Seed")
+    p.setRates(rateMethod, frm, to, rateValues, stdev, rateCorr, seed=rateSeed)
 
     # Asset Allocation.
     boundsAR = {}
@@ -0,0 +1,131 @@
+"""
+
+Owl/convergence
+---
+
+A retirement planner using linear programming optimization.
+
+Control of the self-consistent loop used for values that cannot be
+expressed linearly: MAGI, Medicare costs, NIIT, and the tax rate on
+capital gains. These values form a fixed point of the sequence of
+optimizations: each solution determines the values used in the next.
+The controller decides when the loop has converged and which values
+are fed to the next iteration, optionally damping the updates or
+accelerating them using Anderson's method.
+
+Copyright &copy; 2024 - Martin-D. Lacasse
+
+Disclaimers: This code is for educational purposes only and does not constitute financial advice.
+
+"""
+
+import numpy as np
+
+
+class ConvergenceController(object):
+    """
+    Default controller of the self-consistent loop.
+    The loop has converged when both the sum of absolute changes in the solution
+    and the change in the scaled objective are below ``tolerance`` (in hundreds of $),
+    or when the objective oscillates within ``oscillation`` times the scale
+    given to start(). It stops at iteration ``maxIterations`` regardless.
+    Updates of the fixed-point values are relaxed by ``damping`` (1 for none)
+    and accelerated using the ``anderson`` most recent iterations (0 for none).
+    Subclasses can override converged() and update().
+    """
+
+    def __init__(self, tolerance=0.5, damping=1.0, anderson=0, maxIterations=60, oscillation=10):
+        if not isinstance(tolerance, (int, float)) or tolerance <= 0:
+            raise ValueError(f"Tolerance {tolerance} must be a positive number.")
+        if not isinstance(damping, (int, float)) or not 0 < damping <= 1:
+            raise ValueError(f"Damping {damping} must be in (0, 1].")
+        if not isinstance(anderson, int) or anderson < 0:
+            raise ValueError(f"Anderson depth {anderson} must be a non-negative integer.")
+        if not isinstance(maxIterations, int) or maxIterations < 1:
+            raise ValueError(f"Maximum number of iterations {maxIterations} must be a positive integer.")
+        self.tolerance = tolerance
+        self.damping = damping
+        self.anderson = anderson
+        self.maxIterations = maxIterations
+        self.oscillation = oscillation
+        self.start(0, 1, 1)
+
+    @classmethod
+    def fromOptions(cls, options):
+        """
+        Return controller configured by options scTolerance, scDamping, scAnderson, and scMaxIterations.
+        """
+        return cls(tolerance=options.get("scTolerance", 0.5), damping=options.get("scDamping", 1.0),
+                   anderson=options.get("scAnderson", 0), maxIterations=options.get("scMaxIterations", 60))
+
+    def config(self):
+        """
+        Return dictionary describing the configuration of the controller, including its class.
+        Subclasses with other parameters affecting the fixed point reached must add them.
+        """
+        return {"class": f"{type(self).__module__}.{type(self).__qualname__}", "tolerance": self.tolerance,
+                "damping": self.damping, "anderson": self.anderson, "maxIterations": self.maxIterations,
+                "oscillation": self.oscillation}
+
+    def start(self, x0, objFac, scale):
+        """
+        Reset controller for a new loop starting from solution ``x0``.
+        Objective of the solver is multiplied by ``objFac`` to report the value optimized.
+        Objectives within ``oscillation`` times ``scale`` are considered oscillating.
+        """
+        self.objFac = objFac
+        self.scale = scale
+        self.trace = []
+        self._oldx = x0
+        self._oldobjs = [-np.inf]
+        self._dV = []
+        self._dF = []
+        self._last = None
+
+    def converged(self, it, objfn, x, v, g):
+        """
+        Record iteration ``it`` where solver returned objective ``objfn`` and solution ``x``,
+        using fixed-point values ``v`` and leading to values ``g``.
+        Return reason for stopping, or None if loop must continue.
+        """
+        absSolDiff = np.sum(np.abs(x - self._oldx)) / 100
+        absObjDiff = abs(self.objFac * (objfn - self._oldobjs[-1])) / 100
+        self.trace.append({"iteration": it, "objective": objfn * self.objFac, "dX": absSolDiff, "df": absObjDiff,
+                           "residual": np.max(np.abs(g - v), initial=0)})
+
+        reason = None
+        if absSolDiff < self.tolerance and absObjDiff < self.tolerance:
+            reason = "converged"
+        elif abs(objfn - max(self._oldobjs[int(it / 2):])) < self.oscillation * self.scale:
+            # Avoid oscillatory solutions. Look only at most recent solutions.
+            reason = "oscillating"
+        elif it >= self.maxIterations:
+            reason = "maxIterations"
+
+        self._oldobjs.append(objfn)
+        self._oldx = x
+
+        return reason
+
+    def update(self, v, g):
+        """
+        Return values to use in next iteration, given values ``v`` used in the
+        iteration just completed and values ``g`` computed from its solution.
+        """
+        f = g - v
+        if self._last is not None and self.anderson > 0:
+            self._dV.append(v - self._last[0])
+            self._dF.append(f - self._last[1])
+            del self._dV[:-self.anderson], self._dF[:-self.anderson]
+        self._last = (v, f)
+
+        if len(self._dF) == 0:
+            return g if self.damping == 1 else v + self.damping * f
+
+        dV = np.column_stack(self._dV)
+        dF = np.column_stack(self._dF)
+        gamma = np.linalg.lstsq(dF, f, rcond=None)[0]
+        vnext = v + self.damping * f - (dV + self.damping * dF) @ gamma
+
+        # Fixed-point values are all non-negative.
+        return np.maximum(vnext, 0)
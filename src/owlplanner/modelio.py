@@ -0,0 +1,308 @@
+"""
+
+Owl/modelio
+---
+
+A retirement planner using linear programming optimization.
+
+Export and import of the optimization problem built through the
+solver-neutral API of abcapi. Models are written in free MPS format,
+or in CPLEX LP format for inspection, directly from the sparse
+matrices and bounds, without going through a solver package.
+Files can then be read by standalone solvers such as HiGHS or CBC.
+Models saved in MPS format can be read back as abcapi objects,
+which can be passed to any of the solvers used by a plan.
+
+Copyright &copy; 2024 - Martin-D. Lacasse
+
+Disclaimers: This code is for educational purposes only and does not constitute financial advice.
+
+"""
+
+import numpy as np
+
+from . import abcapi as abc
+
+
+knownFormats = ("mps", "lp")
+
+
+def _num(value):
+    """
+    Return shortest string representing float ``value`` exactly.
+    """
+    return repr(float(value))
+
+
+def writeModel(path, A, B, c, name="owl", fmt="mps"):
+    """
+    Write model defined by constraint matrix ``A``, bounds ``B``,
+    and objective ``c`` to file ``path`` in format ``fmt``.
+    Variables are named x0, x1, ..., and constraints r0, r1, ...,
+    in the order of their indices.
+    """
+    if fmt not in knownFormats:
+        raise ValueError(f"Unknown format {fmt}: must be one of {knownFormats}.")
+
+    Alu, lbvec, ubvec = A.sparse()
+    lb, ub = B.arrays()
+    integrality = B.integralityArray()
+    cvec = c.arrays()
+    with open(path, "w") as f:
+        if fmt == "mps":
+            _writeMPS(f, name, Alu.tocsc(), lbvec, ubvec, A.keys(), lb, ub, integrality, cvec)
+        else:
+            _writeLP(f, name, Alu, lbvec, ubvec, A.keys(), lb, ub, integrality, cvec)
+
+
+def _writeMPS(f, name, Acsc, lbvec, ubvec, ckeys, lb, ub, integrality, cvec):
+    rowTypes = {"fx": "E", "lo": "G", "ra": "G", "up": "L", "fr": "N"}
+    f.write(f"NAME {name.replace(' ', '_')}\nROWS\n N obj\n")
+    for r, key in enumerate(ckeys):
+        f.write(f" {rowTypes[key]} r{r}\n")
+
+    f.write("COLUMNS\n")
+    inInts = False
+    for j in range(Acsc.shape[1]):
+        if integrality[j] != inInts:
+            f.write("    MARKER 'MARKER' 'INTORG'\n" if integrality[j] else "    MARKER 'MARKER' 'INTEND'\n")
+            inInts = integrality[j]
+        rows = Acsc.indices[Acsc.indptr[j]:Acsc.indptr[j + 1]].tolist()
+        vals = Acsc.data[Acsc.indptr[j]:Acsc.indptr[j + 1]].tolist()
+        lines = [f"    x{j} obj {_num(cvec[j])}\n"] if cvec[j] != 0 or len(rows) == 0 else []
+        lines.extend(f"    x{j} r{r} {_num(v)}\n" for r, v in zip(rows, vals, strict=True))
+        f.write("".join(lines))
+    if inInts:
+        f.write("    MARKER 'MARKER' 'INTEND'\n")
+
+    f.write("RHS\n")
+    for r, key in enumerate(ckeys):
+        rhs = ubvec[r] if key == "up" else lbvec[r]
+        if key != "fr" and rhs != 0:
+            f.write(f"    rhs r{r} {_num(rhs)}\n")
+
+    f.write("RANGES\n")
+    for r, key in enumerate(ckeys):
+        if key == "ra":
+            f.write(f"    rng r{r} {_num(ubvec[r] - lbvec[r])}\n")
+
+    f.write("BOUNDS\n")
+    for j in range(len(lb)):
+        if lb[j] == ub[j]:
+            f.write(f" FX bnd x{j} {_num(lb[j])}\n")
+            continue
+        if lb[j] == -np.inf:
+            f.write(f" {'FR' if ub[j] == np.inf else 'MI'} bnd x{j}\n")
+        elif lb[j] != 0:
+            f.write(f" LO bnd x{j} {_num(lb[j])}\n")
+        if ub[j] != np.inf:
+            f.write(f" UP bnd x{j} {_num(ub[j])}\n")
+        elif integrality[j] and lb[j] != -np.inf:
+            f.write(f" PL bnd x{j}\n")
+
+    f.write("ENDATA\n")
+
+
+def _lpTerms(ind, val):
+    """
+    Return linear expression as lines of at most 8 terms.
+    """
+    terms = [f"{'-' if v < 0 else '+'} {_num(abs(v))} x{j}" for j, v in zip(ind, val, strict=True)]
+    if len(terms) == 0:
+        return "0 x0"
+
+    return "\n   ".join(" ".join(terms[k:k + 8]) for k in range(0, len(terms), 8))
+
+
+def _writeLP(f, name, Acsr, lbvec, ubvec, ckeys, lb, ub, integrality, cvec):
+    f.write(f"\\ Model {name}\nMinimize\n obj: ")
+    ind = np.flatnonzero(cvec)
+    f.write(_lpTerms(ind.tolist(), cvec[ind].tolist()) + "\nSubject To\n")
+    for r, key in enumerate(ckeys):
+        if key == "fr":
+            continue
+        expr = _lpTerms(Acsr.indices[Acsr.indptr[r]:Acsr.indptr[r + 1]].tolist(),
+                        Acsr.data[Acsr.indptr[r]:Acsr.indptr[r + 1]].tolist())
+        if key == "fx":
+            f.write(f" r{r}: {expr} = {_num(lbvec[r])}\n")
+        elif key == "lo":
+            f.write(f" r{r}: {expr} >= {_num(lbvec[r])}\n")
+        elif key == "up":
+            f.write(f" r{r}: {expr} <= {_num(ubvec[r])}\n")
+        else:
+            # Ranged rows are split in two.
+            f.write(f" r{r}_lo: {expr} >= {_num(lbvec[r])}\n r{r}_up: {expr} <= {_num(ubvec[r])}\n")
+
+    f.write("Bounds\n")
+    for j in range(len(lb)):
+        if lb[j] == ub[j]:
+            f.write(f" x{j} = {_num(lb[j])}\n")
+        elif lb[j] == -np.inf and ub[j] == np.inf:
+            f.write(f" x{j} free\n")
+        elif lb[j] != 0 or ub[j] != np.inf:
+            lo = "-inf" if lb[j] == -np.inf else _num(lb[j])
+            up = "+inf" if ub[j] == np.inf else _num(ub[j])
+            f.write(f" {lo} <= x{j} <= {up}\n")
+
+    ints = np.flatnonzero(integrality)
+    if len(ints) > 0:
+        f.write("Generals\n")
+        for k in range(0, len(ints), 8):
+            f.write(" " + " ".join(f"x{j}" for j in ints[k:k + 8]) + "\n")
+
+    f.write("End\n")
+
+
+def _pairs(words, line):
+    """
+    Return (name, value) pairs of an MPS data line.
+    """
+    try:
+        return list(zip(words[0::2], words[1::2], strict=True))
+    except ValueError:
+        raise ValueError(f"Missing value in MPS line '{line.strip()}'.") from None
+
+
+def readModel(path):
+    """
+    Read model from free MPS file ``path``.
+    Return name of model, constraint matrix, bounds, and objective as abcapi objects.
+    Variables are indexed in their order of appearance in the file.
+    """
+    name = ""
+    objrow = None
+    rowIndex = {}
+    rowTypes = []
+    colIndex = {}
+    integers = []
+    irow, icol, vals = [], [], []
+    cdic = {}
+    rhs = {}
+    ranges = {}
+    bounds = []
+    section = None
+    inInts = False
+
+    def column(cname):
+        if cname not in colIndex:
+            colIndex[cname] = len(colIndex)
+            if inInts:
+                integers.append(colIndex[cname])
+        return colIndex[cname]
+
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip() == "" or line.startswith("*"):
+                continue
+            words = line.split()
+            if not line[0].isspace():
+                section = words[0]
+                if section == "NAME":
+                    name = words[1] if len(words) > 1 else ""
+                elif section == "ENDATA":
+                    break
+                elif section not in ("ROWS", "COLUMNS", "RHS", "RANGES", "BOUNDS", "OBJSENSE"):
+                    raise ValueError(f"Unsupported MPS section {section}.")
+                continue
+
+            if section == "ROWS":
+                rtype, rname = words
+                if rtype == "N" and objrow is None:
+                    objrow = rname
+                else:
+                    rowIndex[rname] = len(rowTypes)
+                    rowTypes.append(rtype)
+            elif section == "COLUMNS":
+                if len(words) > 2 and words[1] == "'MARKER'":
+                    inInts = words[2] == "'INTORG'"
+                    continue
+                j = column(words[0])
+                for rname, value in _pairs(words[1:], line):
+                    if rname == objrow:
+                        cdic[j] = float(value)
+                    else:
+                        irow.append(rowIndex[rname])
+                        icol.append(j)
+                        vals.append(float(value))
+            elif section in ("RHS", "RANGES"):
+                target = rhs if section == "RHS" else ranges
+                pairs = words[1:] if len(words) % 2 == 1 else words
+                for rname, value in _pairs(pairs, line):
+                    if rname != objrow:
+                        target[rowIndex[rname]] = float(value)
+            elif section == "BOUNDS":
+                btype, cname = words[0], words[2]
+                value = float(words[3]) if len(words) > 3 else None
+                bounds.append((btype, column(cname), value))
+            elif section == "OBJSENSE":
+                if words[0] not in ("MIN", "MINIMIZE"):
+                    raise ValueError("Only minimization problems are supported.")
+
+    nvars = len(colIndex)
+    ncons = len(rowTypes)
+    lbvec = np.full(ncons, -np.inf)
+    ubvec = np.full(ncons, np.inf)
+    for r, rtype in enumerate(rowTypes):
+        b = rhs.get(r, 0.0)
+        if rtype == "E":
+            lbvec[r] = ubvec[r] = b
+            if r in ranges:
+                if ranges[r] > 0:
+                    ubvec[r] = b + ranges[r]
+                else:
+                    lbvec[r] = b + ranges[r]
+        elif rtype == "G":
+            lbvec[r] = b
+            if r in ranges:
+                ubvec[r] = b + abs(ranges[r])
+        elif rtype == "L":
+            ubvec[r] = b
+            if r in ranges:
+                lbvec[r] = b - abs(ranges[r])
+
+    lb = np.zeros(nvars)
+    ub = np.full(nvars, np.inf)
+    for btype, j, value in bounds:
+        if btype == "UP":
+            ub[j] = value
+            if value < 0 and lb[j] == 0:
+                lb[j] = -np.inf
+        elif btype == "LO":
+            lb[j] = value
+        elif btype == "FX":
+            lb[j] = ub[j] = value
+        elif btype == "FR":
+            lb[j], ub[j] = -np.inf, np.inf
+        elif btype == "MI":
+            lb[j] = -np.inf
+        elif btype == "PL":
+            ub[j] = np.inf
+        elif btype == "BV":
+            lb[j], ub[j] = 0, 1
+            integers.append(j)
+        else:
+            raise ValueError(f"Unsupported bound type {btype}.")
+
+    from scipy import sparse
+
+    Alu = sparse.csr_array((vals, (irow, icol)), shape=(ncons, nvars))
+    A = abc.ConstraintMatrix(nvars, len(vals))
+    if ncons > 0:
+        lengths = np.diff(Alu.indptr)
+        ind = np.full((ncons, max(lengths.max(), 1)), -1)
+        val = np.zeros(ind.shape)
+        pos = np.arange(Alu.nnz) - np.repeat(Alu.indptr[:-1], lengths)
+        rows = np.repeat(np.arange(ncons), lengths)
+        ind[rows, pos] = Alu.indices
+        val[rows, pos] = Alu.data
+        A.addRows(ind, val, lbvec, ubvec)
+
+    B = abc.Bounds(nvars, 0)
+    B.setRanges(np.arange(nvars), lb, ub)
+    B.integrality = sorted(set(integers))
+
+    c = abc.Objective(nvars)
+    for j, value in cdic.items():
+        c.setElem(j, value)
+
+    return name, A, B, c
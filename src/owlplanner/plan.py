@@ -19,6 +19,8 @@ import numpy as np
 import pandas as pd
 from datetime import date, datetime
 from functools import wraps
+import hashlib
+import inspect
 from openpyxl import Workbook
 from openpyxl.utils.dataframe import dataframe_to_rows
 import time
@@ -31,6 +33,13 @@ from . import config
 from . import timelists
 from . import mylogging as log
 from . import progress
+from . import scenarios
+from . import solutioncache
+from . import modelio
+from . import convergence
+from . import solvestats
+from . import profiling
+from .version import __version__
 from .plotting.factory import PlotFactory
 
 
@@ -43,13 +52,11 @@ def _genGamma_n(tau):
     -``tau``: Time series containing annual rates, the last of which is inflation.
     If there are Nn years in time series, the series will generate Nn + 1,
     as the last year will compound for an extra data point at the beginning of the
-    following year.
+    following year. A leading axis of scenarios is supported.
     """
-    N = len(tau[-1]) + 1
-    gamma = np.ones(N)
-
-    for n in range(1, N):
-        gamma[n] = gamma[n - 1] * (1 + tau[-1, n - 1])
+    inflation = tau[..., -1, :]
+    gamma = np.ones(inflation.shape[:-1] + (inflation.shape[-1] + 1,))
+    gamma[..., 1:] = np.cumprod(1 + inflation, axis=-1)
 
     return gamma
 
@@ -122,22 +129,83 @@ def _q4(C, l1, l2, l3, l4, N1, N2, N3, N4):
     return C + l1 * N2 * N3 * N4 + l2 * N3 * N4 + l3 * N4 + l4
 
 
+# Solver instances, matrices, and results, not carried by copies of a plan.
+_solverArtifacts = (
+    "A", "B", "c", "_highsModel", "_builtFingerprints", "_solvedFingerprints", "xSolution", "_resultLevel",
+    "scenarioResults", "_stats", "_timestamp", "b_ijn", "d_in", "e_n", "f_tn", "g_n", "m_n", "s_n", "w_ijn", "x_in",
+    "z_inz", "G_n", "I_n", "P_n", "Q_n", "T_n", "T_tn", "U_n", "b_ijkn", "rmd_in", "dist_in", "sources_in",
+    "savings_in", "basis", "bequest", "partialBequest", "partialEstate_j",
+)
+
+
+def _planState(plan):
+    """
+    Return a dictionary of the attributes of plan, without its logger and solver artifacts.
+    Values are shared with plan. Methods bound to plan are replaced by their names.
+    """
+    state = {}
+    methods = {}
+    for key, value in plan.__dict__.items():
+        if key in _solverArtifacts or key == "mylog":
+            continue
+        if getattr(value, "__self__", None) is plan:
+            methods[key] = value.__name__
+        else:
+            state[key] = value
+    state["_boundMethods"] = methods
+
+    return state
+
+
+def _planFromState(state):
+    """
+    Return a plan built from a dictionary returned by _planState(), without a logger.
+    Arrays, lists, and dictionaries are copied, while their contents,
+    such as time lists and tax tables, are shared.
+    These are never modified in place, but replaced when changed.
+    """
+    import copy
+
+    plan = Plan.__new__(Plan)
+    for key, value in state.items():
+        if key == "_boundMethods":
+            continue
+        if isinstance(value, np.ndarray):
+            value = value.copy()
+        elif isinstance(value, (list, dict)):
+            value = type(value)(value)
+        elif isinstance(value, np.random.Generator):
+            value = copy.deepcopy(value)
+        setattr(plan, key, value)
+
+    for key, name in state["_boundMethods"].items():
+        setattr(plan, key, getattr(plan, name))
+
+    plan.mylog = None
+    plan._highsModel = None
+    plan._builtFingerprints = None
+    plan._solvedFingerprints = None
+    plan.xSolution = None
+    plan._resultLevel = None
+    plan.scenarioResults = None
+    plan._stats = solvestats.SolveStats()
+    if plan.caseStatus == "solved":
+        plan.caseStatus = "modified"
+
+    return plan
+
+
 def clone(plan, newname=None, *, verbose=True, logstreams=None):
     """
-    Return an almost identical copy of plan: only the name of the plan
+    Return a copy of plan with the same configuration: only the name of the plan
     has been modified and appended the string '(copy)',
     unless a new name is provided as an argument.
+    The copy does not carry the solution of plan and needs to be solved.
     """
-    import copy
-
-    # Can't deepcopy variables containing file descriptors.
-    mylogger = plan.logger()
-    plan.setLogger(None)
-    newplan = copy.deepcopy(plan)
-    plan.setLogger(mylogger)
+    newplan = _planFromState(_planState(plan))
 
     if logstreams is None:
-        newplan.setLogger(mylogger)
+        newplan.setLogger(plan.logger())
     else:
         newplan.setLogstreams(verbose, logstreams)
 
@@ -149,6 +217,105 @@ def clone(plan, newname=None, *, verbose=True, logstreams=None):
     return newplan
 
 
+# Attributes defining each group of parameters, tracked between solves.
+_paramGroups = {
+    "rates": ("tau_kn", "gamma_n"),
+    "balances": ("beta_ij", "yearFracLeft"),
+    "allocations": ("alpha_ijkn",),
+    "spending": ("xi_n",),
+    "fixedIncome": ("pi_in", "zeta_in", "pensionIsIndexed"),
+    "timeLists": ("omega_in", "Lambda_in", "myRothX_in", "kappa_ijn"),
+    "heirs": ("phi_j", "nu", "eta"),
+    "taxes": ("mu", "yOBBBA"),
+}
+
+
+def _fingerprint(*values):
+    """
+    Return a digest of values, which can be None, numbers, strings, lists, or arrays.
+    """
+    h = hashlib.sha256()
+    for value in values:
+        arr = np.asarray(value)
+        if value is None or arr.dtype == object:
+            h.update(repr(value).encode())
+        else:
+            h.update(f"{arr.dtype}{arr.shape}".encode())
+            h.update(np.ascontiguousarray(arr).tobytes())
+
+    return h.hexdigest()
+
+
+def _planSnapshot(plan):
+    """
+    Return a pickled PlanSpec of plan, suitable for shipping to worker processes.
+    """
+    import pickle
+    from .planspec import PlanSpec
+
+    return pickle.dumps(PlanSpec.fromPlan(plan))
+
+
+# Plan private to each worker process.
+_workerPlan = None
+
+
+def _initWorker(snapshot, profiler=None):
+    """
+    Rebuild the plan snapshot once in each worker process, and start profiling if requested.
+    Worker plans do not use the solution cache, as scenarios are never solved twice.
+    """
+    import pickle
+
+    global _workerPlan
+    _workerPlan = pickle.loads(snapshot).toPlan()
+    _workerPlan.setSolutionCache(False)
+    profiling.initWorker(profiler, _workerPlan._name)
+
+
+def _runInWorker(func, args):
+    return profiling.runInWorker(func, _workerPlan, *args)
+
+
+def _solveScenario(plan, objective, options):
+    """
+    Solve plan and return status, number of iterations, solve time, and values of interest,
+    in the order expected by ScenarioResults, together with the statistics of the solve.
+    Solutions of scenarios are never reused, and are kept out of the solution cache.
+    """
+    useCache = plan.setSolutionCache(False)
+    t0 = time.perf_counter()
+    try:
+        plan.solve(objective, options, level="metrics")
+    finally:
+        plan.setSolutionCache(useCache)
+    solveTime = time.perf_counter() - t0
+    if plan.caseStatus != "solved":
+        return (plan.caseStatus, plan.scIterations, solveTime, np.nan, np.nan, np.nan), plan.solveStats
+
+    values = (plan.caseStatus, plan.scIterations, solveTime, plan.partialBequest, plan.basis, plan.bequest)
+
+    return values, plan.solveStats
+
+
+def _mcScenario(plan, objective, options, tau_kn, gamma_n):
+    """
+    Solve one Monte Carlo scenario with the rates provided.
+    """
+    plan._setRateSeries(tau_kn, gamma_n)
+
+    return _solveScenario(plan, objective, options)
+
+
+def _histScenario(plan, objective, options, year):
+    """
+    Solve one historical scenario starting in ``year``.
+    """
+    plan.setRates("historical", year)
+
+    return _solveScenario(plan, objective, options)
+
+
 ############################################################################
 
 
@@ -163,6 +330,7 @@ def _checkCaseStatus(func):
         if self.caseStatus != "solved":
             self.mylog.vprint(f"Preventing to run method {func.__name__}() while case is {self.caseStatus}.")
             return None
+        self.aggregateResults()
         return func(self, *args, **kwargs)
 
     return wrapper
@@ -189,6 +357,57 @@ def _checkConfiguration(func):
     return wrapper
 
 
+def _phase(name):
+    """
+    Decorator to add time spent in method to phase ``name`` of the statistics of the plan.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self._stats.phase(name):
+                return func(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _profiled(func):
+    """
+    Decorator to profile method if a profiler was set for the plan.
+    Generators are profiled from their first to their last iteration,
+    excluding the time their consumer spends between iterations.
+    """
+
+    if inspect.isgeneratorfunction(func):
+        @wraps(func)
+        def genWrapper(self, *args, **kwargs):
+            if self._profiler is None:
+                return (yield from func(self, *args, **kwargs))
+            with self._profiler.run(f"{self._name}-{func.__name__}") as file:
+                gen = func(self, *args, **kwargs)
+                # Generators iterated by another profiled call remain part of its profile.
+                result = yield from (gen if file is None else profiling.pausing(gen))
+            if file is not None:
+                self.mylog.vprint(f"Profile of {func.__name__}() written to {file}.")
+            return result
+
+        return genWrapper
+
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if self._profiler is None:
+            return func(self, *args, **kwargs)
+        with self._profiler.run(f"{self._name}-{func.__name__}") as file:
+            result = func(self, *args, **kwargs)
+        if file is not None:
+            self.mylog.vprint(f"Profile of {func.__name__}() written to {file}.")
+        return result
+
+    return wrapper
+
+
 def _timer(func):
     """
     Decorator to report CPU and Wall time.
@@ -331,6 +550,9 @@ class Plan(object):
         # Prepare RMD time series.
         self.rho_in = tx.rho_in(self.yobs, self.N_n)
 
+        # Tax and Medicare timelines independent of rates, computed on demand.
+        self._taxTables = None
+
         # Initialize guardrails to ensure proper configuration.
         self._adjustedParameters = False
         self.timeListsFileName = "None"
@@ -342,6 +564,34 @@ class Plan(object):
         self.ARCoord = None
         self.objective = "unknown"
 
+        # Persistent native HiGHS model, reused across solves.
+        self._highsModel = None
+
+        # Seed of random streams used for stochastic rates.
+        self.rateSeed = None
+        self._rateRng = None
+
+        # Results of last Monte Carlo or historical range run.
+        self.scenarioResults = None
+        self.scIterations = 0
+        self.xSolution = None
+        self._resultLevel = None
+
+        # Fingerprints of parameters used for the problem last built and last solved.
+        self._builtFingerprints = None
+        self._solvedFingerprints = None
+        self._useSolutionCache = True
+
+        # Timings and counters of the last solve, or of all scenarios of the last run.
+        self._stats = solvestats.SolveStats()
+
+        # Profiler set by the environment, if any.
+        self._profiler = profiling.fromEnvironment()
+
+        # Controller of the self-consistent loop, and trace of its last run.
+        self._convergence = None
+        self.scTrace = []
+
         # Placeholders values used to check if properly configured.
         self.xi_n = None
         self.alpha_ijkn = None
@@ -366,6 +616,47 @@ class Plan(object):
         """
         return self.mylog.setVerbose(state)
 
+    @property
+    def solveStats(self):
+        """
+        Dictionary of timings per phase, number of calls per phase, and counters
+        of the last solve, or aggregated over all scenarios of the last call to
+        runMC(), runHistoricalRange(), or runScenarios(). See ``solvestats`` module.
+        """
+        return self._stats.asDict()
+
+    def setProfiler(self, kind=None, path="."):
+        """
+        Profile calls to solve(), runMC(), iterMC(), and runHistoricalRange(), writing one file per call
+        in directory ``path``. Profiler ``kind`` can be "cprofile" for writing pstats files,
+        or "collapsed" for collapsed stacks as used by flame graphs. When scenarios are run
+        in parallel, each worker process also writes its own file. Use None to stop profiling.
+        Profiling can also be set for all plans through the OWL_PROFILE environment variable,
+        as in OWL_PROFILE=cprofile:/tmp/profiles.
+        """
+        self._profiler = None if kind is None else profiling.Profiler(kind, path)
+
+    def setConvergenceController(self, controller=None):
+        """
+        Use ``controller`` for deciding convergence and updating values in the self-consistent loop.
+        See ``convergence`` module. If None, a ConvergenceController is configured
+        from the solver options scTolerance, scDamping, scAnderson, and scMaxIterations.
+        The next solve runs the loop again, as the previous solution can no longer be reused.
+        """
+        self._convergence = controller
+        self._solvedFingerprints = None
+
+    def setSolutionCache(self, state=True):
+        """
+        Control whether solutions are looked up in and stored to the cache shared by all plans.
+        See ``solutioncache`` module. Return previous state.
+        -``state``: Boolean enabling the cache.
+        """
+        previous = self._useSolutionCache
+        self._useSolutionCache = state
+
+        return previous
+
     def _setStartingDate(self, mydate):
         """
         Set the date when the plan starts in the current year.
@@ -487,6 +778,7 @@ class Plan(object):
         self.yOBBBA = yOBBBA
         self.caseStatus = "modified"
         self._adjustedParameters = False
+        self._taxTables = None
 
     def setBeneficiaryFractions(self, phi):
         """
@@ -615,7 +907,7 @@ class Plan(object):
         self.smileDelay = delay
         self.caseStatus = "modified"
 
-    def setRates(self, method, frm=None, to=None, values=None, stdev=None, corr=None):
+    def setRates(self, method, frm=None, to=None, values=None, stdev=None, corr=None, seed=None):
         """
         Generate rates for return and inflation based on the method and
         years selected. Note that last bound is included.
@@ -630,36 +922,60 @@ class Plan(object):
           must be provided, and optionally an ending year.
 
         Valid year range is from 1928 to last year.
+
+        For 'stochastic' and 'histochastic', an integer ``seed`` can be provided
+        to make the series generated, including those of Monte Carlo simulations,
+        reproducible. Otherwise, numpy's global random state is used.
         """
         if frm is not None and to is None:
             to = frm + self.N_n - 1  # 'to' is inclusive.
 
-        dr = rates.Rates(self.mylog)
+        if seed is not None:
+            seed = int(seed)
+        self.rateSeed = seed
+        self._rateRng = None if seed is None else np.random.default_rng(seed)
+
+        dr = rates.Rates(self.mylog, self._rateRng)
         self.rateValues, self.rateStdev, self.rateCorr = dr.setMethod(method, frm, to, values, stdev, corr)
         self.rateMethod = method
         self.rateFrm = frm
         self.rateTo = to
-        self.tau_kn = dr.genSeries(self.N_n).transpose()
-        self.mylog.vprint(f"Generating rate series of {len(self.tau_kn[0])} years using {method} method.")
+        self.mylog.vprint(f"Generating rate series of {self.N_n} years using {method} method.")
+        self._setRateSeries(dr.genSeries(self.N_n).transpose())
 
+    def _setRateSeries(self, tau_kn, gamma_n=None):
+        """
+        Install a series of rates, and its cumulative inflation multipliers if already known.
+        """
+        self.tau_kn = tau_kn
         # Once rates are selected, (re)build cumulative inflation multipliers.
-        self.gamma_n = _genGamma_n(self.tau_kn)
+        self.gamma_n = _genGamma_n(self.tau_kn) if gamma_n is None else gamma_n
         self._adjustedParameters = False
         self.caseStatus = "modified"
 
-    def regenRates(self):
+    def _genRateSeriesBatch(self, S, rngs=None):
+        """
+        Generate S series of rates using the arguments of last setRates() call.
+        Return rates as an S x N_k x N_n array and
+        cumulative inflation multipliers as an S x (N_n + 1) array.
+        """
+        dr = rates.Rates(self.mylog)
+        dr.setMethod(self.rateMethod, self.rateFrm, self.rateTo, 100 * self.rateValues,
+                     100 * self.rateStdev, self.rateCorr)
+        tau_skn = dr.genSeriesBatch(self.N_n, S, rngs).transpose(0, 2, 1)
+
+        return tau_skn, _genGamma_n(tau_skn)
+
+    def regenRates(self, rng=None):
         """
         Regenerate the rates using the arguments specified during last setRates() call.
         This method is used to regenerate stochastic time series.
+        Random numbers are drawn from numpy random Generator ``rng`` if provided,
+        or continue the stream started by the seed given to setRates().
         """
-        self.setRates(
-            self.rateMethod,
-            frm=self.rateFrm,
-            to=self.rateTo,
-            values=100 * self.rateValues,
-            stdev=100 * self.rateStdev,
-            corr=self.rateCorr,
-        )
+        rng = self._rateRng if rng is None else rng
+        tau_skn, gamma_sn = self._genRateSeriesBatch(1, None if rng is None else [rng])
+        self._setRateSeries(tau_skn[0], gamma_sn[0])
 
     def setAccountBalances(self, *, taxable, taxDeferred, taxFree, startDate=None, units="k"):
         """
@@ -987,6 +1303,18 @@ class Plan(object):
 
         return dat
 
+    def _getTaxTables(self):
+        """
+        Return tax and Medicare timelines that do not depend on rates.
+        These are computed once and reset by setters changing their inputs.
+        """
+        if self._taxTables is None:
+            self._taxTables = tx.taxTimelines(self.yobs, self.i_d, self.n_d, self.N_n, self.yOBBBA)
+            self._taxTables.update(tx.medicareTimelines(self.yobs, self.horizons, self.N_n))
+
+        return self._taxTables
+
+    @_phase("adjustParameters")
     def _adjustParameters(self, gamma_n, MAGI_n):
         """
         Adjust parameters that follow inflation or depend on MAGI.
@@ -995,9 +1323,10 @@ class Plan(object):
         if self.rateMethod is None:
             raise RuntimeError("A rate method needs to be first selected using setRates(...).")
 
+        tables = self._getTaxTables()
         self.sigmaBar_n, self.theta_tn, self.Delta_tn = tx.taxParams(self.yobs, self.i_d, self.n_d,
                                                                      self.N_n, gamma_n,
-                                                                     MAGI_n, self.yOBBBA)
+                                                                     MAGI_n, self.yOBBBA, tables)
 
         if not self._adjustedParameters:
             self.mylog.vprint("Adjusting parameters for inflation.")
@@ -1009,7 +1338,8 @@ class Plan(object):
                 if self.pensionIsIndexed[i]:
                     self.piBar_in[i] *= gamma_n[:-1]
 
-            self.nm, self.L_nq, self.C_nq = tx.mediVals(self.yobs, self.horizons, gamma_n, self.N_n, self.N_q)
+            self.nm, self.L_nq, self.C_nq = tx.mediVals(self.yobs, self.horizons, gamma_n,
+                                                        self.N_n, self.N_q, tables)
 
             self._adjustedParameters = True
 
@@ -1046,7 +1376,8 @@ class Plan(object):
     def _buildConstraints(self, objective, options):
         """
         Utility function that builds constraint matrix and vectors.
-        Refactored for clarity and maintainability.
+        Each family of constraints is recorded as a named block so that
+        families depending on parameters that changed can be rewritten in place by _updateConstraints().
         """
         # Ensure parameters are adjusted for inflation and MAGI.
         self._adjustParameters(self.gamma_n, self.MAGI_n)
@@ -1054,52 +1385,99 @@ class Plan(object):
         self.A = abc.ConstraintMatrix(self.nvars)
         self.B = abc.Bounds(self.nvars, self.nbins)
 
-        self._add_rmd_inequalities()
-        self._add_tax_bracket_bounds()
-        self._add_standard_exemption_bounds()
-        self._add_defunct_constraints()
-        self._add_roth_conversion_constraints(options)
-        self._add_roth_maturation_constraints()
-        self._add_withdrawal_limits()
-        self._add_conversion_limits()
-        self._add_objective_constraints(objective, options)
-        self._add_initial_balances()
-        self._add_surplus_deposit_linking()
-        self._add_account_balance_carryover()
-        self._add_net_cash_flow()
-        self._add_income_profile()
-        self._add_taxable_income()
-        self._configure_Medicare_binary_variables(options)
-        self._add_Medicare_costs(options)
-        self._configure_exclusion_binary_variables(options)
+        for method, args, _ in self._constraintFamilies(objective, options):
+            with self._stats.phase(method.__name__):
+                self.A.beginBlock(method.__name__)
+                self.B.beginBlock(method.__name__)
+                method(*args)
+                self.A.endBlock()
+                self.B.endBlock()
+
         self._build_objective_vector(objective)
 
+    def _constraintFamilies(self, objective, options):
+        """
+        Return list of methods, with their arguments, adding each family of constraints,
+        and the groups of parameters each family depends on. Group "loop" stands for
+        MAGI, capital gain tax rate, NIIT, and Medicare costs computed in the self-consistent loop.
+        """
+        return [
+            (self._add_rmd_inequalities, (), ("balances",)),
+            (self._add_tax_bracket_bounds, (), ("rates", "taxes")),
+            (self._add_standard_exemption_bounds, (), ("loop", "rates", "taxes")),
+            (self._add_defunct_constraints, (), ()),
+            (self._add_roth_conversion_constraints, (options,), ("options", "timeLists")),
+            (self._add_roth_maturation_constraints, (), ("rates", "allocations", "timeLists")),
+            (self._add_withdrawal_limits, (), ()),
+            (self._add_conversion_limits, (), ()),
+            (self._add_objective_constraints, (objective, options), ("options", "rates", "heirs")),
+            (self._add_initial_balances, (), ("rates", "allocations", "balances")),
+            (self._add_surplus_deposit_linking, (), ("heirs",)),
+            (self._add_account_balance_carryover, (), ("options", "rates", "allocations", "timeLists", "heirs")),
+            (self._add_net_cash_flow, (), ("loop", "rates", "allocations", "timeLists", "fixedIncome", "taxes")),
+            (self._add_income_profile, (), ("options", "rates", "spending")),
+            (self._add_taxable_income, (), ("rates", "allocations", "timeLists", "fixedIncome")),
+            (self._configure_Medicare_binary_variables, (options,), ("loop", "options", "rates", "allocations",
+                                                                     "timeLists", "fixedIncome", "taxes")),
+            (self._add_Medicare_costs, (options,), ("options", "rates")),
+            (self._configure_exclusion_binary_variables, (options,), ("options",)),
+        ]
+
+    def _updateConstraints(self, objective, options, changed=("loop",)):
+        """
+        Rewrite in place the families of constraints depending on the groups
+        of parameters that have ``changed``, as listed by _constraintFamilies().
+        By default, only families depending on values computed in the
+        self-consistent loop are rewritten. Sparsity pattern and
+        all other constraints are left untouched, unless the structure of a family
+        changes, in which case the problem is rebuilt from scratch.
+        """
+        self._adjustParameters(self.gamma_n, self.MAGI_n)
+
+        try:
+            for method, args, groups in self._constraintFamilies(objective, options):
+                if not set(groups) & set(changed):
+                    continue
+                with self._stats.phase(method.__name__):
+                    self.A.rewind(method.__name__)
+                    self.B.rewind(method.__name__)
+                    method(*args)
+                    self.A.restore()
+                    self.B.restore()
+        except abc.BlockShapeError as e:
+            self.mylog.vprint(f"Rebuilding problem: {e}")
+            self._stats.count("rebuilds")
+            self._buildConstraints(objective, options)
+            return
+
+        if set(changed) - {"loop"}:
+            self._build_objective_vector(objective)
+
     def _add_rmd_inequalities(self):
         for i in range(self.N_i):
             if self.beta_ij[i, 1] > 0:
-                for n in range(self.horizons[i]):
-                    rowDic = {
-                        _q3(self.C["w"], i, 1, n, self.N_i, self.N_j, self.N_n): 1,
-                        _q3(self.C["b"], i, 1, n, self.N_i, self.N_j, self.N_n + 1): -self.rho_in[i, n],
-                    }
-                    self.A.addNewRow(rowDic, 0, np.inf)
+                n = np.arange(self.horizons[i])
+                ind = np.column_stack([_q3(self.C["w"], i, 1, n, self.N_i, self.N_j, self.N_n),
+                                       _q3(self.C["b"], i, 1, n, self.N_i, self.N_j, self.N_n + 1)])
+                val = np.column_stack([np.ones(len(n)), -self.rho_in[i, n]])
+                self.A.addRows(ind, val, 0, np.inf)
 
     def _add_tax_bracket_bounds(self):
-        for t in range(self.N_t):
-            for n in range(self.N_n):
-                self.B.setRange(_q2(self.C["f"], t, n, self.N_t, self.N_n), 0, self.DeltaBar_tn[t, n])
+        t = np.arange(self.N_t)[:, None]
+        n = np.arange(self.N_n)[None, :]
+        self.B.setRanges(_q2(self.C["f"], t, n, self.N_t, self.N_n), 0, self.DeltaBar_tn)
 
     def _add_standard_exemption_bounds(self):
-        for n in range(self.N_n):
-            self.B.setRange(_q1(self.C["e"], n, self.N_n), 0, self.sigmaBar_n[n])
+        n = np.arange(self.N_n)
+        self.B.setRanges(_q1(self.C["e"], n, self.N_n), 0, self.sigmaBar_n)
 
     def _add_defunct_constraints(self):
         if self.N_i == 2:
-            for n in range(self.n_d, self.N_n):
-                self.B.setRange(_q2(self.C["d"], self.i_d, n, self.N_i, self.N_n), 0, 0)
-                self.B.setRange(_q2(self.C["x"], self.i_d, n, self.N_i, self.N_n), 0, 0)
-                for j in range(self.N_j):
-                    self.B.setRange(_q3(self.C["w"], self.i_d, j, n, self.N_i, self.N_j, self.N_n), 0, 0)
+            n = np.arange(self.n_d, self.N_n)
+            j = np.arange(self.N_j)[:, None]
+            self.B.setRanges(_q2(self.C["d"], self.i_d, n, self.N_i, self.N_n), 0, 0)
+            self.B.setRanges(_q2(self.C["x"], self.i_d, n, self.N_i, self.N_n), 0, 0)
+            self.B.setRanges(_q3(self.C["w"], self.i_d, j, n, self.N_i, self.N_j, self.N_n), 0, 0)
 
     def _add_roth_maturation_constraints(self):
         """
@@ -1112,38 +1490,35 @@ class Plan(object):
         # Assume 10% per year for contributions and conversions for past 5 years.
         # Future years will use the assumed returns.
         oldTau1 = 1.10
+        dn = np.arange(1, 6)
         for i in range(self.N_i):
             h = self.horizons[i]
-            for n in range(h):
-                rhs = 0
-                # To add compounded gains to original amount.
-                cgains = 1
-                row = self.A.newRow()
-                row.addElem(_q3(self.C["b"], i, 2, n, self.N_i, self.N_j, self.N_n + 1), 1)
-                row.addElem(_q3(self.C["w"], i, 2, n, self.N_i, self.N_j, self.N_n), -1)
-                for dn in range(1, 6):
-                    nn = n - dn
-                    if nn >= 0:       # Past of future is now or in the future: use variables and parameters.
-                        Tau1 = 1 + np.sum(self.alpha_ijkn[i, 2, :, nn] * self.tau_kn[:, nn], axis=0)
-                        cgains *= Tau1
-                        row.addElem(_q2(self.C["x"], i, nn, self.N_i, self.N_n), -cgains)
-                        # If a contribution - it can be withdrawn but not the gains.
-                        rhs += (cgains - 1) * self.kappa_ijn[i, 2, nn]
-                    else:  # Past of future is in the past:
-                        # Parameters are stored at the end of contributions and conversions arrays.
-                        cgains *= oldTau1
-                        # If a contribution, it has no penalty, but assume a conversion.
-                        # rhs += (cgains - 1) * self.kappa_ijn[i, 2, nn] + cgains * self.myRothX_in[i, nn]
-                        rhs += cgains * self.kappa_ijn[i, 2, nn] + cgains * self.myRothX_in[i, nn]
-
-                self.A.addRow(row, rhs, np.inf)
+            n = np.arange(h)
+            nn = n[:, None] - dn[None, :]
+            isfuture = nn >= 0
+            Tau1_n = 1 + np.sum(self.alpha_ijkn[i, 2, :, :self.N_n] * self.tau_kn, axis=0)
+            # Past of future is now or in the future: use variables and parameters.
+            # Past of future is in the past: parameters are stored at the end of
+            # contributions and conversions arrays and are accessed with negative indices.
+            cgains = np.cumprod(np.where(isfuture, Tau1_n[np.maximum(nn, 0)], oldTau1), axis=1)
+            # If a contribution - it can be withdrawn but not the gains.
+            # If in the past, it has no penalty, but assume a conversion.
+            rhs = np.sum(np.where(isfuture,
+                                  (cgains - 1) * self.kappa_ijn[i, 2, nn],
+                                  cgains * self.kappa_ijn[i, 2, nn] + cgains * self.myRothX_in[i, nn]), axis=1)
+
+            ind = np.column_stack([_q3(self.C["b"], i, 2, n, self.N_i, self.N_j, self.N_n + 1),
+                                   _q3(self.C["w"], i, 2, n, self.N_i, self.N_j, self.N_n),
+                                   np.where(isfuture, _q2(self.C["x"], i, nn, self.N_i, self.N_n), -1)])
+            val = np.column_stack([np.ones(h), -np.ones(h), -cgains])
+            self.A.addRows(ind, val, rhs, np.inf)
 
     def _add_roth_conversion_constraints(self, options):
         if "maxRothConversion" in options and options["maxRothConversion"] == "file":
             for i in range(self.N_i):
-                for n in range(self.horizons[i]):
-                    rhs = self.myRothX_in[i][n]
-                    self.B.setRange(_q2(self.C["x"], i, n, self.N_i, self.N_n), rhs, rhs)
+                n = np.arange(self.horizons[i])
+                rhs = self.myRothX_in[i, n]
+                self.B.setRanges(_q2(self.C["x"], i, n, self.N_i, self.N_n), rhs, rhs)
         else:
             if "maxRothConversion" in options:
                 rhsopt = options["maxRothConversion"]
@@ -1153,8 +1528,8 @@ class Plan(object):
                 if rhsopt >= 0:
                     rhsopt *= self.optionsUnits
                     for i in range(self.N_i):
-                        for n in range(self.horizons[i]):
-                            self.B.setRange(_q2(self.C["x"], i, n, self.N_i, self.N_n), 0, rhsopt + 0.01)
+                        n = np.arange(self.horizons[i])
+                        self.B.setRanges(_q2(self.C["x"], i, n, self.N_i, self.N_n), 0, rhsopt + 0.01)
 
             if "startRothConversions" in options:
                 rhsopt = options["startRothConversions"]
@@ -1164,8 +1539,8 @@ class Plan(object):
                 yearn = max(rhsopt - thisyear, 0)
                 for i in range(self.N_i):
                     nstart = min(yearn, self.horizons[i])
-                    for n in range(0, nstart):
-                        self.B.setRange(_q2(self.C["x"], i, n, self.N_i, self.N_n), 0, 0)
+                    n = np.arange(0, nstart)
+                    self.B.setRanges(_q2(self.C["x"], i, n, self.N_i, self.N_n), 0, 0)
 
             if "noRothConversions" in options and options["noRothConversions"] != "None":
                 rhsopt = options["noRothConversions"]
@@ -1173,26 +1548,24 @@ class Plan(object):
                     i_x = self.inames.index(rhsopt)
                 except ValueError as e:
                     raise ValueError(f"Unknown individual {rhsopt} for noRothConversions:") from e
-                for n in range(self.N_n):
-                    self.B.setRange(_q2(self.C["x"], i_x, n, self.N_i, self.N_n), 0, 0)
+                n = np.arange(self.N_n)
+                self.B.setRanges(_q2(self.C["x"], i_x, n, self.N_i, self.N_n), 0, 0)
 
     def _add_withdrawal_limits(self):
-        for i in range(self.N_i):
-            for j in [0, 2]:
-                for n in range(self.N_n):
-                    rowDic = {_q3(self.C["w"], i, j, n, self.N_i, self.N_j, self.N_n): -1,
-                              _q3(self.C["b"], i, j, n, self.N_i, self.N_j, self.N_n + 1): 1}
-                    self.A.addNewRow(rowDic, 0, np.inf)
+        i = np.arange(self.N_i)[:, None, None]
+        j = np.array([0, 2])[None, :, None]
+        n = np.arange(self.N_n)[None, None, :]
+        ind = np.stack([_q3(self.C["w"], i, j, n, self.N_i, self.N_j, self.N_n),
+                        _q3(self.C["b"], i, j, n, self.N_i, self.N_j, self.N_n + 1)], axis=-1)
+        self.A.addRows(ind.reshape(-1, 2), [-1, 1], 0, np.inf)
 
     def _add_conversion_limits(self):
-        for i in range(self.N_i):
-            for n in range(self.N_n):
-                rowDic = {
-                    _q2(self.C["x"], i, n, self.N_i, self.N_n): -1,
-                    _q3(self.C["w"], i, 1, n, self.N_i, self.N_j, self.N_n): -1,
-                    _q3(self.C["b"], i, 1, n, self.N_i, self.N_j, self.N_n + 1): 1,
-                }
-                self.A.addNewRow(rowDic, 0, np.inf)
+        i = np.arange(self.N_i)[:, None]
+        n = np.arange(self.N_n)[None, :]
+        ind = np.stack([_q2(self.C["x"], i, n, self.N_i, self.N_n),
+                        _q3(self.C["w"], i, 1, n, self.N_i, self.N_j, self.N_n),
+                        _q3(self.C["b"], i, 1, n, self.N_i, self.N_j, self.N_n + 1)], axis=-1)
+        self.A.addRows(ind.reshape(-1, 3), [-1, -1, 1], 0, np.inf)
 
     def _add_objective_constraints(self, objective, options):
         if objective == "maxSpending":
@@ -1221,128 +1594,169 @@ class Plan(object):
         # Back project balances to the beginning of the year.
         yearSpent = 1 - self.yearFracLeft
 
-        for i in range(self.N_i):
-            for j in range(self.N_j):
-                backTau = 1 + yearSpent * np.sum(self.tau_kn[:, 0] * self.alpha_ijkn[i, j, :, 0])
-                rhs = self.beta_ij[i, j] / backTau
-                self.B.setRange(_q3(self.C["b"], i, j, 0, self.N_i, self.N_j, self.N_n + 1), rhs, rhs)
+        backTau_ij = 1 + yearSpent * np.sum(self.tau_kn[:, 0] * self.alpha_ijkn[:, :, :, 0], axis=-1)
+        rhs = self.beta_ij / backTau_ij
+        i = np.arange(self.N_i)[:, None]
+        j = np.arange(self.N_j)[None, :]
+        self.B.setRanges(_q3(self.C["b"], i, j, 0, self.N_i, self.N_j, self.N_n + 1), rhs, rhs)
 
     def _add_surplus_deposit_linking(self):
         for i in range(self.N_i):
             fac1 = u.krond(i, 0) * (1 - self.eta) + u.krond(i, 1) * self.eta
-            for n in range(self.n_d):
-                rowDic = {_q2(self.C["d"], i, n, self.N_i, self.N_n): 1, _q1(self.C["s"], n, self.N_n): -fac1}
-                self.A.addNewRow(rowDic, 0, 0)
             fac2 = u.krond(self.i_s, i)
-            for n in range(self.n_d, self.N_n):
-                rowDic = {_q2(self.C["d"], i, n, self.N_i, self.N_n): 1, _q1(self.C["s"], n, self.N_n): -fac2}
-                self.A.addNewRow(rowDic, 0, 0)
+            n = np.arange(self.N_n)
+            ind = np.column_stack([_q2(self.C["d"], i, n, self.N_i, self.N_n), _q1(self.C["s"], n, self.N_n)])
+            val = np.column_stack([np.ones(self.N_n), np.where(n < self.n_d, -fac1, -fac2)])
+            self.A.addRows(ind, val, 0, 0)
         # Prevent surplus on last year.
         self.B.setRange(_q1(self.C["s"], self.N_n - 1, self.N_n), 0, 0)
 
     def _add_account_balance_carryover(self):
-        tau_ijn = np.zeros((self.N_i, self.N_j, self.N_n))
-        for i in range(self.N_i):
-            for j in range(self.N_j):
-                for n in range(self.N_n):
-                    tau_ijn[i, j, n] = np.sum(self.alpha_ijkn[i, j, :, n] * self.tau_kn[:, n], axis=0)
+        tau_ijn = np.sum(self.alpha_ijkn[:, :, :, :self.N_n] * self.tau_kn[None, None, :, :], axis=2)
 
         # Weights are normalized on k: sum_k[alpha*(1 + tau)] = 1 + sum_k[alpha*tau]
         Tau1_ijn = 1 + tau_ijn
         Tauh_ijn = 1 + tau_ijn / 2
 
-        for i in range(self.N_i):
-            for j in range(self.N_j):
-                for n in range(self.N_n):
-                    if self.N_i == 2 and self.n_d < self.N_n and i == self.i_d and n == self.n_d - 1:
-                        fac1 = 0
-                    else:
-                        fac1 = 1
-
-                    rhs = fac1 * self.kappa_ijn[i, j, n] * Tauh_ijn[i, j, n]
-
-                    row = self.A.newRow()
-                    row.addElem(_q3(self.C["b"], i, j, n + 1, self.N_i, self.N_j, self.N_n + 1), 1)
-                    row.addElem(_q3(self.C["b"], i, j, n, self.N_i, self.N_j, self.N_n + 1), -fac1 * Tau1_ijn[i, j, n])
-                    row.addElem(_q3(self.C["w"], i, j, n, self.N_i, self.N_j, self.N_n), fac1 * Tau1_ijn[i, j, n])
-                    row.addElem(_q2(self.C["d"], i, n, self.N_i, self.N_n), -fac1 * u.krond(j, 0) * Tau1_ijn[i, 0, n])
-                    row.addElem(
-                        _q2(self.C["x"], i, n, self.N_i, self.N_n),
-                        -fac1 * (self.xnet * u.krond(j, 2) - u.krond(j, 1)) * Tau1_ijn[i, j, n],
-                    )
-
-                    if self.N_i == 2 and self.n_d < self.N_n and i == self.i_s and n == self.n_d - 1:
-                        fac2 = self.phi_j[j]
-                        rhs += fac2 * self.kappa_ijn[self.i_d, j, n] * Tauh_ijn[self.i_d, j, n]
-                        row.addElem(_q3(self.C["b"], self.i_d, j, n, self.N_i, self.N_j, self.N_n + 1),
-                                    -fac2 * Tau1_ijn[self.i_d, j, n])
-                        row.addElem(_q3(self.C["w"], self.i_d, j, n, self.N_i, self.N_j, self.N_n),
-                                    fac2 * Tau1_ijn[self.i_d, j, n])
-                        row.addElem(_q2(self.C["d"], self.i_d, n, self.N_i, self.N_n),
-                                    -fac2 * u.krond(j, 0) * Tau1_ijn[self.i_d, 0, n])
-                        row.addElem(
-                            _q2(self.C["x"], self.i_d, n, self.N_i, self.N_n),
-                            -fac2 * (self.xnet * u.krond(j, 2) - u.krond(j, 1)) * Tau1_ijn[self.i_d, j, n],
-                        )
-                    self.A.addRow(row, rhs, rhs)
+        i = np.arange(self.N_i)[:, None, None]
+        j = np.arange(self.N_j)[None, :, None]
+        n = np.arange(self.N_n)[None, None, :]
+        shape = (self.N_i, self.N_j, self.N_n)
+        kj0 = (j == 0).astype(float)
+        kjx = self.xnet * (j == 2) - (j == 1)
+
+        fac1 = np.ones(shape)
+        if self.N_i == 2 and self.n_d < self.N_n:
+            fac1[self.i_d, :, self.n_d - 1] = 0
+
+        rhs = fac1 * self.kappa_ijn[:, :, :self.N_n] * Tauh_ijn
+        ind = [
+            _q3(self.C["b"], i, j, n + 1, self.N_i, self.N_j, self.N_n + 1),
+            _q3(self.C["b"], i, j, n, self.N_i, self.N_j, self.N_n + 1),
+            _q3(self.C["w"], i, j, n, self.N_i, self.N_j, self.N_n),
+            _q2(self.C["d"], i, n, self.N_i, self.N_n),
+            _q2(self.C["x"], i, n, self.N_i, self.N_n),
+        ]
+        val = [
+            np.ones(shape),
+            -fac1 * Tau1_ijn,
+            fac1 * Tau1_ijn,
+            -fac1 * kj0 * Tau1_ijn[:, 0:1, :],
+            -fac1 * kjx * Tau1_ijn,
+        ]
+        ind = [np.broadcast_to(item, shape) for item in ind]
+
+        # Transfer accounts of deceased spouse to surviving spouse.
+        if self.N_i == 2 and self.n_d < self.N_n:
+            nx = self.n_d - 1
+            i_d = self.i_d
+            fac2 = np.zeros(shape)
+            fac2[self.i_s, :, nx] = self.phi_j
+            rhs += fac2 * self.kappa_ijn[i_d, :, nx][None, :, None] * Tauh_ijn[i_d, :, nx][None, :, None]
+            transfer = fac2 != 0
+            jj = np.arange(self.N_j)
+            ind.extend([
+                np.where(transfer, _q3(self.C["b"], i_d, jj, nx, self.N_i, self.N_j, self.N_n + 1)[None, :, None], -1),
+                np.where(transfer, _q3(self.C["w"], i_d, jj, nx, self.N_i, self.N_j, self.N_n)[None, :, None], -1),
+                np.where(transfer, _q2(self.C["d"], i_d, nx, self.N_i, self.N_n), -1),
+                np.where(transfer, _q2(self.C["x"], i_d, nx, self.N_i, self.N_n), -1),
+            ])
+            val.extend([
+                -fac2 * Tau1_ijn[i_d, :, nx][None, :, None],
+                fac2 * Tau1_ijn[i_d, :, nx][None, :, None],
+                -fac2 * kj0 * Tau1_ijn[i_d, 0, nx],
+                -fac2 * kjx * Tau1_ijn[i_d, :, nx][None, :, None],
+            ])
+
+        ind = np.stack(ind, axis=-1).reshape(-1, len(ind))
+        val = np.stack(val, axis=-1).reshape(-1, len(val))
+        self.A.addRows(ind, val, rhs.ravel(), rhs.ravel())
 
     def _add_net_cash_flow(self):
         tau_0prev = np.roll(self.tau_kn[0, :], 1)
         tau_0prev[tau_0prev < 0] = 0
-        for n in range(self.N_n):
-            rhs = -self.M_n[n] - self.J_n[n]
-            row = self.A.newRow({_q1(self.C["g"], n, self.N_n): 1})
-            row.addElem(_q1(self.C["s"], n, self.N_n), 1)
-            row.addElem(_q1(self.C["m"], n, self.N_n), 1)
-            for i in range(self.N_i):
-                fac = self.psi_n[n] * self.alpha_ijkn[i, 0, 0, n]
-                rhs += (
-                    self.omega_in[i, n]
-                    + self.zetaBar_in[i, n]
-                    + self.piBar_in[i, n]
-                    + self.Lambda_in[i, n]
-                    - 0.5 * fac * self.mu * self.kappa_ijn[i, 0, n]
-                )
-                row.addElem(_q3(self.C["b"], i, 0, n, self.N_i, self.N_j, self.N_n + 1), fac * self.mu)
-                row.addElem(_q3(self.C["w"], i, 0, n, self.N_i, self.N_j, self.N_n), fac * (tau_0prev[n] - self.mu) - 1)
-                penalty = 0.1 if n < self.n59[i] else 0
-                row.addElem(_q3(self.C["w"], i, 1, n, self.N_i, self.N_j, self.N_n), -1 + penalty)
-                row.addElem(_q3(self.C["w"], i, 2, n, self.N_i, self.N_j, self.N_n), -1 + penalty)
-                row.addElem(_q2(self.C["d"], i, n, self.N_i, self.N_n), fac * self.mu)
-
-            for t in range(self.N_t):
-                row.addElem(_q2(self.C["f"], t, n, self.N_t, self.N_n), self.theta_tn[t, n])
+        n = np.arange(self.N_n)
+        i = np.arange(self.N_i)[:, None]
+        Nn = self.N_n
+        fac_in = self.psi_n * self.alpha_ijkn[:, 0, 0, :Nn]
+        penalty_in = np.where(n < self.n59[:, None], 0.1, 0)
+        rhs = -self.M_n - self.J_n
+        for ii in range(self.N_i):
+            rhs = rhs + (
+                self.omega_in[ii]
+                + self.zetaBar_in[ii]
+                + self.piBar_in[ii]
+                + self.Lambda_in[ii]
+                - 0.5 * fac_in[ii] * self.mu * self.kappa_ijn[ii, 0, :Nn]
+            )
 
-            self.A.addRow(row, rhs, rhs)
+        ind = [_q1(self.C["g"], n, Nn), _q1(self.C["s"], n, Nn), _q1(self.C["m"], n, Nn)]
+        val = [np.ones(Nn), np.ones(Nn), np.ones(Nn)]
+        # Elements of each individual are interleaved.
+        ind_in = np.stack([
+            _q3(self.C["b"], i, 0, n, self.N_i, self.N_j, Nn + 1),
+            _q3(self.C["w"], i, 0, n, self.N_i, self.N_j, Nn),
+            _q3(self.C["w"], i, 1, n, self.N_i, self.N_j, Nn),
+            _q3(self.C["w"], i, 2, n, self.N_i, self.N_j, Nn),
+            _q2(self.C["d"], i, n, self.N_i, Nn),
+        ], axis=-1)
+        val_in = np.stack([
+            fac_in * self.mu,
+            fac_in * (tau_0prev - self.mu) - 1,
+            -1 + penalty_in,
+            -1 + penalty_in,
+            fac_in * self.mu,
+        ], axis=-1)
+        ind.extend(ind_in.transpose(1, 0, 2).reshape(Nn, -1).T)
+        val.extend(val_in.transpose(1, 0, 2).reshape(Nn, -1).T)
+        ind.extend(_q2(self.C["f"], np.arange(self.N_t)[:, None], n, self.N_t, Nn))
+        val.extend(self.theta_tn)
+
+        self.A.addRows(np.column_stack(ind), np.column_stack(val), rhs, rhs)
 
     def _add_income_profile(self):
         spLo = 1 - self.lambdha
         spHi = 1 + self.lambdha
-        for n in range(1, self.N_n):
-            rowDic = {_q1(self.C["g"], 0, self.N_n): spLo * self.xiBar_n[n],
-                      _q1(self.C["g"], n, self.N_n): -self.xiBar_n[0]}
-            self.A.addNewRow(rowDic, -np.inf, 0)
-            rowDic = {_q1(self.C["g"], 0, self.N_n): spHi * self.xiBar_n[n],
-                      _q1(self.C["g"], n, self.N_n): -self.xiBar_n[0]}
-            self.A.addNewRow(rowDic, 0, np.inf)
+        n = np.arange(1, self.N_n)
+        g0 = np.full(len(n), _q1(self.C["g"], 0, self.N_n))
+        gn = _q1(self.C["g"], n, self.N_n)
+        # Alternate lower and upper rows for each year.
+        ind = np.stack([np.column_stack([g0, gn]), np.column_stack([g0, gn])], axis=1).reshape(-1, 2)
+        val = np.stack([
+            np.column_stack([spLo * self.xiBar_n[n], np.full(len(n), -self.xiBar_n[0])]),
+            np.column_stack([spHi * self.xiBar_n[n], np.full(len(n), -self.xiBar_n[0])]),
+        ], axis=1).reshape(-1, 2)
+        lb = np.tile([-np.inf, 0], len(n))
+        ub = np.tile([0, np.inf], len(n))
+        self.A.addRows(ind, val, lb, ub)
 
     def _add_taxable_income(self):
-        for n in range(self.N_n):
-            rhs = 0
-            row = self.A.newRow()
-            row.addElem(_q1(self.C["e"], n, self.N_n), 1)
-            for i in range(self.N_i):
-                rhs += self.omega_in[i, n] + 0.85 * self.zetaBar_in[i, n] + self.piBar_in[i, n]
-                row.addElem(_q3(self.C["w"], i, 1, n, self.N_i, self.N_j, self.N_n), -1)
-                row.addElem(_q2(self.C["x"], i, n, self.N_i, self.N_n), -1)
-                fak = np.sum(self.tau_kn[1:self.N_k, n] * self.alpha_ijkn[i, 0, 1:self.N_k, n], axis=0)
-                rhs += 0.5 * fak * self.kappa_ijn[i, 0, n]
-                row.addElem(_q3(self.C["b"], i, 0, n, self.N_i, self.N_j, self.N_n + 1), -fak)
-                row.addElem(_q3(self.C["w"], i, 0, n, self.N_i, self.N_j, self.N_n), fak)
-                row.addElem(_q2(self.C["d"], i, n, self.N_i, self.N_n), -fak)
-            for t in range(self.N_t):
-                row.addElem(_q2(self.C["f"], t, n, self.N_t, self.N_n), 1)
-            self.A.addRow(row, rhs, rhs)
+        Nn = self.N_n
+        n = np.arange(Nn)
+        i = np.arange(self.N_i)[:, None]
+        fak_in = np.sum(self.tau_kn[None, 1:self.N_k, :] * self.alpha_ijkn[:, 0, 1:self.N_k, :Nn], axis=1)
+        rhs = np.zeros(Nn)
+        for ii in range(self.N_i):
+            rhs += self.omega_in[ii] + 0.85 * self.zetaBar_in[ii] + self.piBar_in[ii]
+            rhs += 0.5 * fak_in[ii] * self.kappa_ijn[ii, 0, :Nn]
+
+        ind = [_q1(self.C["e"], n, Nn)]
+        val = [np.ones(Nn)]
+        ind_in = np.stack([
+            _q3(self.C["w"], i, 1, n, self.N_i, self.N_j, Nn),
+            _q2(self.C["x"], i, n, self.N_i, Nn),
+            _q3(self.C["b"], i, 0, n, self.N_i, self.N_j, Nn + 1),
+            _q3(self.C["w"], i, 0, n, self.N_i, self.N_j, Nn),
+            _q2(self.C["d"], i, n, self.N_i, Nn),
+        ], axis=-1)
+        ones = np.ones((self.N_i, Nn))
+        val_in = np.stack([-ones, -ones, -fak_in, fak_in, -fak_in], axis=-1)
+        ind.extend(ind_in.transpose(1, 0, 2).reshape(Nn, -1).T)
+        val.extend(val_in.transpose(1, 0, 2).reshape(Nn, -1).T)
+        ind.extend(_q2(self.C["f"], np.arange(self.N_t)[:, None], n, self.N_t, Nn))
+        val.extend(np.ones((self.N_t, Nn)))
+
+        self.A.addRows(np.column_stack(ind), np.column_stack(val), rhs, rhs)
 
     def _configure_exclusion_binary_variables(self, options):
         if not options.get("xorConstraints", True):
@@ -1353,37 +1767,27 @@ class Plan(object):
             raise ValueError(f"bigM {bigM} is not a number.")
 
         for i in range(self.N_i):
-            for n in range(self.horizons[i]):
-                self.A.addNewRow(
-                    {_q3(self.C["zx"], i, n, 0, self.N_i, self.N_n, self.N_zx): bigM,
-                     _q1(self.C["s"], n, self.N_n): -1},
-                    0,
-                    bigM,
-                )
-                self.A.addNewRow(
-                    {
-                        _q3(self.C["zx"], i, n, 0, self.N_i, self.N_n, self.N_zx): bigM,
-                        _q3(self.C["w"], i, 0, n, self.N_i, self.N_j, self.N_n): 1,
-                        _q3(self.C["w"], i, 2, n, self.N_i, self.N_j, self.N_n): 1,
-                    },
-                    0,
-                    bigM,
-                )
-                self.A.addNewRow(
-                    {_q3(self.C["zx"], i, n, 1, self.N_i, self.N_n, self.N_zx): bigM,
-                     _q2(self.C["x"], i, n, self.N_i, self.N_n): -1},
-                    0,
-                    bigM,
-                )
-                self.A.addNewRow(
-                    {_q3(self.C["zx"], i, n, 1, self.N_i, self.N_n, self.N_zx): bigM,
-                     _q3(self.C["w"], i, 2, n, self.N_i, self.N_j, self.N_n): 1},
-                    0,
-                    bigM,
-                )
-            for n in range(self.horizons[i], self.N_n):
-                self.B.setRange(_q3(self.C["zx"], i, n, 0, self.N_i, self.N_n, self.N_zx), 0, 0)
-                self.B.setRange(_q3(self.C["zx"], i, n, 1, self.N_i, self.N_n, self.N_zx), 0, 0)
+            n = np.arange(self.horizons[i])
+            zx0 = _q3(self.C["zx"], i, n, 0, self.N_i, self.N_n, self.N_zx)
+            zx1 = _q3(self.C["zx"], i, n, 1, self.N_i, self.N_n, self.N_zx)
+            s = _q1(self.C["s"], n, self.N_n)
+            w0 = _q3(self.C["w"], i, 0, n, self.N_i, self.N_j, self.N_n)
+            w2 = _q3(self.C["w"], i, 2, n, self.N_i, self.N_j, self.N_n)
+            x = _q2(self.C["x"], i, n, self.N_i, self.N_n)
+            none = np.full(len(n), -1)
+            # Four rows per year.
+            ind = np.stack([
+                np.column_stack([zx0, s, none]),
+                np.column_stack([zx0, w0, w2]),
+                np.column_stack([zx1, x, none]),
+                np.column_stack([zx1, w2, none]),
+            ], axis=1).reshape(-1, 3)
+            val = np.tile([[bigM, -1, 0], [bigM, 1, 1], [bigM, -1, 0], [bigM, 1, 0]], (len(n), 1))
+            self.A.addRows(ind, val, 0, bigM)
+
+            n = np.arange(self.horizons[i], self.N_n)
+            self.B.setRanges(_q3(self.C["zx"], i, n, 0, self.N_i, self.N_n, self.N_zx), 0, 0)
+            self.B.setRanges(_q3(self.C["zx"], i, n, 1, self.N_i, self.N_n, self.N_zx), 0, 0)
 
     def _configure_Medicare_binary_variables(self, options):
         if options.get("withMedicare", "loop") != "optimize":
@@ -1394,71 +1798,75 @@ class Plan(object):
             raise ValueError(f"bigM {bigM} is not a number.")
 
         Nmed = self.N_n - self.nm
+        Nq1 = self.N_q - 1
+        q = np.arange(Nq1)
         offset = 0
         if self.nm < 2:
             offset = 2 - self.nm
-            for nn in range(offset):
-                n = self.nm + nn
-                for q in range(self.N_q - 1):
-                    self.A.addNewRow({_q2(self.C["zm"], nn, q, Nmed, self.N_q - 1): bigM},
-                                     -np.inf, bigM - self.L_nq[nn, q] + self.prevMAGI[n])
-                    self.A.addNewRow({_q2(self.C["zm"], nn, q, Nmed, self.N_q - 1): -bigM},
-                                     -np.inf, self.L_nq[nn, q] - self.prevMAGI[n])
-
-        for nn in range(offset, Nmed):
-            n2 = self.nm + nn - 2  # n - 2
-            for q in range(self.N_q - 1):
-                rhs1 = bigM - self.L_nq[nn, q]
-                rhs2 = self.L_nq[nn, q]
-                row1 = self.A.newRow()
-                row2 = self.A.newRow()
-
-                row1.addElem(_q2(self.C["zm"], nn, q, Nmed, self.N_q - 1), +bigM)
-                row2.addElem(_q2(self.C["zm"], nn, q, Nmed, self.N_q - 1), -bigM)
-                for i in range(self.N_i):
-                    row1.addElem(_q3(self.C["w"], i, 1, n2, self.N_i, self.N_j, self.N_n), -1)
-                    row2.addElem(_q3(self.C["w"], i, 1, n2, self.N_i, self.N_j, self.N_n), +1)
-
-                    row1.addElem(_q2(self.C["x"], i, n2, self.N_i, self.N_n), -1)
-                    row2.addElem(_q2(self.C["x"], i, n2, self.N_i, self.N_n), +1)
-
-                    afac = (self.mu*self.alpha_ijkn[i, 0, 0, n2]
-                            + np.sum(self.alpha_ijkn[i, 0, 1:, n2]*self.tau_kn[1:, n2]))
-                    afac = 0
-                    row1.addElem(_q3(self.C["b"], i, 0, n2, self.N_i, self.N_j, self.N_n + 1), -afac)
-                    row2.addElem(_q3(self.C["b"], i, 0, n2, self.N_i, self.N_j, self.N_n + 1), +afac)
-
-                    row1.addElem(_q2(self.C["d"], i, n2, self.N_i, self.N_n), -afac)
-                    row2.addElem(_q2(self.C["d"], i, n2, self.N_i, self.N_n), +afac)
-
-                    bfac = self.alpha_ijkn[i, 0, 0, n2] * max(0, self.tau_kn[0, max(0, n2-1)])
-                    row1.addElem(_q3(self.C["w"], i, 0, n2, self.N_i, self.N_j, self.N_n), +afac - bfac)
-                    row2.addElem(_q3(self.C["w"], i, 0, n2, self.N_i, self.N_j, self.N_n), -afac + bfac)
-
-                    sumoni = (self.omega_in[i, n2] + self.psi_n[n2] * self.zetaBar_in[i, n2] + self.piBar_in[i, n2]
-                              + 0.5 * self.kappa_ijn[i, 0, n2] * afac)
-                    rhs1 += sumoni
-                    rhs2 -= sumoni
-
-                self.A.addRow(row1, -np.inf, rhs1)
-                self.A.addRow(row2, -np.inf, rhs2)
+            nn = np.arange(offset)[:, None]
+            n = self.nm + nn
+            zm = np.broadcast_to(_q2(self.C["zm"], nn, q, Nmed, Nq1), (offset, Nq1))
+            ind = np.stack([zm, zm], axis=-1).reshape(-1, 1)
+            val = np.tile([bigM, -bigM], offset * Nq1)[:, None]
+            L = self.L_nq[:offset]
+            ub = np.stack([bigM - L + self.prevMAGI[n], L - self.prevMAGI[n]], axis=-1).ravel()
+            self.A.addRows(ind, val, -np.inf, ub)
+
+        nn = np.arange(offset, Nmed)
+        n2 = self.nm + nn - 2  # n - 2
+        i = np.arange(self.N_i)[:, None]
+        afac = 0
+        # afac = (self.mu*self.alpha_ijkn[i, 0, 0, n2]
+        #         + np.sum(self.alpha_ijkn[i, 0, 1:, n2]*self.tau_kn[1:, n2]))
+        bfac = self.alpha_ijkn[:, 0, 0, n2] * np.maximum(0, self.tau_kn[0, np.maximum(0, n2 - 1)])
+        sumoni_in = (self.omega_in[:, n2] + self.psi_n[n2] * self.zetaBar_in[:, n2] + self.piBar_in[:, n2]
+                     + 0.5 * self.kappa_ijn[:, 0, n2] * afac)
+
+        # Elements of each individual are interleaved.
+        ind_in = np.stack([
+            _q3(self.C["w"], i, 1, n2, self.N_i, self.N_j, self.N_n),
+            _q2(self.C["x"], i, n2, self.N_i, self.N_n),
+            _q3(self.C["b"], i, 0, n2, self.N_i, self.N_j, self.N_n + 1),
+            _q2(self.C["d"], i, n2, self.N_i, self.N_n),
+            _q3(self.C["w"], i, 0, n2, self.N_i, self.N_j, self.N_n),
+        ], axis=-1).transpose(1, 0, 2).reshape(len(nn), -1)
+        ones = np.ones((self.N_i, len(nn)))
+        val_in = np.stack([-ones, -ones, -afac * ones, -afac * ones, afac - bfac],
+                          axis=-1).transpose(1, 0, 2).reshape(len(nn), -1)
+
+        # Two rows for each year and bracket.
+        zm = _q2(self.C["zm"], nn[:, None], q[None, :], Nmed, Nq1)
+        ind = np.concatenate([zm[:, :, None], np.broadcast_to(ind_in[:, None, :], zm.shape + ind_in.shape[-1:])],
+                             axis=-1)
+        val1 = np.concatenate([np.full(zm.shape + (1,), bigM),
+                               np.broadcast_to(val_in[:, None, :], zm.shape + val_in.shape[-1:])], axis=-1)
+        ind = np.stack([ind, ind], axis=2).reshape(-1, ind.shape[-1])
+        val = np.stack([val1, -val1], axis=2).reshape(-1, val1.shape[-1])
+        L = self.L_nq[nn]
+        rhs1 = bigM - L
+        rhs2 = L
+        for ii in range(self.N_i):
+            rhs1 = rhs1 + sumoni_in[ii][:, None]
+            rhs2 = rhs2 - sumoni_in[ii][:, None]
+        ub = np.stack([rhs1, rhs2], axis=-1).ravel()
+        self.A.addRows(ind, val, -np.inf, ub)
 
     def _add_Medicare_costs(self, options):
         if options.get("withMedicare", "loop") != "optimize":
             return
 
-        for n in range(self.nm):
-            self.B.setRange(_q1(self.C["m"], n, self.N_n), 0, 0)
+        self.B.setRanges(_q1(self.C["m"], np.arange(self.nm), self.N_n), 0, 0)
 
         Nmed = self.N_n - self.nm
-        for nn in range(Nmed):
-            n = self.nm + nn
-            row = self.A.newRow()
-            row.addElem(_q1(self.C["m"], n, self.N_n), 1)
-            for q in range(self.N_q - 1):
-                row.addElem(_q2(self.C["zm"], nn, q, Nmed, self.N_q - 1), -self.C_nq[nn, q+1])
-            self.A.addRow(row, self.C_nq[nn, 0], self.C_nq[nn, 0])
-
+        nn = np.arange(Nmed)
+        n = self.nm + nn
+        q = np.arange(self.N_q - 1)
+        ind = np.column_stack([_q1(self.C["m"], n, self.N_n),
+                               _q2(self.C["zm"], nn[:, None], q[None, :], Nmed, self.N_q - 1)])
+        val = np.column_stack([np.ones(Nmed), -self.C_nq[:, 1:]])
+        self.A.addRows(ind, val, self.C_nq[:, 0], self.C_nq[:, 0])
+
+    @_phase("objective")
     def _build_objective_vector(self, objective):
         c = abc.Objective(self.nvars)
         if objective == "maxSpending":
@@ -1473,10 +1881,13 @@ class Plan(object):
             raise RuntimeError("Internal error in objective function.")
         self.c = c
 
+    @_profiled
     @_timer
-    def runHistoricalRange(self, objective, options, ystart, yend, *, verbose=False, figure=False, progcall=None):
+    def runHistoricalRange(self, objective, options, ystart, yend, *, verbose=False, figure=False, progcall=None,
+                           workers=None):
         """
         Run historical scenarios on plan over a range of years.
+        Scenarios can be spread over ``workers`` processes.
         """
 
         if yend + self.N_n > self.year_n[0]:
@@ -1491,15 +1902,12 @@ class Plan(object):
 
         self.mylog.setVerbose(verbose)
 
-        if objective == "maxSpending":
-            columns = ["partial", objective]
-        elif objective == "maxBequest":
-            columns = ["partial", "final"]
-        else:
+        if objective not in ("maxSpending", "maxBequest"):
             self.mylog.print(f"Invalid objective {objective}.")
             raise ValueError(f"Invalid objective {objective}.")
 
-        df = pd.DataFrame(columns=columns)
+        years = np.arange(ystart, yend + 1)
+        results = scenarios.ScenarioResults(N, objective, labels=years)
 
         if progcall is None:
             progcall = progress.Progress(self.mylog)
@@ -1507,81 +1915,215 @@ class Plan(object):
         if not verbose:
             progcall.start()
 
-        for year in range(ystart, yend + 1):
-            self.setRates("historical", year)
-            self.solve(objective, options)
+        stats = solvestats.SolveStats()
+        tasks = [(objective, options, int(year)) for year in years]
+        for n, (values, solveStats) in enumerate(self._runScenarios(_histScenario, tasks, workers)):
+            results.record(n, values)
+            stats.merge(solveStats)
             if not verbose:
-                progcall.show((year - ystart + 1) / N)
-            if self.caseStatus == "solved":
-                if objective == "maxSpending":
-                    df.loc[len(df)] = [self.partialBequest, self.basis]
-                elif objective == "maxBequest":
-                    df.loc[len(df)] = [self.partialBequest, self.bequest]
+                progcall.show((n + 1) / N)
 
         progcall.finish()
         self.mylog.resetVerbose()
 
-        fig, description = self._plotter.plot_histogram_results(objective, df, N, self.year_n,
-                                                                self.n_d, self.N_i, self.phi_j)
-        self.mylog.print(description.getvalue())
-
-        if figure:
-            return fig, description.getvalue()
+        self._stats = stats
+        self.scenarioResults = results
 
-        return N, df
+        return self.showScenarioResults(figure)
 
+    @_profiled
     @_timer
-    def runMC(self, objective, options, N, verbose=False, figure=False, progcall=None):
+    def runMC(self, objective, options, N, verbose=False, figure=False, progcall=None, workers=None, seed=None):
         """
         Run Monte Carlo simulations on plan.
+        Each scenario draws its rates from its own random stream spawned from
+        ``seed``, or from the seed given to setRates(). If no seed was provided,
+        streams are spawned from numpy's global random state.
+        Scenarios can be spread over ``workers`` processes, each working on a
+        copy of the plan, while giving the same results in the same order as a serial run.
         """
         if self.rateMethod not in ("stochastic", "histochastic"):
             self.mylog.print("It is pointless to run Monte Carlo simulations with fixed rates.")
             return
 
         self.mylog.vprint(f"Running {N} Monte Carlo simulations.")
-        self.mylog.setVerbose(verbose)
-
-        myoptions = options
 
-        if objective == "maxSpending":
-            columns = ["partial", objective]
-        elif objective == "maxBequest":
-            columns = ["partial", "final"]
-        else:
+        if objective not in ("maxSpending", "maxBequest"):
             self.mylog.print(f"Invalid objective {objective}.")
             return None
 
-        df = pd.DataFrame(columns=columns)
-
         if progcall is None:
             progcall = progress.Progress(self.mylog)
 
         if not verbose:
             progcall.start()
 
-        for n in range(N):
-            self.regenRates()
-            self.solve(objective, myoptions)
+        for n, _, _ in self.iterMC(objective, options, N, workers=workers, seed=seed, verbose=verbose):
             if not verbose:
                 progcall.show((n + 1) / N)
-            if self.caseStatus == "solved":
-                if objective == "maxSpending":
-                    df.loc[len(df)] = [self.partialBequest, self.basis]
-                elif objective == "maxBequest":
-                    df.loc[len(df)] = [self.partialBequest, self.bequest]
 
         progcall.finish()
-        self.mylog.resetVerbose()
 
-        fig, description = self._plotter.plot_histogram_results(objective, df, N, self.year_n,
+        return self.showScenarioResults(figure)
+
+    @_profiled
+    def iterMC(self, objective, options, N, *, workers=None, seed=None, ciWidth=None, confidence=0.95,
+               minScenarios=30, verbose=False):
+        """
+        Generator running Monte Carlo simulations on plan, and yielding each scenario as it completes.
+        Scenarios are drawn and solved as in runMC(), and yielded in order as tuples of
+        the index of the scenario, a dictionary of its values keyed by ``ScenarioResults.fields``,
+        and running statistics of all scenarios completed so far (see ``scenarios.RunningStats``).
+
+        If ``ciWidth`` is provided, simulations stop once the width of the ``confidence`` interval
+        on the success rate falls below ``ciWidth``, after at least ``minScenarios`` scenarios.
+        Simulations also stop when the generator is closed. Results of all scenarios completed
+        are then found in ``scenarioResults``, and can be plotted with showScenarioResults().
+        """
+        if self.rateMethod not in ("stochastic", "histochastic"):
+            raise RuntimeError("Monte Carlo simulations require stochastic or histochastic rates.")
+
+        if objective not in ("maxSpending", "maxBequest"):
+            raise ValueError(f"Invalid objective {objective}.")
+
+        # Draw all scenarios up front, each from its own random stream.
+        if seed is None:
+            seed = self.rateSeed
+        if seed is None:
+            seed = np.random.randint(2**31, size=4)
+        seeds = np.random.SeedSequence(seed).spawn(N)
+        tau_skn, gamma_sn = self._genRateSeriesBatch(N, [np.random.default_rng(seed) for seed in seeds])
+        tasks = [(objective, options, tau_skn[n], gamma_sn[n]) for n in range(N)]
+
+        results = scenarios.ScenarioResults(N, objective)
+        running = scenarios.RunningStats(objective)
+        stats = solvestats.SolveStats()
+        self.scenarioResults = results
+        self._stats = stats
+
+        self.mylog.setVerbose(verbose)
+        solved = self._runScenarios(_mcScenario, tasks, workers)
+        count = 0
+        try:
+            for values, solveStats in solved:
+                results.record(count, values)
+                running.add(values)
+                stats.merge(solveStats)
+                count += 1
+                yield count - 1, dict(zip(results.fields, values, strict=True)), running
+
+                if ciWidth is not None and count >= minScenarios:
+                    lo, hi = running.successInterval(confidence)
+                    if hi - lo < ciWidth:
+                        self.mylog.vprint(f"Stopping after {count} scenarios with success rate"
+                                          f" between {u.pc(lo)} and {u.pc(hi)}.")
+                        break
+        finally:
+            # Scenarios not yet solved are dropped if simulations are stopped early.
+            solved.close()
+            self.mylog.resetVerbose()
+            if count < N:
+                results.truncate(count)
+            self._stats = stats
+
+    def showScenarioResults(self, figure=False):
+        """
+        Plot histogram and print summary of the results of the scenarios
+        of the last call to runMC(), iterMC(), or runHistoricalRange().
+        """
+        results = self.scenarioResults
+        if results is None:
+            self.mylog.print("No scenarios were run.")
+            return None
+
+        df = results.histogramFrame()
+        fig, description = self._plotter.plot_histogram_results(results.objective, df, results.N, self.year_n,
                                                                 self.n_d, self.N_i, self.phi_j)
         self.mylog.print(description.getvalue())
 
         if figure:
             return fig, description.getvalue()
 
-        return N, df
+        return results.N, df
+
+    @_checkConfiguration
+    @_timer
+    def runScenarios(self, tau_skn, objective=None, options=None, *, verbose=False, progcall=None):
+        """
+        Solve plan for a stack of rate series ``tau_skn`` of shape (S, 4, N_n), in decimal.
+        The problem is built once and only its coefficients are substituted for each scenario,
+        without aggregating the full results of each solve.
+        Objective and options default to those of the last solve.
+
+        Return an (S x 5) array of values in today's $ ordered as in ``scenarios.metricNames``,
+        with NaN for scenarios that could not be solved.
+        Plan is left with its original rates, but needs to be solved again.
+        """
+        if objective is None:
+            objective = self.objective
+            options = self.solverOptions if options is None else options
+        options = {} if options is None else options
+
+        tau_skn = np.asarray(tau_skn, dtype=np.float64)
+        if tau_skn.ndim != 3 or tau_skn.shape[1:] != (self.N_k, self.N_n):
+            raise ValueError(f"Rate series must have shape (S, {self.N_k}, {self.N_n}), not {tau_skn.shape}.")
+        S = tau_skn.shape[0]
+        gamma_sn = _genGamma_n(tau_skn)
+        tau_kn, gamma_n = self.tau_kn, self.gamma_n
+
+        self.mylog.vprint(f"Running {S} scenarios.")
+        self.mylog.setVerbose(verbose)
+
+        if progcall is None:
+            progcall = progress.Progress(self.mylog)
+
+        if not verbose:
+            progcall.start()
+
+        self._stats = solvestats.SolveStats()
+        metrics = np.full((S, len(scenarios.metricNames)), np.nan)
+        useCache = self.setSolutionCache(False)
+        try:
+            for s in range(S):
+                self._setRateSeries(tau_skn[s], gamma_sn[s])
+                solverMethod, myoptions = self._setupSolve(objective, options)
+                self._scSolve(objective, options, solverMethod, level="metrics")
+                if self.caseStatus == "solved":
+                    metrics[s] = self._scenarioMetrics()
+                if not verbose:
+                    progcall.show((s + 1) / S)
+        finally:
+            self.setSolutionCache(useCache)
+
+        progcall.finish()
+        self.mylog.resetVerbose()
+        self._setRateSeries(tau_kn, gamma_n)
+
+        return metrics
+
+    def _runScenarios(self, func, tasks, workers=None):
+        """
+        Generator calling ``func(plan, *args)`` for each tuple of arguments in ``tasks``
+        and yielding results in order. With more than one worker, scenarios are solved
+        in a pool of processes, each holding its own copy of this plan.
+        Otherwise, scenarios are solved sequentially on this plan.
+        """
+        if workers is None or workers <= 1:
+            for args in tasks:
+                yield func(self, *args)
+            return
+
+        from concurrent.futures import ProcessPoolExecutor
+        from itertools import repeat
+
+        self.mylog.vprint(f"Using {workers} worker processes.")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_initWorker,
+                                 initargs=(_planSnapshot(self), self._profiler)) as executor:
+            try:
+                yield from executor.map(_runInWorker, repeat(func), tasks)
+            finally:
+                # Scenarios not yet started are cancelled if the caller stops early.
+                executor.shutdown(wait=False, cancel_futures=True)
 
     def resolve(self):
         """
@@ -1592,8 +2134,9 @@ class Plan(object):
         return None
 
     @_checkConfiguration
+    @_profiled
     @_timer
-    def solve(self, objective, options=None):
+    def solve(self, objective, options=None, *, level="full"):
         """
         This function builds the necessary constaints and
         runs the optimizer.
@@ -1605,11 +2148,51 @@ class Plan(object):
             - netSpending: Desired spending amount when optimizing with maxBequest.
             - bequest: Value of bequest in today's $ when optimizing with maxSpending.
             - units: Units to use for amounts (1, k, or M).
+            - scTolerance: Convergence tolerance of the self-consistent loop (default 0.5).
+            - scDamping: Relaxation of updates in the self-consistent loop, in (0, 1] (default 1).
+            - scAnderson: Number of iterations used for Anderson acceleration (default 0).
+            - scMaxIterations: Maximum number of iterations of the self-consistent loop (default 60).
 
         All units are in $k, unless specified otherwise.
 
+        - level can be 'full' or 'metrics'. With 'metrics', only basis and bequests
+          are extracted from the solution. All other results are then aggregated
+          on demand by aggregateResults(), summaries, plots, and workbooks.
+
         Refer to companion document for implementation details.
         """
+        if level not in ("full", "metrics"):
+            raise ValueError(f"Result level {level} is not one of ['full', 'metrics'].")
+
+        options = {} if options is None else options
+        self._stats = solvestats.SolveStats()
+        with self._stats.phase("solve"):
+            solverMethod, myoptions = self._setupSolve(objective, options)
+            self._scSolve(objective, options, solverMethod, level=level)
+
+        self.objective = objective
+        self.solverOptions = myoptions
+
+        return None
+
+    def exportModel(self, path, fmt="mps"):
+        """
+        Write the optimization problem built by the last solve to file ``path``
+        in free MPS format ("mps"), or in CPLEX LP format ("lp").
+        Models saved in MPS format can be read back using modelio.readModel().
+        """
+        if getattr(self, "A", None) is None:
+            raise RuntimeError("Plan must be solved before its model can be exported.")
+
+        modelio.writeModel(path, self.A, self.B, self.c, self._name, fmt)
+        self.mylog.vprint(f"Wrote model with {self.A.ncons} constraints and {self.nvars} variables to {path}.")
+
+        return None
+
+    def _setupSolve(self, objective, options):
+        """
+        Validate objective and options, and return the solver method and the options retained.
+        """
         if self.rateMethod is None:
             raise RuntimeError("Rate method must be selected before solving.")
 
@@ -1618,7 +2201,7 @@ class Plan(object):
 
         # Check objective and required options.
         knownObjectives = ["maxBequest", "maxSpending"]
-        knownSolvers = ["HiGHS", "PuLP/CBC", "PuLP/HiGHS", "MOSEK"]
+        knownSolvers = ["HiGHS", "HiGHS-native", "PuLP/CBC", "PuLP/HiGHS", "MOSEK"]
 
         knownOptions = [
             "bequest",
@@ -1635,9 +2218,12 @@ class Plan(object):
             "units",
             "xorConstraints",
             "withSCLoop",
+            "scAnderson",
+            "scDamping",
+            "scMaxIterations",
+            "scTolerance",
         ]
         # We might modify options if required.
-        options = {} if options is None else options
         myoptions = dict(options)
 
         for opt in myoptions:
@@ -1679,12 +2265,6 @@ class Plan(object):
             raise ValueError(f"Slack value out of range {lambdha}.")
         self.lambdha = lambdha / 100
 
-        # Reset long-term capital gain tax rate and MAGI to zero.
-        self.psi_n = np.zeros(self.N_n)
-        self.MAGI_n = np.zeros(self.N_n)
-        self.J_n = np.zeros(self.N_n)
-        self.M_n = np.zeros(self.N_n)
-
         self._adjustParameters(self.gamma_n, self.MAGI_n)
         self._buildOffsetMap(options)
 
@@ -1694,6 +2274,8 @@ class Plan(object):
 
         if solver == "HiGHS":
             solverMethod = self._milpSolve
+        elif solver == "HiGHS-native":
+            solverMethod = self._highsSolve
         elif solver == "MOSEK":
             solverMethod = self._mosekSolve
         elif "PuLP" in solver:
@@ -1701,29 +2283,121 @@ class Plan(object):
         else:
             raise RuntimeError("Internal error in defining solverMethod.")
 
-        self._scSolve(objective, options, solverMethod)
+        return solverMethod, myoptions
 
-        self.objective = objective
-        self.solverOptions = myoptions
+    def _paramFingerprints(self, objective, options):
+        """
+        Return a dictionary of fingerprints for each group of parameters in _paramGroups,
+        and for the objective and options.
+        """
+        prints = {group: _fingerprint(*[getattr(self, name) for name in names])
+                  for group, names in _paramGroups.items()}
+        solver = options.get("solver", self.defaultSolver)
+        prints["options"] = _fingerprint(objective, solver, repr(sorted(options.items())))
 
-        return None
+        return prints
+
+    def _solutionKey(self, prints):
+        """
+        Return canonical fingerprint of all inputs relevant to the solver, including the
+        parameter fingerprints ``prints``, the individuals, the current year, the controller of the
+        self-consistent loop, and the version of Owl. Names of individuals are part of the key,
+        as options such as noRothConversions refer to individuals by name.
+        """
+        controller = None if self._convergence is None else repr(sorted(self._convergence.config().items()))
+
+        return _fingerprint(repr(sorted(prints.items())), tuple(self.inames), self.yobs, self.horizons, self.n59,
+                            self.rho_in, self.year_n[0], self.xnet, self.prevMAGI, controller, __version__)
 
-    def _scSolve(self, objective, options, solverMethod):
+    def _scSolve(self, objective, options, solverMethod, level="full"):
         """
         Self-consistent loop, regardless of solver.
+        Groups of parameters that changed since the previous solve are identified by their fingerprints.
+        If nothing changed, the previous solution is reused. Otherwise, only the constraints
+        depending on parameters that changed are rewritten in place, and the loop is started
+        from the previous solution when rates and options are unchanged.
+        Results are aggregated from the solution vector up to ``level``, see _aggregateResults().
         """
         includeMedicare = options.get("withMedicare", "loop") == "loop"
         withSCLoop = options.get("withSCLoop", True)
 
+        self._stats.count("solves")
+        prints = self._paramFingerprints(objective, options)
+        if self.xSolution is not None and prints == self._solvedFingerprints:
+            self.mylog.vprint("Parameters unchanged: reusing previous solution.")
+            self._stats.count("reused")
+            self.scIterations = 0
+            self.scTrace = []
+            self._aggregateResults(self.xSolution, level)
+            self.caseStatus = "solved"
+            return None
+
+        cache = solutioncache.getCache() if self._useSolutionCache else None
+        if cache is not None:
+            key = self._solutionKey(prints)
+            entry = cache.get(key)
+            if entry is not None:
+                self.mylog.vprint("Using solution found in cache.")
+                self._stats.count("cacheHits")
+                self.xSolution = entry["x"]
+                self.psi_n, self.J_n, self.M_n = entry["psi_n"], entry["J_n"], entry["M_n"]
+                # Problem is built at the cached fixed point, for summaries and exports of the model.
+                self._aggregateResults(self.xSolution, level="short")
+                self._builtFingerprints = None
+                self._buildConstraints(objective, options)
+                self._builtFingerprints = prints
+                self._stats.setSize(variables=self.nvars, binaries=self.nbins, rows=self.A.ncons,
+                                    nonzeros=self.A.nnz)
+                self._solvedFingerprints = prints
+                self.scIterations = int(entry["iterations"])
+                self.scTrace = []
+                self._aggregateResults(self.xSolution, level)
+                self._timestamp = datetime.now().strftime("%Y-%m-%d at %H:%M:%S")
+                self.caseStatus = "solved"
+                return None
+
+        built = self._builtFingerprints
+        if built is None or built["options"] != prints["options"]:
+            changed = None
+        else:
+            changed = {group for group in prints if prints[group] != built[group]}
+
         if objective == "maxSpending":
             objFac = -1 / self.xi_n[0]
         else:
             objFac = -1 / self.gamma_n[-1]
 
         it = 0
-        old_x = np.zeros(self.nvars)
-        old_objfns = [np.inf]
-        self._computeNLstuff(None, includeMedicare)
+        warmStart = (changed is not None and withSCLoop and self._solvedFingerprints is not None
+                     and not changed & {"rates", "options"})
+        if warmStart:
+            # Values of the self-consistent loop are those of the previous solution.
+            self.mylog.vprint(f"Warm start after changes in {sorted(changed)}.")
+            old_x = self.xSolution
+        else:
+            old_x = np.zeros(self.nvars)
+            self._computeNLstuff(None, includeMedicare)
+
+        # Build the problem only if needed. Only coefficients depending on MAGI are updated in the loop.
+        self._builtFingerprints = None
+        self._solvedFingerprints = None
+        if changed is None:
+            self._buildConstraints(objective, options)
+        else:
+            self._updateConstraints(objective, options, changed | {"loop"})
+        self._builtFingerprints = prints
+        self._stats.setSize(variables=self.nvars, binaries=self.nbins, rows=self.A.ncons, nonzeros=self.A.nnz)
+
+        controller = self._convergence
+        if controller is None:
+            controller = convergence.ConvergenceController.fromOptions(options)
+        # Oscillations are within $10.
+        controller.start(old_x, objFac, self.xi_n[0])
+        messages = {
+            "converged": "Converged on full solution.",
+            "oscillating": "Converged through selecting minimum oscillating objective.",
+            "maxIterations": "WARNING: Exiting loop on maximum iterations.",
+        }
         while True:
             objfn, xx, solverSuccess, solverMsg = solverMethod(objective, options)
 
@@ -1734,39 +2408,36 @@ class Plan(object):
             if not withSCLoop:
                 break
 
+            v = self._fixedPointValues()
             self._computeNLstuff(xx, includeMedicare)
-
-            delta = xx - old_x
-            absSolDiff = np.sum(np.abs(delta), axis=0)/100
-            absObjDiff = abs(objFac*(objfn + old_objfns[-1]))/100
-            self.mylog.vprint(f"Iteration: {it} objective: {u.d(objfn * objFac, f=2)},"
-                              f" |dX|: {absSolDiff:.2f}, |df|: {u.d(absObjDiff, f=2)}")
-
-            # 50 cents accuracy.
-            if absSolDiff < .5 and absObjDiff < .5:
-                self.mylog.vprint("Converged on full solution.")
-                break
-
-            # Avoid oscillatory solutions. Look only at most recent solutions. Within $10.
-            isclosenough = abs(-objfn - min(old_objfns[int(it / 2) :])) < 10 * self.xi_n[0]
-            if isclosenough:
-                self.mylog.vprint("Converged through selecting minimum oscillating objective.")
-                break
-
-            if it > 59:
-                self.mylog.vprint("WARNING: Exiting loop on maximum iterations.")
+            g = self._fixedPointValues()
+
+            reason = controller.converged(it, objfn, xx, v, g)
+            trace = controller.trace[-1]
+            self.mylog.vprint(f"Iteration: {it} objective: {u.d(trace['objective'], f=2)},"
+                              f" |dX|: {trace['dX']:.2f}, |df|: {u.d(trace['df'], f=2)}")
+            if reason is not None:
+                self.mylog.vprint(messages.get(reason, f"Loop stopped: {reason}."))
                 break
 
             it += 1
-            old_objfns.append(-objfn)
-            old_x = xx
+            self._setFixedPointValues(controller.update(v, g))
+            self._updateConstraints(objective, options)
 
+        self.scTrace = controller.trace
+        self.scIterations = it + 1
+        self._stats.count("iterations", self.scIterations)
         if solverSuccess:
             self.mylog.vprint(f"Self-consistent loop returned after {it+1} iterations.")
             self.mylog.vprint(solverMsg)
             self.mylog.vprint(f"Objective: {u.d(objfn * objFac)}")
             # self.mylog.vprint('Upper bound:', u.d(-solution.mip_dual_bound))
-            self._aggregateResults(xx)
+            self.xSolution = xx
+            self._solvedFingerprints = prints
+            if cache is not None:
+                cache.put(key, {"x": xx, "psi_n": self.psi_n, "J_n": self.J_n, "M_n": self.M_n,
+                                "iterations": self.scIterations})
+            self._aggregateResults(xx, level)
             self._timestamp = datetime.now().strftime("%Y-%m-%d at %H:%M:%S")
             self.caseStatus = "solved"
         else:
@@ -1789,70 +2460,148 @@ class Plan(object):
             "node_limit": 1000000  # Limit search nodes for faster solutions
         }
 
-        self._buildConstraints(objective, options)
-        Alu, lbvec, ubvec = self.A.arrays()
-        Lb, Ub = self.B.arrays()
-        integrality = self.B.integralityArray()
-        c = self.c.arrays()
-
-        bounds = optimize.Bounds(Lb, Ub)
-        constraint = optimize.LinearConstraint(Alu, lbvec, ubvec)
-        solution = optimize.milp(
-            c,
-            integrality=integrality,
-            constraints=constraint,
-            bounds=bounds,
-            options=milpOptions,
-        )
+        with self._stats.phase("export"):
+            Alu, lbvec, ubvec = self.A.sparse()
+            Lb, Ub = self.B.arrays()
+            integrality = self.B.integralityArray()
+            c = self.c.arrays()
+
+            bounds = optimize.Bounds(Lb, Ub)
+            constraint = optimize.LinearConstraint(Alu, lbvec, ubvec)
+
+        with self._stats.phase("solver"):
+            solution = optimize.milp(
+                c,
+                integrality=integrality,
+                constraints=constraint,
+                bounds=bounds,
+                options=milpOptions,
+            )
+        self._stats.count("nodes", getattr(solution, "mip_node_count", None) or 0)
 
         return solution.fun, solution.x, solution.success, solution.message
 
+    def _highsSolve(self, objective, options):
+        """
+        Solve problem using the native HiGHS interface.
+        A single Highs instance is kept with the plan. When the structure of
+        the problem is unchanged, only coefficients and bounds that differ
+        from the previous solve are passed to the solver, and the previous
+        solution is used as a starting point. This applies to iterations
+        of the self-consistent loop as well as to successive scenarios.
+        """
+        import highspy
+
+        with self._stats.phase("export"):
+            Alu, lbvec, ubvec = self.A.sparse(prune=False)
+            Lb, Ub = self.B.arrays()
+            integrality = self.B.integralityArray()
+            c = self.c.arrays()
+
+            model = self._highsModel
+            if (model is None
+                    or model["A"].shape != Alu.shape
+                    or not np.array_equal(model["A"].indptr, Alu.indptr)
+                    or not np.array_equal(model["A"].indices, Alu.indices)
+                    or not np.array_equal(model["integrality"], integrality)):
+                h = highspy.Highs()
+                h.setOptionValue("output_flag", False)
+                h.setOptionValue("mip_rel_gap", 1e-7)
+                h.setOptionValue("mip_max_nodes", 1000000)
+
+                lp = highspy.HighsLp()
+                lp.num_col_ = self.nvars
+                lp.num_row_ = self.A.ncons
+                lp.col_cost_ = c
+                lp.col_lower_ = Lb
+                lp.col_upper_ = Ub
+                lp.row_lower_ = lbvec
+                lp.row_upper_ = ubvec
+                lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+                lp.a_matrix_.start_ = Alu.indptr
+                lp.a_matrix_.index_ = Alu.indices
+                lp.a_matrix_.value_ = Alu.data
+                vtypes = [highspy.HighsVarType.kContinuous, highspy.HighsVarType.kInteger]
+                lp.integrality_ = [vtypes[v] for v in integrality]
+                h.passModel(lp)
+                model = {"highs": h, "integrality": integrality, "x": None}
+                self._highsModel = model
+            else:
+                h = model["highs"]
+                irow = np.repeat(np.arange(self.A.ncons), np.diff(Alu.indptr))
+                for k in np.flatnonzero(Alu.data != model["A"].data):
+                    h.changeCoeff(int(irow[k]), int(Alu.indices[k]), float(Alu.data[k]))
+
+                rows = np.flatnonzero((lbvec != model["lbvec"]) | (ubvec != model["ubvec"]))
+                if len(rows) > 0:
+                    h.changeRowsBounds(len(rows), rows, lbvec[rows], ubvec[rows])
+
+                cols = np.flatnonzero((Lb != model["Lb"]) | (Ub != model["Ub"]))
+                if len(cols) > 0:
+                    h.changeColsBounds(len(cols), cols, Lb[cols], Ub[cols])
+
+                cols = np.flatnonzero(c != model["c"])
+                if len(cols) > 0:
+                    h.changeColsCost(len(cols), cols, c[cols])
+
+                if model["x"] is not None:
+                    start = highspy.HighsSolution()
+                    start.col_value = model["x"].tolist()
+                    h.setSolution(start)
+
+            model.update(A=Alu, lbvec=lbvec, ubvec=ubvec, Lb=Lb, Ub=Ub, c=c)
+
+        with self._stats.phase("solver"):
+            h.run()
+        self._stats.count("nodes", max(h.getInfo().mip_node_count, 0))
+        status = h.getModelStatus()
+        success = (status == highspy.HighsModelStatus.kOptimal)
+        if not success:
+            return None, None, False, h.modelStatusToString(status)
+
+        xx = np.array(h.getSolution().col_value)
+        model["x"] = xx
+
+        return h.getInfo().objective_function_value, xx, success, h.modelStatusToString(status)
+
     def _pulpSolve(self, objective, options):
         """
         Solve problem using scipy PuLP solver.
+        Expressions are built from the sparse rows of the constraint matrix.
         """
         import pulp
 
-        self._buildConstraints(objective, options)
-        Alu, lbvec, ubvec = self.A.arrays()
-        ckeys = self.A.keys()
-        Lb, Ub = self.B.arrays()
-        vkeys = self.B.keys()
-        c = self.c.arrays()
-        c_list = c.tolist()
-
-        prob = pulp.LpProblem(self._name.replace(" ", "_"), pulp.LpMinimize)
-
-        x = []
-        for i in range(self.nvars - self.nbins):
-            if vkeys[i] == "ra":
-                x += [pulp.LpVariable(f"x_{i}", cat="Continuous", lowBound=Lb[i], upBound=Ub[i])]
-            elif vkeys[i] == "lo":
-                x += [pulp.LpVariable(f"x_{i}", cat="Continuous", lowBound=Lb[i], upBound=None)]
-            elif vkeys[i] == "up":
-                x += [pulp.LpVariable(f"x_{i}", cat="Continuous", lowBound=None, upBound=Ub[i])]
-            elif vkeys[i] == "fr":
-                x += [pulp.LpVariable(f"x_{i}", cat="Continuous", lowBound=None, upBound=None)]
-            elif vkeys[i] == "fx":
-                x += [pulp.LpVariable(f"x_{i}", cat="Continuous", lowBound=Lb[i], upBound=Ub[i])]
-            else:
-                raise RuntimeError(f"Internal error: Variable with wierd bound f{vkeys[i]}.")
-
-        x.extend([pulp.LpVariable(f"z_{i}", cat="Binary") for i in range(self.nbins)])
+        with self._stats.phase("export"):
+            Alu, lbvec, ubvec = self.A.sparse()
+            ckeys = self.A.keys()
+            Lb, Ub = self.B.arrays()
+            c = self.c.arrays()
+
+            prob = pulp.LpProblem(self._name.replace(" ", "_"), pulp.LpMinimize)
+
+            nx = self.nvars - self.nbins
+            x = [pulp.LpVariable(f"x_{i}", cat="Continuous",
+                                 lowBound=None if Lb[i] == -np.inf else Lb[i],
+                                 upBound=None if Ub[i] == np.inf else Ub[i]) for i in range(nx)]
+            x.extend([pulp.LpVariable(f"z_{i}", cat="Binary") for i in range(self.nbins)])
+
+            ind = np.flatnonzero(c)
+            prob += pulp.LpAffineExpression(zip([x[i] for i in ind], c[ind].tolist(), strict=True))
+
+            indices = Alu.indices.tolist()
+            data = Alu.data.tolist()
+            indptr = Alu.indptr.tolist()
+            for r in range(self.A.ncons):
+                row = slice(indptr[r], indptr[r + 1])
+                terms = [(x[i], v) for i, v in zip(indices[row], data[row], strict=True)]
+                if ckeys[r] == "fx":
+                    prob += pulp.LpConstraint(pulp.LpAffineExpression(terms), pulp.LpConstraintEQ, rhs=ubvec[r])
+                    continue
+                if ckeys[r] in ["lo", "ra"]:
+                    prob += pulp.LpConstraint(pulp.LpAffineExpression(terms), pulp.LpConstraintGE, rhs=lbvec[r])
+                if ckeys[r] in ["up", "ra"]:
+                    prob += pulp.LpConstraint(pulp.LpAffineExpression(terms), pulp.LpConstraintLE, rhs=ubvec[r])
 
-        prob += pulp.lpDot(c_list, x)
-
-        for r in range(self.A.ncons):
-            row = Alu[r].tolist()
-            if ckeys[r] in ["lo", "ra"] and lbvec[r] != -np.inf:
-                prob += pulp.lpDot(row, x) >= lbvec[r]
-            if ckeys[r] in ["up", "ra"] and ubvec[r] != np.inf:
-                prob += pulp.lpDot(row, x) <= ubvec[r]
-            if ckeys[r] == "fx":
-                prob += pulp.lpDot(row, x) == ubvec[r]
-
-        # prob.writeLP("C:\\Users\\marti\\Downloads\\pulp.lp")
-        # prob.writeMPS("C:\\Users\\marti\\Downloads\\pulp.mps", rename=True)
         # solver_list = pulp.listSolvers(onlyAvailable=True)
         # print("Available solvers:", solver_list)
         # solver = pulp.getSolver("MOSEK")
@@ -1863,7 +2612,8 @@ class Plan(object):
         else:
             solver = pulp.getSolver("PULP_CBC_CMD", msg=False)
 
-        prob.solve(solver)
+        with self._stats.phase("solver"):
+            prob.solve(solver)
 
         # Filter out None values and convert to array.
         xx = np.array([0 if x[i].varValue is None else x[i].varValue for i in range(self.nvars)])
@@ -1891,36 +2641,36 @@ class Plan(object):
         def _streamPrinter(text, msg=solverMsg):
             msg += text
 
-        self._buildConstraints(objective, options)
-        Aind, Aval, clb, cub = self.A.lists()
-        ckeys = self.A.keys()
-        vlb, vub = self.B.arrays()
-        integrality = self.B.integralityList()
-        vkeys = self.B.keys()
-        cind, cval = self.c.lists()
+        with self._stats.phase("export"):
+            Arow, Acol, Aval, clb, cub = self.A.triplets()
+            ckeys = self.A.keys()
+            vlb, vub = self.B.arrays()
+            integrality = self.B.integralityList()
+            vkeys = self.B.keys()
+            cind, cval = self.c.lists()
 
-        task = mosek.Task()
-        # task.putdouparam(mosek.dparam.mio_rel_gap_const, 1e-6)
-        # task.putdouparam(mosek.dparam.mio_tol_abs_relax_int, 1e-4)
-        # task.set_Stream(mosek.streamtype.msg, _streamPrinter)
-        task.appendcons(self.A.ncons)
-        task.appendvars(self.A.nvars)
+            task = mosek.Task()
+            # task.putdouparam(mosek.dparam.mio_rel_gap_const, 1e-6)
+            # task.putdouparam(mosek.dparam.mio_tol_abs_relax_int, 1e-4)
+            # task.set_Stream(mosek.streamtype.msg, _streamPrinter)
+            task.appendcons(self.A.ncons)
+            task.appendvars(self.A.nvars)
 
-        for ii in range(len(cind)):
-            task.putcj(cind[ii], cval[ii])
+            for ii in range(len(cind)):
+                task.putcj(cind[ii], cval[ii])
 
-        for ii in range(self.nvars):
-            task.putvarbound(ii, bdic[vkeys[ii]], vlb[ii], vub[ii])
+            for ii in range(self.nvars):
+                task.putvarbound(ii, bdic[vkeys[ii]], vlb[ii], vub[ii])
 
-        for ii in range(len(integrality)):
-            task.putvartype(integrality[ii], mosek.variabletype.type_int)
+            for ii in range(len(integrality)):
+                task.putvartype(integrality[ii], mosek.variabletype.type_int)
 
-        for ii in range(self.A.ncons):
-            task.putarow(ii, Aind[ii], Aval[ii])
-            task.putconbound(ii, bdic[ckeys[ii]], clb[ii], cub[ii])
+            task.putaijlist(Arow, Acol, Aval)
+            task.putconboundslice(0, self.A.ncons, [bdic[key] for key in ckeys], clb, cub)
 
-        task.putobjsense(mosek.objsense.minimize)
-        task.optimize()
+            task.putobjsense(mosek.objsense.minimize)
+        with self._stats.phase("solver"):
+            task.optimize()
 
         # Problem MUST contain binary variables to make these calls.
         solsta = task.getsolsta(mosek.soltype.itg)
@@ -1930,7 +2680,6 @@ class Plan(object):
         solution = task.getprimalobj(mosek.soltype.itg)
         task.set_Stream(mosek.streamtype.wrn, _streamPrinter)
         task.solutionsummary(mosek.streamtype.msg)
-        # task.writedata(self._name+'.ptf')
 
         return solution, xx, solverSuccess, solverMsg
 
@@ -1941,19 +2690,24 @@ class Plan(object):
         For accounting for rent and/or trust income, one can easily add a column
         to the Wages and Contributions file and add yearly amount to Q_n + I_n below.
         """
-        J_n = np.zeros(self.N_n)
-        status = len(self.yobs) - 1
+        Gmax = self._getTaxTables()["niitThreshold_n"]
+        J_n = np.where(MAGI_n > Gmax, tx.niitRate * np.minimum(MAGI_n - Gmax, I_n + Q_n), 0)
 
-        for n in range(self.N_n):
-            if status and n == self.n_d:
-                status -= 1
+        return J_n
 
-            Gmax = tx.niitThreshold[status]
-            if MAGI_n[n] > Gmax:
-                J_n[n] = tx.niitRate * min(MAGI_n[n] - Gmax, I_n[n] + Q_n[n])
+    def _fixedPointValues(self):
+        """
+        Return values computed in the self-consistent loop as a single vector.
+        """
+        return np.concatenate([self.MAGI_n, self.M_n, self.J_n, self.psi_n])
 
-        return J_n
+    def _setFixedPointValues(self, v):
+        """
+        Set values used in the self-consistent loop from a vector returned by _fixedPointValues().
+        """
+        self.MAGI_n, self.M_n, self.J_n, self.psi_n = np.split(np.asarray(v, dtype=float), 4)
 
+    @_phase("computeNLstuff")
     def _computeNLstuff(self, x, includeMedicare):
         """
         Compute MAGI, Medicare costs, long-term capital gain tax rate, and
@@ -1966,20 +2720,40 @@ class Plan(object):
             self.psi_n = np.zeros(self.N_n)
             return
 
-        self._aggregateResults(x, short=True)
+        self._aggregateResults(x, level="short")
 
         self.J_n = self._computeNIIT(self.MAGI_n, self.I_n, self.Q_n)
-        self.psi_n = tx.capitalGainTaxRate(self.N_i, self.MAGI_n, self.gamma_n[:-1], self.n_d, self.N_n)
+        tables = self._getTaxTables()
+        self.psi_n = tx.capitalGainTaxRate(self.N_i, self.MAGI_n, self.gamma_n[:-1], self.n_d, self.N_n, tables)
         # Compute Medicare through self-consistent loop.
         if includeMedicare:
-            self.M_n = tx.mediCosts(self.yobs, self.horizons, self.MAGI_n, self.prevMAGI, self.gamma_n[:-1], self.N_n)
+            self.M_n = tx.mediCosts(self.yobs, self.horizons, self.MAGI_n, self.prevMAGI,
+                                    self.gamma_n[:-1], self.N_n, tables)
 
         return None
 
-    def _aggregateResults(self, x, short=False):
+    def _scenarioMetrics(self):
+        """
+        Return the values listed in ``scenarios.metricNames`` in today's $,
+        from results aggregated to at least the "metrics" level.
+        """
+        # Ordinary income tax, early withdrawal penalty, tax on gains and dividends, and NIIT.
+        penalty_in = np.where(np.arange(self.N_n) < self.n59[:, None], 0.1, 0)
+        taxes_n = (np.sum(self.f_tn * self.theta_tn, axis=0)
+                   + np.sum(penalty_in * (self.w_ijn[:, 1] + self.w_ijn[:, 2]), axis=0)
+                   + self.U_n + self.J_n)
+        taxes = np.sum(taxes_n / self.gamma_n[:-1])
+        conversions = np.sum(np.sum(self.x_in, axis=0) / self.gamma_n[:-1])
+
+        return np.array([self.basis, self.bequest, self.partialBequest, taxes, conversions])
+
+    @_phase("aggregateResults")
+    def _aggregateResults(self, x, level="full"):
         """
         Utility function to aggregate results from solver.
-        Process all results from solution vector.
+        Process results from solution vector up to the level requested:
+        "short" for the minimum required by the self-consistent loop,
+        "metrics" for adding the values of basis and bequests, or "full" for all results.
         """
         # Define shortcuts.
         Ni = self.N_i
@@ -2006,9 +2780,6 @@ class Plan(object):
         # Allocate, slice in, and reshape variables.
         self.b_ijn = np.array(x[Cb:Cd])
         self.b_ijn = self.b_ijn.reshape((Ni, Nj, Nn + 1))
-        self.b_ijkn = np.zeros((Ni, Nj, Nk, Nn + 1))
-        for k in range(Nk):
-            self.b_ijkn[:, :, k, :] = self.b_ijn[:, :, :] * self.alpha_ijkn[:, :, k, :]
 
         self.d_in = np.array(x[Cd:Ce])
         self.d_in = self.d_in.reshape((Ni, Nn))
@@ -2057,18 +2828,10 @@ class Plan(object):
                 * np.sum(self.alpha_ijkn[:, 0, 1:, :Nn] * self.tau_kn[1:, :], axis=1))
         self.I_n = np.sum(I_in, axis=0)
 
-        # Stop after building minimu required for self-consistent loop.
-        if short:
+        # Stop after building minimum required for self-consistent loop.
+        if level == "short":
             return
 
-        self.T_tn = self.f_tn * self.theta_tn
-        self.T_n = np.sum(self.T_tn, axis=0)
-        self.P_n = np.zeros(Nn)
-        # Add early withdrawal penalty if any.
-        for i in range(Ni):
-            self.P_n[0:self.n59[i]] += 0.1*(self.w_ijn[i, 1, 0:self.n59[i]] + self.w_ijn[i, 2, 0:self.n59[i]])
-
-        self.T_n += self.P_n
         # Compute partial distribution at the passing of first spouse.
         if Ni == 2 and n_d < Nn:
             nx = n_d - 1
@@ -2092,6 +2855,28 @@ class Plan(object):
         else:
             self.partialBequest = 0
 
+        estate_j = np.sum(self.b_ijn[:, :, self.N_n], axis=0)
+        estate_j[1] *= 1 - self.nu
+        self.bequest = np.sum(estate_j) / self.gamma_n[-1]
+
+        self.basis = self.g_n[0] / self.xi_n[0]
+
+        self._resultLevel = level
+        if level == "metrics":
+            return
+
+        self.b_ijkn = np.zeros((Ni, Nj, Nk, Nn + 1))
+        for k in range(Nk):
+            self.b_ijkn[:, :, k, :] = self.b_ijn[:, :, :] * self.alpha_ijkn[:, :, k, :]
+
+        self.T_tn = self.f_tn * self.theta_tn
+        self.T_n = np.sum(self.T_tn, axis=0)
+        self.P_n = np.zeros(Nn)
+        # Add early withdrawal penalty if any.
+        for i in range(Ni):
+            self.P_n[0:self.n59[i]] += 0.1*(self.w_ijn[i, 1, 0:self.n59[i]] + self.w_ijn[i, 2, 0:self.n59[i]])
+
+        self.T_n += self.P_n
         self.rmd_in = self.rho_in * self.b_ijn[:, 1, :-1]
         self.dist_in = self.w_ijn[:, 1, :] - self.rmd_in
         self.dist_in[self.dist_in < 0] = 0
@@ -2129,11 +2914,15 @@ class Plan(object):
         self.sources_in = sources
         self.savings_in = savings
 
-        estate_j = np.sum(self.b_ijn[:, :, self.N_n], axis=0)
-        estate_j[1] *= 1 - self.nu
-        self.bequest = np.sum(estate_j) / self.gamma_n[-1]
+        return None
 
-        self.basis = self.g_n[0] / self.xi_n[0]
+    def aggregateResults(self):
+        """
+        Complete aggregation of results from the saved solution vector
+        when plan was solved with results limited to metrics.
+        """
+        if self.caseStatus == "solved" and self._resultLevel != "full":
+            self._aggregateResults(self.xSolution)
 
         return None
 
@@ -2193,6 +2982,7 @@ class Plan(object):
         """
         Return dictionary containing summary of values.
         """
+        self.aggregateResults()
         now = self.year_n[0]
         dic = {}
         # Results
@@ -2562,6 +3352,7 @@ class Plan(object):
 
         Last worksheet contains summary.
         """
+        self.aggregateResults()
 
         def fillsheet(sheet, dic, datatype, op=lambda x: x):
             rawData = {}
@@ -2726,6 +3517,7 @@ class Plan(object):
         instead of an Excel worksheet.
         See saveWorkbook() sister function for more information.
         """
+        self.aggregateResults()
 
         planData = {}
         planData["year"] = self.year_n
@@ -0,0 +1,190 @@
+"""
+
+Owl/planspec
+---
+
+A retirement planner using linear programming optimization.
+
+Compact and immutable snapshot of all inputs needed to solve a plan.
+A PlanSpec pickles without the logger, plotting backend, or solver
+artifacts carried by a plan, and rebuilds a plan that can be solved,
+shown, and saved without going through the configuration methods.
+It is the format used to ship plans to worker processes.
+
+Copyright &copy; 2024 - Martin-D. Lacasse
+
+Disclaimers: This code is for educational purposes only and does not constitute financial advice.
+
+"""
+
+import copy
+from dataclasses import dataclass, fields
+
+import numpy as np
+
+from . import mylogging as log
+from . import solvestats
+from . import profiling
+
+
+# Attributes of a plan stored under another name in a PlanSpec.
+_attributes = {
+    "name": "_name",
+    "description": "_description",
+    "plotterName": "_plotterName",
+    "useSolutionCache": "_useSolutionCache",
+}
+
+
+@dataclass(frozen=True, eq=False)
+class PlanSpec(object):
+    """
+    Solver inputs and configuration of a plan. Arrays are stored contiguous and read-only.
+    Use fromPlan() to take a snapshot and toPlan() to rebuild a plan.
+    """
+
+    name: str
+    inames: tuple
+    filingStatus: str
+    yobs: np.ndarray
+    expectancy: np.ndarray
+    horizons: np.ndarray
+    year_n: np.ndarray
+    n59: np.ndarray
+    rho_in: np.ndarray
+    N_i: int
+    N_j: int
+    N_k: int
+    N_n: int
+    N_t: int
+    N_q: int
+    N_zx: int
+    i_d: int
+    i_s: int
+    n_d: int
+    # Savings and allocations.
+    beta_ij: np.ndarray
+    startDate: str
+    yearFracLeft: float
+    alpha_ijkn: np.ndarray
+    # Wages, contributions, conversions, and big-ticket items.
+    omega_in: np.ndarray
+    Lambda_in: np.ndarray
+    myRothX_in: np.ndarray
+    kappa_ijn: np.ndarray
+    # Fixed income.
+    pi_in: np.ndarray
+    zeta_in: np.ndarray
+    pensionIsIndexed: tuple
+    # Spending profile, heirs, and taxes.
+    xi_n: np.ndarray
+    chi: float
+    phi_j: np.ndarray
+    nu: float
+    eta: float
+    mu: float
+    yOBBBA: int
+    # Rates.
+    rateMethod: str
+    rateFrm: int
+    rateTo: int
+    rateValues: np.ndarray
+    rateStdev: np.ndarray
+    rateCorr: np.ndarray
+    rateSeed: int
+    tau_kn: np.ndarray
+    gamma_n: np.ndarray
+    # Solver.
+    objective: str
+    solverOptions: dict
+    defaultSolver: str
+    # Configuration used for reporting and saving the plan.
+    description: str
+    timeListsFileName: str
+    timeLists: dict
+    pensionAmounts: np.ndarray
+    pensionAges: np.ndarray
+    ssecAmounts: np.ndarray
+    ssecAges: np.ndarray
+    interpMethod: str
+    interpCenter: float
+    interpWidth: float
+    ARCoord: str
+    boundsAR: dict
+    spendingProfile: str
+    smileDip: int
+    smileIncrease: int
+    smileDelay: int
+    lambdha: float
+    defaultPlots: str
+    plotterName: str
+    useSolutionCache: bool = True
+
+    def __post_init__(self):
+        for field in fields(self):
+            value = getattr(self, field.name)
+            if isinstance(value, np.ndarray):
+                value = np.array(value, order="C")
+                value.flags.writeable = False
+                object.__setattr__(self, field.name, value)
+
+    @classmethod
+    def fromPlan(cls, plan):
+        """
+        Return a snapshot of the solver inputs and configuration of ``plan``.
+        """
+        values = {field.name: getattr(plan, _attributes.get(field.name, field.name), None) for field in fields(cls)}
+        values["inames"] = tuple(plan.inames)
+        values["pensionIsIndexed"] = tuple(plan.pensionIsIndexed)
+        values["solverOptions"] = dict(getattr(plan, "solverOptions", {}))
+        values["timeLists"] = dict(plan.timeLists)
+        values["boundsAR"] = copy.deepcopy(getattr(plan, "boundsAR", None))
+        values["useSolutionCache"] = getattr(plan, "_useSolutionCache", True)
+
+        return cls(**values)
+
+    def toPlan(self, verbose=False, logstreams=None):
+        """
+        Return a plan ready to be solved, shown, and saved with these inputs.
+        Arrays are copied so that the plan can be modified.
+        """
+        from .plan import Plan
+
+        plan = Plan.__new__(Plan)
+        for field in fields(self):
+            value = getattr(self, field.name)
+            if isinstance(value, np.ndarray):
+                value = value.copy()
+            setattr(plan, _attributes.get(field.name, field.name), value)
+
+        plan.inames = list(self.inames)
+        plan.pensionIsIndexed = list(self.pensionIsIndexed)
+        plan.solverOptions = dict(self.solverOptions)
+        plan.timeLists = dict(self.timeLists)
+        plan.boundsAR = copy.deepcopy(self.boundsAR)
+        plan.mylog = log.Logger(verbose, logstreams)
+        plan._interpolator = plan._tanhInterp if self.interpMethod == "s-curve" else plan._linInterp
+        plan._plotterName = None
+        plan.setPlotBackend(self.plotterName)
+        plan._taxTables = None
+        plan._adjustedParameters = False
+        plan._rateRng = None
+        plan._highsModel = None
+        plan._builtFingerprints = None
+        plan._solvedFingerprints = None
+        plan.xSolution = None
+        plan._resultLevel = None
+        plan.scenarioResults = None
+        plan.scIterations = 0
+        plan.scTrace = []
+        plan._convergence = None
+        plan._stats = solvestats.SolveStats()
+        plan._profiler = profiling.fromEnvironment()
+        plan.prevMAGI = np.zeros(2)
+        plan.psi_n = np.zeros(self.N_n)
+        plan.MAGI_n = np.zeros(self.N_n)
+        plan.J_n = np.zeros(self.N_n)
+        plan.M_n = np.zeros(self.N_n)
+        plan.caseStatus = "modified"
+
+        return plan
@@ -0,0 +1,242 @@
+"""
+
+Owl/profiling
+---
+
+A retirement planner using linear programming optimization.
+
+Profiling hooks for solves and scenario runs. A profiler is attached to
+a plan with Plan.setProfiler(), or to all plans through the OWL_PROFILE
+environment variable, given as <kind>[:<directory>], such as
+OWL_PROFILE=cprofile:/tmp/owl. Each profiled call writes its own file,
+either pstats from cProfile (.prof) or collapsed stacks (.collapsed)
+as used by flame graph tools. When scenarios are run in parallel,
+each worker process writes its own file. Generators such as Plan.iterMC()
+are profiled only while running, and not while their values are consumed.
+
+Copyright &copy; 2024 - Martin-D. Lacasse
+
+Disclaimers: This code is for educational purposes only and does not constitute financial advice.
+
+"""
+
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+
+
+knownProfilers = ("cprofile", "collapsed")
+
+# Collector of the outermost profiled call of a process, as only that call is profiled.
+_active = None
+
+
+class StackProfile(object):
+    """
+    Deterministic profiler recording time spent in each call stack, including calls to builtins.
+    Same interface as cProfile.Profile for enabling, disabling, and dumping results.
+    """
+
+    def __init__(self):
+        self.stacks = {}
+        self._calls = []
+        self._last = None
+
+    def enable(self):
+        self._calls = []
+        self._last = time.perf_counter()
+        sys.setprofile(self._trace)
+
+    def disable(self):
+        sys.setprofile(None)
+
+    def pause(self):
+        """
+        Stop collecting, keeping the current call stack until resume() is called.
+        """
+        frame = sys._getframe()
+        sys.setprofile(None)
+        # This call returns while not collecting.
+        for k, call in enumerate(self._calls):
+            if call[0] is frame:
+                del self._calls[k:]
+                break
+
+    def resume(self):
+        """
+        Collect again in the call stack left by pause().
+        """
+        self._last = time.perf_counter()
+        sys.setprofile(self._trace)
+
+    def _trace(self, frame, event, arg):
+        now = time.perf_counter()
+        if self._calls:
+            path = self._calls[-1][2]
+            self.stacks[path] = self.stacks.get(path, 0.0) + now - self._last
+
+        if event == "call":
+            code = frame.f_code
+            name = f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+            callee = None
+        elif event == "c_call":
+            name = getattr(arg, "__qualname__", None) or getattr(arg, "__name__", "?")
+            callee = arg
+        else:
+            # Returns of calls entered while not collecting are ignored.
+            callee = None if event == "return" else arg
+            if self._calls and self._calls[-1][0] is frame and self._calls[-1][1] is callee:
+                self._calls.pop()
+            self._last = time.perf_counter()
+            return
+
+        path = self._calls[-1][2] + ";" + name if self._calls else name
+        self._calls.append((frame, callee, path))
+        self._last = time.perf_counter()
+
+    def dump_stats(self, file):
+        """
+        Write collapsed stacks to ``file``, one stack per line followed by its time in microseconds.
+        """
+        with open(file, "w") as f:
+            for path, value in self.stacks.items():
+                if value >= 1e-6:
+                    f.write(f"{path} {int(value * 1e6)}\n")
+
+
+class Profiler(object):
+    """
+    Profiler of ``kind`` "cprofile" or "collapsed", writing its files in directory ``path``.
+    """
+
+    def __init__(self, kind, path="."):
+        if kind not in knownProfilers:
+            raise ValueError(f"Unknown profiler {kind}: must be one of {knownProfilers}.")
+        self.kind = kind
+        self.path = path
+
+    def collector(self):
+        """
+        Return a new object collecting profiling data.
+        """
+        if self.kind == "cprofile":
+            import cProfile
+
+            return cProfile.Profile()
+
+        return StackProfile()
+
+    def filename(self, tag):
+        """
+        Return name of file for ``tag``, unique to the time and process.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        tag = re.sub(r"[^\w.+-]", "_", tag)
+        ext = ".prof" if self.kind == "cprofile" else ".collapsed"
+
+        return os.path.join(self.path, f"{tag}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}{ext}")
+
+    @contextmanager
+    def run(self, tag):
+        """
+        Context manager profiling its block and writing the results to a file named after ``tag``.
+        Yields the name of the file, or None if another call is already being profiled.
+        """
+        global _active
+
+        if _active is not None:
+            yield None
+            return
+
+        collector = self.collector()
+        file = self.filename(tag)
+        _active = collector
+        collector.enable()
+        try:
+            yield file
+        finally:
+            collector.disable()
+            _active = None
+            collector.dump_stats(file)
+
+
+def pausing(gen):
+    """
+    Delegate to generator ``gen``, pausing the active collector while the values it yields are consumed.
+    Only the work of the generator is then profiled, and not that of its consumer.
+    """
+    collector = _active
+    if collector is None:
+        return (yield from gen)
+
+    pause = getattr(collector, "pause", collector.disable)
+    resume = getattr(collector, "resume", collector.enable)
+    try:
+        value = next(gen)
+        while True:
+            pause()
+            try:
+                sent = yield value
+            finally:
+                resume()
+            value = gen.send(sent)
+    except StopIteration as stop:
+        return stop.value
+    finally:
+        gen.close()
+
+
+def fromEnvironment():
+    """
+    Return profiler described by the OWL_PROFILE environment variable, or None if not set.
+    """
+    value = os.environ.get("OWL_PROFILE")
+    if not value:
+        return None
+
+    kind, _, path = value.partition(":")
+
+    return Profiler(kind, path or ".")
+
+
+# Collector and file of a worker process, accumulating over all its scenarios.
+_workerCollector = None
+_workerFile = None
+
+
+def initWorker(profiler, tag):
+    """
+    Start profiling in a worker process, if ``profiler`` is not None.
+    """
+    global _active, _workerCollector, _workerFile
+
+    # Forked workers inherit the collector of the parent, which would never be written.
+    if _active is not None:
+        _active.disable()
+        _active = None
+
+    if profiler is not None:
+        _workerCollector = profiler.collector()
+        _workerFile = profiler.filename(tag + "-worker")
+
+
+def runInWorker(func, *args):
+    """
+    Call ``func(*args)`` in a worker process, profiling it if the worker was started with a profiler.
+    Results accumulated by the worker are written after each call, as workers can exit without notice.
+    """
+    global _active
+
+    if _workerCollector is None or _active is not None:
+        return func(*args)
+
+    _active = _workerCollector
+    _workerCollector.enable()
+    try:
+        return func(*args)
+    finally:
+        _workerCollector.disable()
+        _active = None
+        _workerCollector.dump_stats(_workerFile)
@@ -67,6 +67,11 @@ TBills = df["TBills"]
 # Inflation rate as U.S. CPI index (%) since 1928.
 Inflation = df["Inflation"]
 
+# Rates of S&P 500, Baa Corporate Bonds, 10-y Treasury notes, and inflation
+# since 1928, as one contiguous (years x 4) array, in percent and in decimal.
+_histPercent = np.ascontiguousarray(df[["S&P 500", "Bonds Baa", "TNotes", "Inflation"]].to_numpy(dtype=np.float64))
+histRates = _histPercent / 100
+
 
 def getRatesDistributions(frm, to, mylog=None):
     """
@@ -87,19 +92,12 @@ def getRatesDistributions(frm, to, mylog=None):
     if frm >= to:
         raise ValueError(f'"from" {frm} must be smaller than "to" {to}.')
 
-    series = {
-        "SP500": SP500,
-        "BondsBaa": BondsBaa,
-        "T. Notes": TNotes,
-        "Inflation": Inflation,
-    }
-
-    df = pd.DataFrame(series)
-    df = df.truncate(before=frm, after=to)
-
-    means = df.mean()
-    stdev = df.std()
-    covar = df.cov()
+    # Statistics are computed in percent, as their round-off depends on the scale of the data,
+    # and the self-consistent loop is sensitive to the last bits of the rates.
+    data = pd.DataFrame(_histPercent[frm:to + 1], columns=["SP500", "BondsBaa", "T. Notes", "Inflation"])
+    means = data.mean()
+    stdev = data.std()
+    covar = data.cov()
 
     mylog.print("means: (%)\n", means)
     mylog.print("standard deviation: (%)\n", stdev)
@@ -119,6 +117,24 @@ def getRatesDistributions(frm, to, mylog=None):
     return means, stdev, corr, covar
 
 
+def getRollingStats(window, frm=FROM, to=TO):
+    """
+    Return means and standard deviations (in decimal) of historical rates
+    over all rolling windows of ``window`` years between ``frm`` and ``to``.
+    Arrays returned are (windows x 4), the first row being for the window starting in ``frm``.
+    """
+    ifrm = frm - FROM
+    ito = to - FROM
+    if not (0 <= ifrm <= ito < len(histRates)):
+        raise ValueError(f"Range {frm}-{to} out of bounds.")
+    if not (2 <= window <= ito - ifrm + 1):
+        raise ValueError(f"Window of {window} years does not fit in range {frm}-{to}.")
+
+    windows = np.lib.stride_tricks.sliding_window_view(histRates[ifrm:ito + 1], window, axis=0)
+
+    return windows.mean(axis=-1), windows.std(axis=-1, ddof=1)
+
+
 class Rates(object):
     """
     Rates are stored in a 4-array in the following order:
@@ -131,15 +147,19 @@ class Rates(object):
     then ``mySeries = r.genSeries()``
     """
 
-    def __init__(self, mylog=None):
+    def __init__(self, mylog=None, rng=None):
         """
         Default constructor.
+        A numpy random Generator ``rng`` can be provided for drawing stochastic rates.
+        Otherwise, the global numpy random state is used.
         """
         if mylog is None:
             self.mylog = log.Logger()
         else:
             self.mylog = mylog
 
+        self._rng = rng
+
         # Default rates are average over last 30 years.
         self._defRates = np.array([0.1101, 0.0736, 0.0503, 0.0251])
 
@@ -309,20 +329,54 @@ class Rates(object):
         in sub-series selected by 'setMethod()', values will be repeated
         modulo the length of the sub-series.
         """
-        rateSeries = np.zeros((N, 4))
+        return self.genSeriesBatch(N, 1)[0]
 
-        # Convert years to indices.
-        ifrm = self.frm - FROM
-        ito = self.to - FROM
+    def genSeriesBatch(self, N, S, rngs=None):
+        """
+        Generate S series of Nx4 entries of rates as described in genSeries(),
+        returned as an SxNx4 array.
+        Stochastic series are drawn at once from a single factorization
+        of the covariance matrix. Random numbers come from the generator
+        given to the constructor, unless a list ``rngs`` of S numpy random
+        Generators is provided, in which case series s is drawn from rngs[s].
+        Historical series are obtained by slicing the historical data.
+        """
+        if self._rateMethod == self._fixedRates:
+            return np.tile(self._myRates, (S, N, 1))
+
+        if self._rateMethod == self._histRates:
+            # Convert years to indices.
+            ifrm = self.frm - FROM
+            ito = self.to - FROM
+            # Add one since bounds are inclusive.
+            span = ito - ifrm + 1
+            if N <= span:
+                hrates = histRates[ifrm:ifrm + N]
+            else:
+                hrates = histRates[ifrm + np.arange(N) % span]
+            return np.tile(hrates, (S, 1, 1))
 
-        # Add one since bounds are inclusive.
-        span = ito - ifrm + 1
+        Nk = len(self.means)
+        if rngs is None:
+            rng = np.random if self._rng is None else self._rng
+            z = rng.standard_normal((S, N, Nk))
+        else:
+            if len(rngs) != S:
+                raise ValueError(f"Number of generators {len(rngs)} does not match {S} series.")
+            z = np.stack([rng.standard_normal((N, Nk)) for rng in rngs])
 
-        # Assign 4 values at the time.
-        for n in range(N):
-            rateSeries[n][:] = self._rateMethod((ifrm + (n % span)))[:]
+        return self.means + z @ self._covarFactor().T
 
-        return rateSeries
+    def _covarFactor(self):
+        """
+        Return a matrix L such that L L^T is the covariance matrix.
+        Cholesky factorization is used unless matrix is only semi-definite.
+        """
+        try:
+            return np.linalg.cholesky(self.covar)
+        except np.linalg.LinAlgError:
+            w, v = np.linalg.eigh(self.covar)
+            return v * np.sqrt(np.maximum(w, 0))
 
     def _fixedRates(self, n):
         """
@@ -339,10 +393,7 @@ class Rates(object):
         of stock, Corporate Baa bonds, Treasury notes, and inflation,
         respectively.
         """
-        hrates = np.array([SP500[n], BondsBaa[n], TNotes[n], Inflation[n]])
-
-        # Convert from percent to decimal.
-        return hrates / 100
+        return histRates[n]
 
     def _stochRates(self, n):
         """
@@ -356,6 +407,7 @@ class Rates(object):
         through multivariate analysis. Code below accounts for
         covariance between stocks, bonds, and inflation.
         """
-        srates = np.random.multivariate_normal(self.means, self.covar)
+        rng = np.random if self._rng is None else self._rng
+        srates = rng.multivariate_normal(self.means, self.covar)
 
         return srates
@@ -0,0 +1,246 @@
+"""
+
+Owl/scenarios
+---
+
+A retirement planner using linear programming optimization.
+
+Compact container for the results of multiple scenarios, such as those
+obtained from Monte Carlo simulations or from a historical range,
+and running statistics updated as scenarios complete. Quantiles are
+estimated in constant memory using the P-square algorithm of Jain and
+Chlamtac (1985), without storing the values of all scenarios.
+
+Copyright &copy; 2024 - Martin-D. Lacasse
+
+Disclaimers: This code is for educational purposes only and does not constitute financial advice.
+
+"""
+
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+
+# Values of each scenario returned by Plan.runScenarios(), in today's $.
+metricNames = ("basis", "bequest", "partial", "taxes", "conversions")
+
+
+class ScenarioResults(object):
+    """
+    Results of N scenarios stored in preallocated arrays indexed by scenario.
+    Scenarios that were not solved keep their status and NaN values,
+    so that they remain addressable by index.
+    """
+
+    # Order of values returned for each scenario.
+    fields = ("status", "iterations", "solveTime", "partial", "basis", "bequest")
+
+    def __init__(self, N, objective, labels=None):
+        self.N = N
+        self.objective = objective
+        self.labels = np.arange(N) if labels is None else np.asarray(labels)
+        if len(self.labels) != N:
+            raise ValueError(f"Number of labels {len(self.labels)} does not match {N} scenarios.")
+        self.status = np.full(N, "unsolved", dtype="<U12")
+        self.iterations = np.zeros(N, dtype=np.int32)
+        self.solveTime = np.full(N, np.nan)
+        self.partial = np.full(N, np.nan)
+        self.basis = np.full(N, np.nan)
+        self.bequest = np.full(N, np.nan)
+        self.count = 0
+
+    def record(self, n, values):
+        """
+        Record values of scenario ``n`` given in the order of ``fields``.
+        """
+        for field, value in zip(self.fields, values, strict=True):
+            getattr(self, field)[n] = value
+        self.count += 1
+
+    def truncate(self, n):
+        """
+        Keep only the first ``n`` scenarios, as when simulations were stopped early.
+        """
+        self.N = n
+        self.labels = self.labels[:n]
+        for field in self.fields:
+            setattr(self, field, getattr(self, field)[:n])
+
+    def solved(self):
+        """
+        Return a boolean mask of scenarios solved successfully.
+        """
+        return self.status == "solved"
+
+    def successRate(self):
+        return np.count_nonzero(self.solved()) / self.N
+
+    def dataFrame(self):
+        """
+        Return all values of all scenarios as a DataFrame indexed by label.
+        """
+        return pd.DataFrame({field: getattr(self, field) for field in self.fields},
+                            index=pd.Index(self.labels, name="scenario"))
+
+    def histogramFrame(self):
+        """
+        Return a DataFrame of the partial and final values of solved scenarios,
+        as used for histograms. Final value is the basis when maximizing
+        spending and the bequest otherwise.
+        """
+        mask = self.solved()
+        if self.objective == "maxSpending":
+            return pd.DataFrame({"partial": self.partial[mask], "maxSpending": self.basis[mask]})
+
+        return pd.DataFrame({"partial": self.partial[mask], "final": self.bequest[mask]})
+
+
+class P2Quantile(object):
+    """
+    Streaming estimate of quantile ``p`` using five markers, following the P-square algorithm.
+    Estimate is exact for the first five values.
+    """
+
+    def __init__(self, p):
+        if not 0 < p < 1:
+            raise ValueError(f"Quantile {p} must be in (0, 1).")
+        self.p = p
+        self.n = 0
+        self._q = []
+        self._pos = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self._dn = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x):
+        """
+        Add value ``x`` to the sample.
+        """
+        x = float(x)
+        self.n += 1
+        q = self._q
+        if self.n <= 5:
+            q.append(x)
+            q.sort()
+            return
+
+        pos = self._pos
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+
+        for i in range(k + 1, 5):
+            pos[i] += 1
+        for i in range(5):
+            self._desired[i] += self._dn[i]
+
+        # Adjust heights of the three middle markers if they are off their desired positions.
+        for i in range(1, 4):
+            d = self._desired[i] - pos[i]
+            if (d >= 1 and pos[i + 1] - pos[i] > 1) or (d <= -1 and pos[i - 1] - pos[i] < -1):
+                d = 1 if d > 0 else -1
+                qp = q[i] + d / (pos[i + 1] - pos[i - 1]) * (
+                    (pos[i] - pos[i - 1] + d) * (q[i + 1] - q[i]) / (pos[i + 1] - pos[i])
+                    + (pos[i + 1] - pos[i] - d) * (q[i] - q[i - 1]) / (pos[i] - pos[i - 1]))
+                if not q[i - 1] < qp < q[i + 1]:
+                    qp = q[i] + d * (q[i + d] - q[i]) / (pos[i + d] - pos[i])
+                q[i] = qp
+                pos[i] += d
+
+    def value(self):
+        """
+        Return current estimate of the quantile, or NaN if no value was added.
+        """
+        if self.n == 0:
+            return np.nan
+        if self.n <= 5:
+            return float(np.quantile(self._q, self.p))
+
+        return self._q[2]
+
+
+class RunningStats(object):
+    """
+    Statistics of scenarios updated as each scenario completes: success rate with its
+    confidence interval, and mean and quantiles of the partial and final values of solved scenarios.
+    Final value is the basis when maximizing spending and the bequest otherwise, in today's $.
+    """
+
+    def __init__(self, objective, quantiles=(0.1, 0.25, 0.5, 0.75, 0.9)):
+        self.objective = objective
+        self.quantiles = tuple(quantiles)
+        self.count = 0
+        self.successes = 0
+        self._sums = {"partial": 0.0, "final": 0.0}
+        self._sketches = {field: [P2Quantile(p) for p in self.quantiles] for field in self._sums}
+
+    def add(self, values):
+        """
+        Add scenario with ``values`` given in the order of ScenarioResults.fields.
+        """
+        record = dict(zip(ScenarioResults.fields, values, strict=True))
+        self.count += 1
+        if record["status"] != "solved":
+            return
+
+        self.successes += 1
+        final = record["basis"] if self.objective == "maxSpending" else record["bequest"]
+        for field, value in (("partial", record["partial"]), ("final", final)):
+            self._sums[field] += value
+            for sketch in self._sketches[field]:
+                sketch.add(value)
+
+    def successRate(self):
+        return self.successes / self.count if self.count > 0 else np.nan
+
+    def successInterval(self, confidence=0.95):
+        """
+        Return Wilson score interval on the success rate at level ``confidence``.
+        """
+        if self.count == 0:
+            return 0.0, 1.0
+        n = self.count
+        p = self.successes / n
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        denom = 1 + z**2 / n
+        center = (p + z**2 / (2 * n)) / denom
+        half = z * np.sqrt(p * (1 - p) / n + z**2 / (4 * n**2)) / denom
+
+        return max(float(center - half), 0.0), min(float(center + half), 1.0)
+
+    def mean(self, field="final"):
+        return self._sums[field] / self.successes if self.successes > 0 else np.nan
+
+    def quantile(self, p, field="final"):
+        """
+        Return estimate of quantile ``p`` of ``field``, which must be one of the quantiles tracked.
+        """
+        if p not in self.quantiles:
+            raise ValueError(f"Quantile {p} is not one of {self.quantiles}.")
+
+        return self._sketches[field][self.quantiles.index(p)].value()
+
+    def median(self, field="final"):
+        return self.quantile(0.5, field)
+
+    def summary(self, confidence=0.95):
+        """
+        Return dictionary of current statistics.
+        """
+        return {
+            "count": self.count,
+            "successRate": self.successRate(),
+            "interval": self.successInterval(confidence),
+            "mean": {field: self.mean(field) for field in self._sums},
+            "quantiles": {field: {p: sketch.value()
+                                  for p, sketch in zip(self.quantiles, self._sketches[field], strict=True)}
+                          for field in self._sums},
+        }
@@ -0,0 +1,138 @@
+"""
+
+Owl/solutioncache
+---
+
+A retirement planner using linear programming optimization.
+
+Bounded cache of solutions, kept in memory and optionally on disk,
+indexed by a canonical fingerprint of all inputs relevant to the solver.
+Solving the same case again then reduces to aggregating results
+from the cached solution vector.
+
+Copyright &copy; 2024 - Martin-D. Lacasse
+
+Disclaimers: This code is for educational purposes only and does not constitute financial advice.
+
+"""
+
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SolutionCache(object):
+    """
+    Least-recently-used cache of solutions holding at most ``maxsize`` entries.
+    Each entry is a dictionary of arrays. If a ``path`` is provided, entries
+    are also stored in that directory as .npz files, so that they can be
+    shared between processes and sessions. The directory is pruned to the
+    ``maxsize`` most recently used entries.
+    """
+
+    def __init__(self, maxsize=64, path=None):
+        if maxsize < 1:
+            raise ValueError(f"Cache size {maxsize} must be at least 1.")
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".npz")
+
+    def get(self, key):
+        """
+        Return copy of entry stored under ``key``, or None if not found.
+        Arrays are copied so that changes made by plans do not alter the cache.
+        """
+        entry = self._entries.get(key)
+        if entry is None and self.path is not None:
+            try:
+                with np.load(self._file(key)) as data:
+                    entry = {name: data[name] for name in data.files}
+                os.utime(self._file(key))
+            except (OSError, ValueError):
+                entry = None
+            if entry is not None:
+                self._remember(key, entry)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+
+        return {name: value.copy() for name, value in entry.items()}
+
+    def put(self, key, entry):
+        """
+        Store dictionary of arrays ``entry`` under ``key``.
+        """
+        entry = {name: np.array(value) for name, value in entry.items()}
+        self._remember(key, entry)
+        if self.path is not None:
+            # Write then rename for other processes to never read a partial file.
+            tmpfile = self._file(key) + f".{os.getpid()}.tmp"
+            with open(tmpfile, "wb") as f:
+                np.savez(f, **entry)
+            os.replace(tmpfile, self._file(key))
+            self._prune()
+
+    def clear(self):
+        """
+        Remove all entries, including those stored on disk.
+        """
+        self._entries.clear()
+        if self.path is not None:
+            for file in self._files():
+                os.remove(file)
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _files(self):
+        return [os.path.join(self.path, name) for name in os.listdir(self.path) if name.endswith(".npz")]
+
+    def _prune(self):
+        files = self._files()
+        if len(files) > self.maxsize:
+            files.sort(key=os.path.getmtime)
+            for file in files[:len(files) - self.maxsize]:
+                try:
+                    os.remove(file)
+                except OSError:
+                    pass
+
+
+# Cache shared by all plans of a process, stored on disk if OWL_SOLUTION_CACHE names a directory.
+_cache = SolutionCache(path=os.environ.get("OWL_SOLUTION_CACHE"))
+
+
+def getCache():
+    """
+    Return the cache shared by all plans.
+    """
+    return _cache
+
+
+def setCache(maxsize=64, path=None):
+    """
+    Replace the cache shared by all plans with an empty cache of ``maxsize`` entries,
+    also stored in directory ``path`` if provided.
+    """
+    global _cache
+    _cache = SolutionCache(maxsize, path)
+
+    return _cache
@@ -0,0 +1,96 @@
+"""
+
+Owl/solvestats
+---
+
+A retirement planner using linear programming optimization.
+
+Instrumentation of solves: wall time spent in each phase of a solve,
+such as adjusting parameters, building each family of constraints,
+exporting matrices to the solver, or running the solver itself,
+together with counters describing the problem and the work done.
+Statistics of many solves, as in Monte Carlo simulations or
+historical ranges, are merged into a single set of statistics.
+
+Copyright &copy; 2024 - Martin-D. Lacasse
+
+Disclaimers: This code is for educational purposes only and does not constitute financial advice.
+
+"""
+
+import time
+from contextlib import contextmanager
+
+
+class SolveStats(object):
+    """
+    Timings and counters accumulated over one or more solves.
+    Timings are wall times in seconds, indexed by phase, with the number
+    of times each phase was entered. Counters are indexed by name.
+    Counters describing the size of the problem are kept as their maximum
+    when statistics are merged, while all others are added.
+    """
+
+    sizeCounters = ("variables", "binaries", "rows", "nonzeros")
+
+    def __init__(self):
+        self.timings = {}
+        self.calls = {}
+        self.counters = {}
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Context manager adding the time spent in its block to phase ``name``.
+        """
+        t0 = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - t0
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name, value=1):
+        """
+        Add ``value`` to counter ``name``.
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def setSize(self, **sizes):
+        """
+        Record counters describing the size of the problem, such as rows=1000.
+        """
+        for name, value in sizes.items():
+            self.counters[name] = int(value)
+
+    def merge(self, other):
+        """
+        Add statistics ``other``, given as a SolveStats or as a dictionary returned by asDict().
+        """
+        if isinstance(other, SolveStats):
+            other = other.asDict()
+        for name, value in other["timings"].items():
+            self.timings[name] = self.timings.get(name, 0.0) + value
+        for name, value in other["calls"].items():
+            self.calls[name] = self.calls.get(name, 0) + value
+        for name, value in other["counters"].items():
+            if name in self.sizeCounters:
+                self.counters[name] = max(self.counters.get(name, 0), value)
+            else:
+                self.counters[name] = self.counters.get(name, 0) + value
+
+        return self
+
+    def asDict(self):
+        """
+        Return statistics as a dictionary of dictionaries with keys "timings", "calls", and "counters".
+        """
+        return {"timings": dict(self.timings), "calls": dict(self.calls), "counters": dict(self.counters)}
+
+    def __str__(self):
+        # Phases can be nested, so that their times do not add up.
+        lines = [f"{name:>38s}: {value:9.4f}s in {self.calls[name]} calls"
+                 for name, value in sorted(self.timings.items(), key=lambda item: -item[1])]
+        lines.extend(f"{name:>38s}: {value}" for name, value in self.counters.items())
+
+        return "\n".join(lines)
@@ -97,90 +97,159 @@ bonusThreshold = np.array([75000, 150000])
 # End of section where rates need to be actualized every year.
 ###############################################################################
 
+# Width of each tax bracket, from bottom to top.
+deltaBrackets_OBBBA = np.diff(taxBrackets_OBBBA, axis=1, prepend=0).astype(float)
+deltaBrackets_preTCJA = np.diff(taxBrackets_preTCJA, axis=1, prepend=0).astype(float)
 
-def mediVals(yobs, horizons, gamma_n, Nn, Nq):
+# Cumulative Medicare part B fees for each IRMAA bracket.
+irmaaCumFees = np.cumsum(irmaaFees)
+
+# Long-term capital gains tax rates for each bracket.
+capGainTaxRates = np.array([0, 0.15, 0.20])
+
+
+def _filingStatus(Ni, nd, Nn):
     """
-    Return tuple (nm, L, C) of year index when Medicare starts and vectors L, and C
-    defining end points of constant piecewise linear functions representing IRMAA fees.
+    Return array of filing status over the plan, 1 for married filing jointly
+    until the index year ``nd`` of the first passing, 0 for single thereafter.
+    """
+    return (Ni - 1) - (np.arange(Nn) >= nd)
+
+
+def _bracketIndex(values, brackets):
+    """
+    Return the number of brackets exceeded by ``values``, i.e., the
+    position given by ``np.searchsorted(brackets, values, side='left')``,
+    but row by row for inflation-scaled brackets of shape (..., Nn, Nb).
+    """
+    return np.count_nonzero(values[..., np.newaxis] > brackets, axis=-1)
+
+
+def taxTimelines(yobs, i_d, n_d, N_n, yOBBBA=2099):
+    """
+    Return dictionary of tax tables over the time span of the plan.
+    These do not depend on rates and can be reused across scenarios.
     """
     thisyear = date.today().year
-    assert Nq == len(irmaaFees), f"Inconsistent value of Nq: {Nq}."
-    assert Nq == len(irmaaBrackets[0]), "Inconsistent IRMAA brackets array."
-    Ni = len(yobs)
+    n = np.arange(N_n)
+    status = _filingStatus(len(yobs), n_d, N_n)
+    obbba = thisyear + n < yOBBBA
+
+    # Individuals entitled to the 65+ additional exemption.
+    senior_in = np.zeros((len(yobs), N_n), dtype=bool)
+    for i in range(len(yobs)):
+        alive = n < n_d if i == i_d else n >= 0
+        senior_in[i] = alive & (thisyear + n - yobs[i] >= 65)
+
+    return {
+        "status_n": status,
+        "stdDeduction_n": np.where(obbba, stdDeduction_OBBBA[status], stdDeduction_preTCJA[status]),
+        "extra65_n": extra65Deduction[status],
+        "senior_in": senior_in,
+        "bonus_in": senior_in & (thisyear + n <= 2028),
+        "bonusThreshold_n": bonusThreshold[status],
+        # Use transpose for easy slicing.
+        "theta_tn": np.where(obbba, rates_OBBBA[:, np.newaxis], rates_preTCJA[:, np.newaxis]),
+        "Delta_tn": np.where(obbba, deltaBrackets_OBBBA[status].T, deltaBrackets_preTCJA[status].T),
+        "capGainBrackets_nk": capGainRates[status],
+        "niitThreshold_n": niitThreshold[status],
+    }
+
+
+def medicareTimelines(yobs, horizons, N_n):
+    """
+    Return dictionary of Medicare tables over the time span of the plan.
+    These do not depend on rates and can be reused across scenarios.
+    """
+    thisyear = date.today().year
+    n = np.arange(N_n)
+
     # What index year will Medicare start? 65 - age.
     nm = 65 - (thisyear - yobs)
     nm = np.min(nm)
     # Has it already started?
     nm = max(0, nm)
-    Nmed = Nn - nm
 
-    L = np.zeros((Nmed, Nq-1))
-    C = np.zeros((Nmed, Nq))
+    # Number of individuals on Medicare for each year.
+    count = np.zeros(N_n, dtype=int)
+    for i in range(len(yobs)):
+        count += (thisyear + n - yobs[i] >= 65) & (n < horizons[i])
+
+    # Filing status used for IRMAA brackets.
+    if len(horizons) == 1:
+        status = np.zeros(N_n, dtype=int)
+    else:
+        status = ((n < horizons[0]) & (n < horizons[1])).astype(int)
+
+    return {"nm": nm, "medicareCount_n": count, "irmaaBrackets_nq": irmaaBrackets[status, 1:]}
+
+
+def mediVals(yobs, horizons, gamma_n, Nn, Nq, tables=None):
+    """
+    Return tuple (nm, L, C) of year index when Medicare starts and vectors L, and C
+    defining end points of constant piecewise linear functions representing IRMAA fees.
+    Array gamma_n can have leading dimensions for multiple scenarios,
+    in which case L and C will have the same leading dimensions.
+    Optional tables are those returned by medicareTimelines().
+    """
+    assert Nq == len(irmaaFees), f"Inconsistent value of Nq: {Nq}."
+    assert Nq == len(irmaaBrackets[0]), "Inconsistent IRMAA brackets array."
+    if tables is None:
+        tables = medicareTimelines(yobs, horizons, Nn)
 
     # Year starts at offset nm in the plan.
-    for nn in range(Nmed):
-        imed = 0
-        n = nm + nn
-        if thisyear + n - yobs[0] >= 65 and n < horizons[0]:
-            imed += 1
-        if Ni == 2 and thisyear + n - yobs[1] >= 65 and n < horizons[1]:
-            imed += 1
-        if imed:
-            status = 0 if Ni == 1 else 1 if n < horizons[0] and n < horizons[1] else 0
-            L[nn] = gamma_n[n] * irmaaBrackets[status][1:]
-            C[nn] = imed * gamma_n[n] * irmaaFees
-        else:
-            raise RuntimeError("mediVals: This should never happen.")
+    nm = tables["nm"]
+    imed = tables["medicareCount_n"][nm:]
+    if np.any(imed == 0):
+        raise RuntimeError("mediVals: This should never happen.")
+
+    gamma = np.asarray(gamma_n)[..., nm:Nn, np.newaxis]
+    L = gamma * tables["irmaaBrackets_nq"][nm:]
+    C = (imed[:, np.newaxis] * gamma) * irmaaFees
 
     return nm, L, C
 
 
-def capitalGainTaxRate(Ni, magi_n, gamma_n, nd, Nn):
+def capitalGainTaxRate(Ni, magi_n, gamma_n, nd, Nn, tables=None):
     """
     Return an array of decimal rates for capital gains.
     Parameter nd is the index year of first passing of a spouse, if applicable,
     nd == Nn for single individuals.
+    Arrays magi_n and gamma_n can have leading dimensions for multiple scenarios.
+    Optional tables are those returned by taxTimelines().
     """
-    status = Ni - 1
-    cgRate_n = np.zeros(Nn)
-
-    for n in range(Nn):
-        if status and n == nd:
-            status -= 1
+    if tables is None:
+        cgBrackets = capGainRates[_filingStatus(Ni, nd, Nn)]
+    else:
+        cgBrackets = tables["capGainBrackets_nk"]
+    gamma = np.asarray(gamma_n)[..., :Nn, np.newaxis]
 
-        if magi_n[n] > gamma_n[n] * capGainRates[status][1]:
-            cgRate_n[n] = 0.20
-        elif magi_n[n] > gamma_n[n] * capGainRates[status][0]:
-            cgRate_n[n] = 0.15
+    return capGainTaxRates[_bracketIndex(np.asarray(magi_n)[..., :Nn], gamma * cgBrackets)]
 
-    return cgRate_n
 
-
-def mediCosts(yobs, horizons, magi, prevmagi, gamma_n, Nn):
+def mediCosts(yobs, horizons, magi, prevmagi, gamma_n, Nn, tables=None):
     """
     Compute Medicare costs directly.
+    Arrays magi and gamma_n can have leading dimensions for multiple scenarios.
+    Optional tables are those returned by medicareTimelines().
     """
-    thisyear = date.today().year
-    Ni = len(yobs)
-    costs = np.zeros(Nn)
-    for n in range(Nn):
-        status = 0 if Ni == 1 else 1 if n < horizons[0] and n < horizons[1] else 0
-        for i in range(Ni):
-            if thisyear + n - yobs[i] >= 65 and n < horizons[i]:
-                # Start with the (inflation-adjusted) basic Medicare part B premium.
-                costs[n] += gamma_n[n] * irmaaFees[0]
-                if n < 2:
-                    mymagi = prevmagi[n]
-                else:
-                    mymagi = magi[n - 2]
-                for q in range(1, 6):
-                    if mymagi > gamma_n[n] * irmaaBrackets[status][q]:
-                        costs[n] += gamma_n[n] * irmaaFees[q]
-
-    return costs
-
-
-def taxParams(yobs, i_d, n_d, N_n, gamma_n, MAGI_n, yOBBBA=2099):
+    if tables is None:
+        tables = medicareTimelines(yobs, horizons, Nn)
+    magi = np.asarray(magi)
+    gamma = np.asarray(gamma_n)[..., :Nn]
+
+    # MAGI from two years before sets the IRMAA bracket.
+    prev = np.broadcast_to(np.asarray(prevmagi, dtype=float)[:min(2, Nn)], magi.shape[:-1] + (min(2, Nn),))
+    mymagi = np.concatenate([prev, magi[..., :Nn - 2]], axis=-1)
+
+    # Cumulative fees start with the basic Medicare part B premium.
+    q = _bracketIndex(mymagi, gamma[..., np.newaxis] * tables["irmaaBrackets_nq"])
+    fees = irmaaCumFees[q]
+
+    return tables["medicareCount_n"] * (gamma * fees)
+
+
+def taxParams(yobs, i_d, n_d, N_n, gamma_n, MAGI_n, yOBBBA=2099, tables=None):
     """
     Input is year of birth, index of shortest-lived individual,
     lifespan of shortest-lived individual, total number of years
@@ -192,55 +261,26 @@ def taxParams(yobs, i_d, n_d, N_n, gamma_n, MAGI_n, yOBBBA=2099):
     3) Delta from top to bottom of tax brackets (Delta_tn)
     This is pure speculation on future values.
     Returned values are not indexed for inflation.
+    Arrays gamma_n and MAGI_n can have leading dimensions for multiple scenarios,
+    which are then carried by sigmaBar only.
+    Optional tables are those returned by taxTimelines().
     """
-    # Compute the deltas in-place between brackets, starting from the end.
-    deltaBrackets_OBBBA = np.array(taxBrackets_OBBBA)
-    deltaBrackets_preTCJA = np.array(taxBrackets_preTCJA)
-    for t in range(6, 0, -1):
-        for i in range(2):
-            deltaBrackets_OBBBA[i, t] -= deltaBrackets_OBBBA[i, t - 1]
-            deltaBrackets_preTCJA[i, t] -= deltaBrackets_preTCJA[i, t - 1]
-
-    # Prepare the 3 arrays to return - use transpose for easy slicing.
-    sigmaBar = np.zeros((N_n))
-    Delta = np.zeros((N_n, 7))
-    theta = np.zeros((N_n, 7))
-
-    filingStatus = len(yobs) - 1
-    souls = list(range(len(yobs)))
-    thisyear = date.today().year
+    if tables is None:
+        tables = taxTimelines(yobs, i_d, n_d, N_n, yOBBBA)
+    gamma = np.asarray(gamma_n)[..., :N_n]
+    MAGI = np.asarray(MAGI_n)[..., :N_n]
 
-    for n in range(N_n):
-        # First check if shortest-lived individual is still with us.
-        if n == n_d:
-            souls.remove(i_d)
-            filingStatus -= 1
-
-        if thisyear + n < yOBBBA:
-            sigmaBar[n] = stdDeduction_OBBBA[filingStatus] * gamma_n[n]
-            Delta[n, :] = deltaBrackets_OBBBA[filingStatus, :]
-        else:
-            sigmaBar[n] = stdDeduction_preTCJA[filingStatus] * gamma_n[n]
-            Delta[n, :] = deltaBrackets_preTCJA[filingStatus, :]
-
-        # Add 65+ additional exemption(s) and "bonus" phasing out.
-        for i in souls:
-            if thisyear + n - yobs[i] >= 65:
-                sigmaBar[n] += extra65Deduction[filingStatus] * gamma_n[n]
-                if thisyear + n <= 2028:
-                    sigmaBar[n] += 6000 * max(0, 1 - 0.06*max(0, MAGI_n[n] - bonusThreshold[filingStatus]))
-
-        # Fill in future tax rates for year n.
-        if thisyear + n < yOBBBA:
-            theta[n, :] = rates_OBBBA[:]
-        else:
-            theta[n, :] = rates_preTCJA[:]
-
-    Delta = Delta.transpose()
-    theta = theta.transpose()
+    sigmaBar = tables["stdDeduction_n"] * gamma
+
+    # Add 65+ additional exemption(s) and "bonus" phasing out.
+    extra = tables["extra65_n"] * gamma
+    bonus = 6000 * np.maximum(0, 1 - 0.06*np.maximum(0, MAGI - tables["bonusThreshold_n"]))
+    for i in range(len(yobs)):
+        sigmaBar = sigmaBar + np.where(tables["senior_in"][i], extra, 0)
+        sigmaBar = sigmaBar + np.where(tables["bonus_in"][i], bonus, 0)
 
     # Return series unadjusted for inflation, except for sigmaBar, in STD order.
-    return sigmaBar, theta, Delta
+    return sigmaBar, tables["theta_tn"], tables["Delta_tn"]
 
 
 def taxBrackets(N_i, n_d, N_n, yOBBBA=2099):
@@ -322,18 +362,13 @@ def rho_in(yobs, N_n):
     if N_i == 2 and abs(yobs[0] - yobs[1]) > 10:
         raise RuntimeError("RMD: Unsupported age difference of more than 10 years.")
 
-    rho = np.zeros((N_i, N_n))
     thisyear = date.today().year
-    for i in range(N_i):
-        agenow = thisyear - yobs[i]
-        # Account for increase of RMD age between 2023 and 2032.
-        yrmd = 70 if yobs[i] < 1949 else 72 if 1949 <= yobs[i] <= 1950 else 73 if 1951 <= yobs[i] <= 1959 else 75
-        for n in range(N_n):
-            yage = agenow + n
-
-            if yage < yrmd:
-                pass  # rho[i][n] = 0
-            else:
-                rho[i][n] = 1.0 / rmdTable[yage - 72]
+    yobs = np.asarray(yobs)
+    # Account for increase of RMD age between 2023 and 2032.
+    yrmd = np.select([yobs < 1949, yobs <= 1950, yobs <= 1959], [70, 72, 73], 75)
+    yage = (thisyear - yobs)[:, np.newaxis] + np.arange(N_n)
+    due = yage >= yrmd[:, np.newaxis]
+    rho = np.zeros((N_i, N_n))
+    rho[due] = 1.0 / np.array(rmdTable)[yage[due] - 72]
 
     return rho
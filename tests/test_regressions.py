@@ -56,6 +56,16 @@ def createPlan(ni, name, ny, topAge):
     return p
 
 
+def createCouplePlan(name, ny=12, topAge=70):
+    # Couple with some savings in all accounts, used by tests of the solver machinery.
+    p = createPlan(2, name, ny, topAge)
+    p.setAccountBalances(taxable=[100, 50], taxDeferred=[500, 200], taxFree=[50, 20])
+    p.setAllocationRatios('individual', generic=[[[60, 40, 0, 0], [70, 30, 0, 0]]] * 2)
+    p.setRates('conservative')
+
+    return p
+
+
 def test_date_1():
     inames = ['Joe', 'Jane']
     yobs = [1961, 1962]
@@ -508,6 +518,511 @@ def test_annuity3_2():
     assert p.bequest == pytest.approx(0, abs=0.5)
 
 
+def test_update_constraints():
+    p = createCouplePlan('update')
+    options = {'withMedicare': 'optimize', 'netSpending': 60, 'solver': solver, 'withSCLoop': False}
+    p.solve('maxBequest', options)
+    rng = np.random.default_rng(1)
+    p.psi_n = rng.choice([0, 0.15, 0.2], p.N_n)
+    p.J_n = 100 * rng.random(p.N_n)
+    p.M_n = 1000 * rng.random(p.N_n)
+    p.MAGI_n = 3e5 * rng.random(p.N_n)
+    p._updateConstraints('maxBequest', options)
+    A1, B1 = p.A, p.B
+    p._buildConstraints('maxBequest', options)
+    Alu1, lb1, ub1 = A1.sparse()
+    Alu2, lb2, ub2 = p.A.sparse()
+    assert np.array_equal(Alu1.toarray(), Alu2.toarray())
+    assert np.array_equal(lb1, lb2) and np.array_equal(ub1, ub2)
+    assert A1.keys() == p.A.keys()
+    assert np.array_equal(B1.arrays(), p.B.arrays())
+    # Problem is rebuilt when the structure of a family changes, and only then.
+    p.setAccountBalances(taxable=[100, 50], taxDeferred=[500, 0], taxFree=[50, 20])
+    p._updateConstraints('maxBequest', options, ('balances',))
+    assert p.solveStats['counters']['rebuilds'] == 1
+    assert p.A.ncons == A1.ncons - p.horizons[1]
+
+    # Other errors are not hidden by a rebuild.
+    def _add_rmd_inequalities():
+        raise RuntimeError('bug')
+
+    p._add_rmd_inequalities = _add_rmd_inequalities
+    with pytest.raises(RuntimeError, match='bug'):
+        p._updateConstraints('maxBequest', options, ('balances',))
+    assert p.solveStats['counters']['rebuilds'] == 1
+
+
+def test_changed_parameters():
+    p = createCouplePlan('changed')
+    options = {'withMedicare': 'optimize', 'netSpending': 60, 'solver': solver}
+    p.solve('maxBequest', options)
+    bequest = p.bequest
+    # Nothing changed: previous solution is reused.
+    p.solve('maxBequest', options)
+    assert p.scIterations == 0
+    assert p.bequest == bequest
+    # Only constraints depending on parameters that changed are rewritten.
+    p.setHeirsTaxRate(20)
+    p.setSocialSecurity([25, 15], [67, 70])
+    p.setSpendingProfile('smile', 70)
+    p.setAccountBalances(taxable=[120, 50], taxDeferred=[500, 200], taxFree=[50, 20])
+    prints = p._paramFingerprints('maxBequest', options)
+    changed = {group for group in prints if prints[group] != p._builtFingerprints[group]}
+    assert changed == {'heirs', 'fixedIncome', 'spending', 'balances'}
+    p._updateConstraints('maxBequest', options, changed | {'loop'})
+    A1, B1, c1 = p.A, p.B, p.c
+    p._buildConstraints('maxBequest', options)
+    assert np.array_equal(A1.sparse()[0].toarray(), p.A.sparse()[0].toarray())
+    assert np.array_equal(B1.arrays(), p.B.arrays())
+    assert np.array_equal(c1.arrays(), p.c.arrays())
+    # Warm start agrees with a solve from scratch.
+    p.solve('maxBequest', options)
+    p2 = owl.clone(p)
+    p2._builtFingerprints = p2._solvedFingerprints = None
+    p2.setSolutionCache(False)
+    p2.solve('maxBequest', options)
+    assert p.bequest == pytest.approx(p2.bequest, rel=1e-4)
+
+
+def test_convergence_controller():
+    from owlplanner import convergence
+
+    def solvePlan(**extra):
+        p = createCouplePlan('convergence')
+        p.setSolutionCache(False)
+        p.solve('maxBequest', {'withMedicare': 'optimize', 'netSpending': 60, 'solver': solver, **extra})
+        assert p.caseStatus == 'solved'
+        assert len(p.scTrace) == p.scIterations
+        return p
+
+    p = solvePlan()
+    assert [t['iteration'] for t in p.scTrace] == list(range(p.scIterations))
+    p2 = solvePlan(scDamping=0.7, scAnderson=2)
+    assert p2.bequest == pytest.approx(p.bequest, rel=1e-3)
+    p3 = solvePlan(scMaxIterations=1)
+    assert p3.scIterations <= 2
+    with pytest.raises(ValueError):
+        solvePlan(scDamping=0)
+    # Controller can also be plugged in directly.
+    controller = convergence.ConvergenceController(tolerance=1)
+    p4 = createPlan(1, 'plugged', 10, 70)
+    p4.setAccountBalances(taxable=[100], taxDeferred=[500], taxFree=[50])
+    p4.setAllocationRatios('individual', generic=[[[60, 40, 0, 0], [70, 30, 0, 0]]])
+    p4.setRates('conservative')
+    p4.setConvergenceController(controller)
+    p4.solve('maxSpending', {'solver': solver})
+    assert p4.scTrace is controller.trace
+    # Changing the controller invalidates the previous solution.
+    controller = convergence.ConvergenceController(damping=0.5)
+    p4.setConvergenceController(controller)
+    p4.solve('maxSpending', {'solver': solver})
+    assert p4.scIterations > 0 and p4.scTrace is controller.trace
+
+
+def test_solve_stats():
+    p = createPlan(1, 'stats', 10, 70)
+    p.setAccountBalances(taxable=[100], taxDeferred=[500], taxFree=[50])
+    p.setAllocationRatios('individual', generic=[[[60, 40, 0, 0], [70, 30, 0, 0]]])
+    p.setRates('conservative')
+    p.setSolutionCache(False)
+    p.solve('maxSpending', {'solver': solver})
+    stats = p.solveStats
+    assert stats['calls']['solve'] == 1
+    assert stats['calls']['solver'] == p.scIterations
+    assert stats['calls']['_add_net_cash_flow'] == p.scIterations
+    assert stats['counters']['rows'] == p.A.ncons
+    assert stats['counters']['binaries'] == p.nbins
+    assert stats['counters']['iterations'] == p.scIterations
+    for phase in ['adjustParameters', 'export', 'computeNLstuff', 'aggregateResults']:
+        assert stats['timings'][phase] >= 0
+    # Statistics are aggregated over all scenarios.
+    p.runHistoricalRange('maxSpending', {'solver': solver}, 1928, 1931)
+    stats = p.solveStats
+    assert stats['counters']['solves'] == 4
+    assert stats['calls']['solve'] == 4
+    assert stats['counters']['iterations'] == np.sum(p.scenarioResults.iterations)
+
+
+def test_profiler(tmp_path, monkeypatch):
+    import pstats
+
+    p = createPlan(1, 'profiler', 10, 70)
+    p.setAccountBalances(taxable=[100], taxDeferred=[500], taxFree=[50])
+    p.setAllocationRatios('individual', generic=[[[60, 40, 0, 0], [70, 30, 0, 0]]])
+    p.setRates('conservative')
+    p.setSolutionCache(False)
+    p.setProfiler('cprofile', str(tmp_path / 'cprofile'))
+    p.solve('maxSpending', {'solver': solver})
+    files = list((tmp_path / 'cprofile').glob('profiler-solve-*.prof'))
+    assert len(files) == 1
+    stats = pstats.Stats(str(files[0]))
+    assert any(func[2] == '_scSolve' for func in stats.stats)
+    p.setProfiler('collapsed', str(tmp_path / 'collapsed'))
+    p.solve('maxBequest', {'solver': solver, 'netSpending': 50})
+    files = list((tmp_path / 'collapsed').glob('*.collapsed'))
+    assert len(files) == 1
+    assert 'Plan._scSolve' in files[0].read_text()
+    # Monte Carlo runs are profiled once, whether run through the generator or not.
+    p.setRates('stochastic', values=[6, 4, 3.3, 2.8], stdev=[17, 8, 8, 1], seed=3)
+    p.setProfiler('cprofile', str(tmp_path / 'mc'))
+
+    def consume():
+        return sum(range(10000))
+
+    for _ in p.iterMC('maxSpending', {'solver': solver, 'withSCLoop': False}, 2):
+        consume()
+    p.runMC('maxSpending', {'solver': solver, 'withSCLoop': False}, 2)
+    files = sorted(file.name.split('-')[1] for file in (tmp_path / 'mc').glob('*.prof'))
+    assert files == ['iterMC', 'runMC']
+    # Time spent by the consumer of the generator is not profiled.
+    stats = pstats.Stats(str(next((tmp_path / 'mc').glob('*-iterMC-*.prof'))))
+    names = {func[2] for func in stats.stats}
+    assert 'iterMC' in names and 'consume' not in names
+    p.setProfiler()
+    with pytest.raises(ValueError):
+        p.setProfiler('perf')
+    monkeypatch.setenv('OWL_PROFILE', f"cprofile:{tmp_path / 'env'}")
+    p2 = createPlan(1, 'environment', 10, 70)
+    assert p2._profiler.path == str(tmp_path / 'env')
+
+
+def test_solution_cache(tmp_path):
+    from owlplanner import convergence, solutioncache
+
+    def solvePlan(controller=None, inames=None, **extra):
+        p = createCouplePlan('cache')
+        if inames is not None:
+            p.inames = inames
+        p.setConvergenceController(controller)
+        p.solve('maxSpending', {'bequest': 100, 'solver': solver, **extra})
+        return p
+
+    cache = solutioncache.setCache(maxsize=2, path=str(tmp_path))
+    try:
+        p1 = solvePlan()
+        assert p1.scIterations > 0 and cache.misses == 1
+        p2 = solvePlan()
+        assert p2.scIterations == p1.scIterations and cache.hits == 1
+        assert p2.basis == p1.basis
+        assert np.array_equal(p2.b_ijn, p1.b_ijn) and np.array_equal(p2.M_n, p1.M_n)
+        # Plans solved from the cache hold the problem, for summaries and exports.
+        assert p2.summaryDic()['Number of constraints'] == str(p1.A.ncons)
+        assert p2.solveStats['counters']['rows'] == p1.A.ncons
+        p2.exportModel(str(tmp_path / 'model.mps'))
+        assert (tmp_path / 'model.mps').exists()
+        # Changes made to a solution found in the cache do not alter the cache.
+        p2.xSolution[:] = 0
+        p2.M_n[:] = -1
+        p4 = solvePlan()
+        assert cache.hits == 2 and p4.basis == p1.basis and np.array_equal(p4.M_n, p1.M_n)
+        # Entries are found on disk by another cache using the same directory.
+        cache = solutioncache.setCache(maxsize=2, path=str(tmp_path))
+        p3 = solvePlan()
+        assert cache.hits == 1 and cache.misses == 0
+        assert p3.basis == p1.basis and np.array_equal(p3.b_ijn, p1.b_ijn)
+        # Solutions reached with another controller of the loop are distinct.
+        solvePlan(convergence.ConvergenceController(damping=0.5))
+        assert cache.hits == 1 and cache.misses == 1
+        solvePlan(convergence.ConvergenceController(damping=0.5))
+        assert cache.hits == 2
+        # Individuals named in options are resolved by name.
+        solvePlan(noRothConversions='Joe')
+        assert cache.misses == 2
+        solvePlan(inames=['Jane', 'Joe'], noRothConversions='Joe')
+        assert cache.hits == 2 and cache.misses == 3
+        # Least recently used entries are evicted.
+        for key in ['a', 'b']:
+            cache.put(key, {'x': np.zeros(3)})
+        assert len(cache) == 2 and cache.get('a') is not None
+        assert len(list(tmp_path.glob('*.npz'))) == 2
+    finally:
+        solutioncache.setCache()
+
+
+def test_highs_native():
+    p = createCouplePlan('native', 20, 80)
+    p.setSocialSecurity([20, 15], [67, 67])
+    p.setRates('historical', 1970)
+    options = {'maxRothConversion': 100, 'bequest': 100}
+    p.solve('maxSpending', options={**options, 'solver': 'HiGHS'})
+    basis = p.basis
+    p.solve('maxSpending', options={**options, 'solver': 'HiGHS-native'})
+    assert p.caseStatus == 'solved'
+    assert p.basis == pytest.approx(basis, rel=1e-3)
+    model = p._highsModel
+    # Next scenario reuses the same solver instance.
+    p.setRates('historical', 1980)
+    p.solve('maxSpending', options={**options, 'solver': 'HiGHS-native'})
+    assert p.caseStatus == 'solved'
+    assert p._highsModel is model
+    q = owl.clone(p)
+    assert q._highsModel is None
+
+
+def test_clone_state():
+    p = createCouplePlan('state')
+    p.setInterpolationMethod('s-curve')
+    p.setAllocationRatios('individual', generic=[[[60, 40, 0, 0], [70, 30, 0, 0]]] * 2)
+    options = {'bequest': 100, 'solver': solver}
+    p.solve('maxSpending', options)
+    q = owl.clone(p)
+    # Solver artifacts are dropped and configuration arrays are copied.
+    assert q.caseStatus == 'modified' and q.xSolution is None
+    assert not hasattr(q, 'A') and not hasattr(q, 'b_ijkn')
+    assert q.alpha_ijkn is not p.alpha_ijkn and np.array_equal(q.alpha_ijkn, p.alpha_ijkn)
+    # Time lists are shared until replaced.
+    assert q.timeLists is not p.timeLists and q.timeLists['Joe'] is p.timeLists['Joe']
+    assert q._interpolator.__self__ is q
+    q.zeroContributions()
+    assert q.timeLists['Joe'] is not p.timeLists['Joe']
+    q.setSolutionCache(False)
+    q.solve('maxSpending', options)
+    assert q.caseStatus == 'solved'
+    assert q.basis == pytest.approx(p.basis, abs=0.5)
+
+
+def test_plan_spec():
+    import dataclasses
+    import pickle
+    from io import StringIO
+
+    p = createCouplePlan('spec')
+    p.setDescription('Plan rebuilt from a snapshot.')
+    p.setDefaultPlots('today')
+    p.setSpendingProfile('smile', 70, dip=10, delay=2)
+    p.setInterpolationMethod('s-curve')
+    p.setAllocationRatios('individual', generic=[[[60, 40, 0, 0], [70, 30, 0, 0]]] * 2)
+    options = {'bequest': 100, 'solver': solver}
+    p.solve('maxSpending', options)
+    spec = owl.PlanSpec.fromPlan(p)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        spec.nu = 0
+    assert spec.alpha_ijkn.flags.c_contiguous and not spec.alpha_ijkn.flags.writeable
+    snapshot = pickle.dumps(spec)
+    assert len(snapshot) < len(pickle.dumps(owl.plan._planState(p)))
+    q = pickle.loads(snapshot).toPlan()
+    assert q._useSolutionCache
+    q.setSolutionCache(False)
+    assert not owl.PlanSpec.fromPlan(q).toPlan()._useSolutionCache
+    q.solve('maxSpending', options)
+    assert q.caseStatus == 'solved'
+    assert q.basis == pytest.approx(p.basis, abs=0.5)
+    assert q.summaryDic() is not None
+    # Rebuilt plans can be shown, saved, and cloned like the original.
+    assert q.showNetSpending(figure=True) is not None
+    assert q.showAllocations(figure=True) is not None
+    assert q.saveConfig(StringIO()) is None
+    assert owl.config.saveConfig(q, None, q.mylog) == owl.config.saveConfig(p, None, p.mylog)
+    q2 = owl.clone(q)
+    q2.solve('maxSpending', options)
+    assert q2.basis == pytest.approx(p.basis, abs=0.5)
+
+
+def test_export_model(tmp_path):
+    from scipy import optimize
+    from owlplanner import modelio
+
+    p = createCouplePlan('export')
+    options = {'bequest': 100, 'withMedicare': 'optimize', 'solver': 'HiGHS', 'withSCLoop': False}
+    p.solve('maxSpending', options)
+    path = tmp_path / 'export.mps'
+    p.exportModel(str(path))
+    name, A, B, c = modelio.readModel(str(path))
+    assert name == 'export'
+    Alu1, lb1, ub1 = p.A.sparse()
+    Alu2, lb2, ub2 = A.sparse()
+    assert np.array_equal(Alu1.toarray(), Alu2.toarray())
+    assert np.array_equal(lb1, lb2) and np.array_equal(ub1, ub2)
+    assert A.keys() == p.A.keys()
+    assert np.array_equal(B.arrays(), p.B.arrays())
+    assert np.array_equal(B.integralityArray(), p.B.integralityArray())
+    assert np.array_equal(c.arrays(), p.c.arrays())
+    # Loaded model can be fed to a solver.
+    solution = optimize.milp(c.arrays(), integrality=B.integralityArray(), bounds=optimize.Bounds(*B.arrays()),
+                             constraints=optimize.LinearConstraint(Alu2, lb2, ub2), options={'mip_rel_gap': 1e-7})
+    assert solution.success
+    assert solution.fun == pytest.approx(np.dot(p.c.arrays(), p.xSolution), rel=1e-6)
+    # Malformed lines are reported instead of being truncated.
+    lines = path.read_text().splitlines()
+    k = lines.index('COLUMNS') + 1
+    lines[k] = lines[k].rsplit(maxsplit=1)[0]
+    path.write_text('\n'.join(lines))
+    with pytest.raises(ValueError, match='Missing value'):
+        modelio.readModel(str(path))
+    p.exportModel(str(tmp_path / 'export.lp'), fmt='lp')
+    with pytest.raises(ValueError):
+        p.exportModel(str(tmp_path / 'export.txt'), fmt='txt')
+
+
+def test_pulp_solver():
+    pytest.importorskip('pulp')
+    p = createCouplePlan('pulp')
+    options = {'bequest': 100, 'withMedicare': 'optimize', 'withSCLoop': False}
+    p.solve('maxSpending', {**options, 'solver': 'HiGHS'})
+    basis = p.basis
+    p.solve('maxSpending', {**options, 'solver': 'PuLP/CBC'})
+    assert p.caseStatus == 'solved'
+    assert p.basis == pytest.approx(basis, rel=1e-5)
+
+
+def test_MC_workers():
+    from owlplanner import solutioncache
+
+    p = createPlan(1, 'mc', 15, 85)
+    p.setAccountBalances(taxable=[100], taxDeferred=[500], taxFree=[50])
+    p.setAllocationRatios('individual', generic=[[[60, 40, 0, 0], [70, 30, 0, 0]]])
+    p.setRates('histochastic', 1970, 2000)
+    options = {'maxRothConversion': 100, 'bequest': 100, 'withSCLoop': False}
+    cache = solutioncache.setCache()
+    np.random.seed(42)
+    N, df1 = p.runMC('maxSpending', options, 4)
+    np.random.seed(42)
+    N, df2 = p.runMC('maxSpending', options, 4, workers=2)
+    assert N == 4 and len(df1) > 0
+    assert np.array_equal(df1.values, df2.values)
+    # Scenarios are kept out of the solution cache.
+    assert len(cache) == 0 and cache.hits + cache.misses == 0 and p._useSolutionCache
+
+
+def test_iterMC():
+    from owlplanner import scenarios
+
+    p = createPlan(1, 'itermc', 15, 85)
+    p.setAccountBalances(taxable=[100], taxDeferred=[500], taxFree=[50])
+    p.setAllocationRatios('individual', generic=[[[60, 40, 0, 0], [70, 30, 0, 0]]])
+    p.setRates('histochastic', 1970, 2000, seed=5)
+    options = {'maxRothConversion': 100, 'bequest': 100, 'withSCLoop': False}
+    p.runMC('maxSpending', options, 8)
+    basis = p.scenarioResults.basis.copy()
+    updates = list(p.iterMC('maxSpending', options, 8))
+    assert [n for n, values, running in updates] == list(range(8))
+    assert np.array_equal([values['basis'] for n, values, running in updates], basis)
+    running = updates[-1][2]
+    assert running.count == 8 and running.successRate() == 1
+    lo, hi = running.successInterval()
+    assert lo < 1 and hi == 1
+    assert running.quantile(0.1) <= running.median() <= running.quantile(0.9)
+    # Early stopping on the width of the confidence interval.
+    count = sum(1 for _ in p.iterMC('maxSpending', options, 50, ciWidth=0.5, minScenarios=3))
+    assert count < 50 and p.scenarioResults.N == count
+    N, df = p.showScenarioResults()
+    assert N == count
+    # Streaming quantiles.
+    sketch = scenarios.P2Quantile(0.5)
+    values = np.random.default_rng(1).normal(size=2000)
+    for value in values:
+        sketch.add(value)
+    assert sketch.value() == pytest.approx(np.median(values), abs=0.05)
+
+
+def test_Historical_workers():
+    p = createPlan(1, 'histo', 10, 85)
+    p.setAccountBalances(taxable=[100], taxDeferred=[500], taxFree=[50])
+    p.setAllocationRatios('individual', generic=[[[60, 40, 0, 0], [70, 30, 0, 0]]])
+    options = {'maxRothConversion': 100, 'bequest': 100, 'withSCLoop': False}
+    N, df1 = p.runHistoricalRange('maxSpending', options, 1960, 1963)
+    N, df2 = p.runHistoricalRange('maxSpending', options, 1960, 1963, workers=2)
+    assert N == 4 and len(df1) > 0
+    assert np.array_equal(df1.values, df2.values)
+    results = p.scenarioResults
+    assert np.array_equal(results.labels, [1960, 1961, 1962, 1963])
+    assert np.count_nonzero(results.solved()) == len(df2)
+    assert np.all(results.iterations[results.solved()] == 1)
+    assert results.dataFrame().loc[1960, 'status'] == results.status[0]
+
+
+def test_rates_seed():
+    from io import StringIO
+    p = createPlan(1, 'seed', 15, 85)
+    p.setAccountBalances(taxable=[100], taxDeferred=[500], taxFree=[50])
+    p.setAllocationRatios('individual', generic=[[[60, 40, 0, 0], [70, 30, 0, 0]]])
+    p.setRates('histochastic', 1970, 2000, seed=7)
+    tau1 = p.tau_kn
+    p.regenRates()
+    assert not np.array_equal(tau1, p.tau_kn)
+    p.setRates('histochastic', 1970, 2000, seed=7)
+    assert np.array_equal(tau1, p.tau_kn)
+
+    options = {'maxRothConversion': 100, 'bequest': 100, 'withSCLoop': False}
+    N, df1 = p.runMC('maxSpending', options, 3)
+    N, df2 = p.runMC('maxSpending', options, 3)
+    assert len(df1) > 0 and np.array_equal(df1.values, df2.values)
+    N, df3 = p.runMC('maxSpending', options, 3, seed=8)
+    assert not np.array_equal(df1.values, df3.values)
+
+    iostring = StringIO()
+    p.saveConfig(iostring)
+    p2 = owl.readConfig(iostring)
+    assert p2.rateSeed == 7
+    assert np.array_equal(p2.tau_kn, tau1)
+
+
+def test_tax_tables():
+    p = createPlan(2, 'tables', 20, 80)
+    p.setAccountBalances(taxable=[100, 100], taxDeferred=[500, 200], taxFree=[50, 50])
+    p.setAllocationRatios('individual', generic=[[[60, 40, 0, 0], [70, 30, 0, 0]]] * 2)
+    p.setRates('histochastic', 1970, 2000, seed=3)
+    options = {'maxRothConversion': 100, 'bequest': 100, 'withMedicare': 'optimize'}
+    p.solve('maxSpending', options)
+    assert p.caseStatus == 'solved'
+    tables = p._getTaxTables()
+    p.regenRates()
+    p.solve('maxSpending', options)
+    assert p._getTaxTables() is tables
+    sigma = p.sigmaBar_n
+    p._taxTables = None
+    p._adjustParameters(p.gamma_n, p.MAGI_n)
+    assert np.array_equal(sigma, p.sigmaBar_n)
+    p.setExpirationYearOBBBA(date.today().year + 3)
+    assert p._getTaxTables() is not tables
+
+
+def test_run_scenarios():
+    p = createPlan(2, 'scenarios', 15, 85)
+    p.setAccountBalances(taxable=[100, 100], taxDeferred=[500, 200], taxFree=[50, 50])
+    p.setAllocationRatios('individual', generic=[[[60, 40, 0, 0], [70, 30, 0, 0]]] * 2)
+    p.setBeneficiaryFractions([0.5, 0.5, 1])
+    p.setRates('histochastic', 1970, 2000, seed=5)
+    options = {'maxRothConversion': 100, 'bequest': 100}
+    p.solve('maxSpending', options)
+    tau_skn, gamma_sn = p._genRateSeriesBatch(3, [np.random.default_rng(s) for s in range(3)])
+    metrics = p.runScenarios(tau_skn)
+    assert metrics.shape == (3, 5)
+    assert p.caseStatus == 'modified'
+    for s in range(3):
+        p._setRateSeries(tau_skn[s], gamma_sn[s])
+        p.solve('maxSpending', options)
+        taxes = np.sum((p.T_n + p.U_n + p.J_n) / p.gamma_n[:-1])
+        conversions = np.sum(np.sum(p.x_in, axis=0) / p.gamma_n[:-1])
+        expected = [p.basis, p.bequest, p.partialBequest, taxes, conversions]
+        assert np.allclose(metrics[s], expected, rtol=1e-9, atol=1e-6)
+
+
+def test_metrics_level():
+    p = createPlan(2, 'metrics', 15, 85)
+    p.setAccountBalances(taxable=[100, 100], taxDeferred=[500, 200], taxFree=[50, 50])
+    p.setAllocationRatios('individual', generic=[[[60, 40, 0, 0], [70, 30, 0, 0]]] * 2)
+    p.setRates('historical average', 1970, 2000)
+    options = {'maxRothConversion': 100, 'bequest': 100}
+    p.solve('maxSpending', options)
+    summary = p.summaryDic()
+    summary.pop('Case executed on')
+    basis, bequest, T_n = p.basis, p.bequest, p.T_n
+
+    p.solve('maxSpending', options, level='metrics')
+    assert p.caseStatus == 'solved'
+    assert p.basis == basis and p.bequest == bequest
+    assert p._resultLevel == 'metrics'
+    del p.T_n
+    summary2 = p.summaryDic()
+    summary2.pop('Case executed on')
+    assert summary2 == summary
+    assert p._resultLevel == 'full'
+    assert np.array_equal(p.T_n, T_n)
+    with pytest.raises(ValueError):
+        p.solve('maxSpending', options, level='some')
+
+
 def test_Historical1():
     name = 'historical1'
     inames = ['Joe']
@@ -9,3 +9,174 @@ def test_rounding():
     number = -1500000.
     number = u.roundCents(number)
     assert number == number
+
+
+def test_sparse_constraints():
+    import numpy as np
+    from owlplanner import abcapi as abc
+
+    A = abc.ConstraintMatrix(5, nnz=2)
+    A.addNewRow({0: 1, 3: -2.5}, 0, np.inf)
+    A.addNewRow({1: 4, 2: 1, 4: 0}, -np.inf, 7)
+    A.addNewRow({4: 3}, 1, 1)
+    Alu, lb, ub = A.sparse()
+    assert Alu.shape == (3, 5)
+    assert Alu.nnz == 5
+    assert np.array_equal(Alu.toarray(), [[1, 0, 0, -2.5, 0], [0, 4, 1, 0, 0], [0, 0, 0, 0, 3]])
+    assert np.array_equal(lb, [0, -np.inf, 1])
+    assert np.array_equal(ub, [np.inf, 7, 1])
+    assert A.keys() == ["lo", "up", "fx"]
+    irow, icol, val, _, _ = A.triplets()
+    assert len(irow) == len(icol) == len(val) == 6
+
+
+def test_block_constraints():
+    import numpy as np
+    from owlplanner import abcapi as abc
+
+    A = abc.ConstraintMatrix(4)
+    A.addRows([[0, 1], [2, -1], [3, 0]], [[1, 2], [3, 99], [4, 5]], [0, -np.inf, 1], [np.inf, 0, 1])
+    Alu, lb, ub = A.sparse()
+    assert np.array_equal(Alu.toarray(), [[1, 2, 0, 0], [0, 0, 3, 0], [5, 0, 0, 4]])
+    assert A.keys() == ["lo", "up", "fx"]
+
+    B = abc.Bounds(4, 1)
+    B.setRanges([0, 1, 2], 0, [1, 2, 3])
+    B.setRange(1, 5, 5)
+    lb, ub = B.arrays()
+    assert np.array_equal(lb, [0, 5, 0, 0])
+    assert np.array_equal(ub, [1, 5, 3, 1])
+    assert B.keys() == ["ra", "fx", "ra", "ra"]
+    assert B.integralityList() == [3]
+
+
+def test_rewind_blocks():
+    import numpy as np
+    import pytest
+    from owlplanner import abcapi as abc
+
+    A = abc.ConstraintMatrix(4)
+    B = abc.Bounds(4, 0)
+    A.beginBlock("first")
+    B.beginBlock("first")
+    A.addRows([[0, 1], [2, 3]], [[1, 2], [3, 4]], 0, 1)
+    B.setRanges([0, 1], 0, 10)
+    A.endBlock()
+    B.endBlock()
+    A.addNewRow({3: 7}, 1, np.inf)
+
+    A.rewind("first")
+    B.rewind("first")
+    A.addRows([[0, 1], [2, 3]], [[5, 6], [7, 8]], [0, 2], 2)
+    B.setRanges([0, 1], 1, 20)
+    A.restore()
+    B.restore()
+
+    Alu, lb, ub = A.sparse()
+    assert np.array_equal(Alu.toarray(), [[5, 6, 0, 0], [0, 0, 7, 8], [0, 0, 0, 7]])
+    assert np.array_equal(lb, [0, 2, 1]) and np.array_equal(ub, [2, 2, np.inf])
+    assert A.keys() == ["ra", "fx", "lo"]
+    assert np.array_equal(B.arrays()[0], [1, 1, 0, 0])
+
+    A.rewind("first")
+    with pytest.raises(abc.BlockShapeError):
+        A.addRows([[0, 2], [2, 3]], [[5, 6], [7, 8]], 0, 2)
+
+
+def test_scenario_results():
+    import numpy as np
+    from owlplanner.scenarios import ScenarioResults
+
+    res = ScenarioResults(3, 'maxBequest', labels=[2000, 2001, 2002])
+    res.record(0, ('solved', 4, 1.5, 10., 100., 1000.))
+    res.record(2, ('unsuccessful', 60, 2.5, np.nan, np.nan, np.nan))
+    assert res.count == 2
+    assert list(res.status) == ['solved', 'unsolved', 'unsuccessful']
+    assert res.successRate() == 1/3
+    df = res.histogramFrame()
+    assert list(df.columns) == ['partial', 'final']
+    assert df.values.tolist() == [[10., 1000.]]
+    full = res.dataFrame()
+    assert full.loc[2002, 'iterations'] == 60
+    assert np.isnan(full.loc[2001, 'basis'])
+
+
+def test_rates_batch():
+    import numpy as np
+    from owlplanner import rates
+    from owlplanner.plan import _genGamma_n
+
+    r = rates.Rates()
+    r.setMethod('historical', 1970, 1975)
+    batch = r.genSeriesBatch(10, 3)
+    assert batch.shape == (3, 10, 4)
+    # Year 7 wraps around to 1971.
+    year = 1971 - rates.FROM
+    expected = np.array([rates.SP500[year], rates.BondsBaa[year], rates.TNotes[year], rates.Inflation[year]])
+    assert np.allclose(batch[0, 7], expected / 100)
+    assert np.array_equal(batch[2], r.genSeries(10))
+
+    r.setMethod('histochastic', 1950, 2000)
+    batch = r.genSeriesBatch(5, 20000)
+    assert np.allclose(batch.reshape(-1, 4).mean(axis=0), r.means, atol=2e-3)
+    assert np.allclose(np.cov(batch.reshape(-1, 4).T), r.covar, atol=5e-4)
+
+    rngs = [np.random.default_rng(s) for s in range(3)]
+    batch = r.genSeriesBatch(5, 3, rngs)
+    assert np.array_equal(batch[1], r.genSeriesBatch(5, 1, [np.random.default_rng(1)])[0])
+
+    assert rates.histRates.flags['C_CONTIGUOUS'] and rates.histRates.dtype == np.float64
+    means, stdev, corr, covar = rates.getRatesDistributions(1950, 2000)
+    # Statistics are computed in percent, to the last bit.
+    data = rates.df[["S&P 500", "Bonds Baa", "TNotes", "Inflation"]][22:73]
+    assert np.array_equal(means, np.array(data.mean()) / 100)
+    assert np.array_equal(stdev, np.array(data.std()) / 100)
+    assert np.array_equal(covar, np.array(data.cov()) / 10000)
+    rmeans, rstdev = rates.getRollingStats(20, 1950, 2000)
+    assert rmeans.shape == (32, 4)
+    assert np.allclose(rmeans[3], rates.histRates[1953 - rates.FROM:1973 - rates.FROM].mean(axis=0))
+    assert np.allclose(rstdev[0], rates.histRates[1950 - rates.FROM:1970 - rates.FROM].std(axis=0, ddof=1))
+
+    tau = batch.transpose(0, 2, 1)
+    gamma = _genGamma_n(tau)
+    assert gamma.shape == (3, 6)
+    assert np.allclose(gamma[2], _genGamma_n(tau[2]))
+    assert np.isclose(gamma[0, -1], np.prod(1 + tau[0, -1]))
+
+
+def test_tax_batch():
+    import numpy as np
+    from datetime import date
+    from owlplanner import tax2025 as tx
+
+    thisyear = date.today().year
+    yobs = np.array([thisyear - 63, thisyear - 60])
+    horizons = [25, 30]
+    Nn = 30
+    gamma = np.stack([np.cumprod(np.full(Nn + 1, 1.02)), np.cumprod(np.full(Nn + 1, 1.04))])
+    magi = np.stack([np.linspace(5e4, 8e5, Nn), np.linspace(8e5, 5e4, Nn)])
+
+    sigma, theta, Delta = tx.taxParams(yobs, 0, 25, Nn, gamma, magi)
+    assert sigma.shape == (2, Nn) and theta.shape == (7, Nn) and Delta.shape == (7, Nn)
+    assert np.array_equal(sigma[1], tx.taxParams(yobs, 0, 25, Nn, gamma[1], magi[1])[0])
+    assert np.array_equal(Delta[:, 0], tx.deltaBrackets_OBBBA[1])
+    assert np.array_equal(Delta[:, -1], tx.deltaBrackets_OBBBA[0])
+
+    cg = tx.capitalGainTaxRate(2, magi, gamma[:, :-1], 25, Nn)
+    assert cg.shape == (2, Nn)
+    assert cg[0, 0] == 0 and cg[0, -1] == 0.15
+    assert np.array_equal(cg[1], tx.capitalGainTaxRate(2, magi[1], gamma[1, :-1], 25, Nn))
+
+    costs = tx.mediCosts(yobs, horizons, magi, [1e5, 1e5], gamma[:, :-1], Nn)
+    assert costs.shape == (2, Nn)
+    assert np.all(costs[:, :2] == 0)
+    assert np.isclose(costs[0, 2], gamma[0, 2] * tx.irmaaFees[0])
+    assert np.array_equal(costs[1], tx.mediCosts(yobs, horizons, magi[1], [1e5, 1e5], gamma[1, :-1], Nn))
+
+    nm, L, C = tx.mediVals(yobs, horizons, gamma, Nn, 6)
+    assert nm == 2 and L.shape == (2, Nn - 2, 5) and C.shape == (2, Nn - 2, 6)
+
+    rho = tx.rho_in(yobs, Nn)
+    assert rho.shape == (2, Nn)
+    # RMDs start at 75 for those born after 1959.
+    assert np.all(rho[0, :12] == 0) and rho[0, 12] == 1 / 24.6
@@ -439,6 +439,9 @@ In general, CBC tends to be slower, partly because of the algorithm,
 and partly because it solves the problem through a model description saved in
 a temporary file requiring I/O.
 In most cases, selecting `HiGHS` will provide great results in the shortest time.
+`HiGHS-native` uses the same solver through its own interface, keeping the model
+between successive solves and starting from the previous solution,
+which can shorten Monte Carlo and historical range runs.
 
 The time profile modulating the net spending amount
 can be selected to either be `flat` or follow a `smile` shape.
@@ -13,6 +13,7 @@ else:
     kz.initCaseKey("hyto", owb.TO)
     kz.initCaseKey("histoPlot", None)
     kz.initCaseKey("histoSummary", None)
+    kz.initCaseKey("workers", 1)
 
     st.write(
         "Generate a histogram of results obtained from backtesting "
@@ -41,6 +42,10 @@ else:
             key=kz.genCaseKey("hyto"),
         )
 
+    with col3:
+        helpmsg = "Number of processes solving years in parallel."
+        kz.getIntNum("Worker processes", "workers", min_value=1, max_value=owb.maxWorkers(), help=helpmsg)
+
     # st.divider()
     # col1, col2 = st.columns(2, gap="small", vertical_alignment="top")
     with col4:
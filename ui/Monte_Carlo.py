@@ -19,8 +19,22 @@ else:
         with col1:
             kz.initCaseKey("MC_cases", 100)
             kz.getIntNum("Number of random instances", "MC_cases", step=10, max_value=10000)
+        with col2:
+            kz.initCaseKey("workers", 1)
+            helpmsg = "Number of processes solving instances in parallel."
+            kz.getIntNum("Worker processes", "workers", min_value=1, max_value=owb.maxWorkers(), help=helpmsg)
+        with col3:
+            kz.initCaseKey("MC_precision", 0.0)
+            helpmsg = ("Stop early once the 95% confidence interval on the success rate is within"
+                       " this many percentage points. Use 0 to run all instances.")
+            kz.getNum("Success rate precision (±%)", "MC_precision", step=0.5, max_value=50.0, help=helpmsg)
         with col4:
-            st.button("Run Simulation", on_click=owb.runMC, disabled=kz.caseIsNotMCReady())
+            run = st.button("Run Simulation", disabled=kz.caseIsNotMCReady())
+
+        # Running statistics are updated here as instances complete.
+        placeholder = st.empty()
+        if run:
+            owb.runMC(placeholder)
 
     st.divider()
     fig = kz.getCaseKey("monteCarloPlot")
@@ -113,7 +113,7 @@ else:
 
     st.divider()
     st.write("#### :orange[Solver]")
-    choices = ["HiGHS", "PuLP/CBC", "PuLP/HiGHS"]
+    choices = ["HiGHS", "HiGHS-native", "PuLP/CBC", "PuLP/HiGHS"]
     if owb.hasMOSEK():
         choices += ["MOSEK"]
     kz.initCaseKey("solver", choices[0])
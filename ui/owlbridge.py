@@ -4,6 +4,7 @@ from io import StringIO, BytesIO
 from functools import wraps
 from datetime import datetime, date
 import importlib
+import os
 import sys
 
 sys.path.insert(0, "./src")
@@ -21,6 +22,10 @@ def hasMOSEK():
     return spec is not None
 
 
+def maxWorkers():
+    return os.cpu_count() or 1
+
+
 def createPlan():
     name = kz.currentCaseName()
     inames = [kz.getCaseKey("iname0")]
@@ -171,11 +176,13 @@ def runHistorical(plan):
 
     hyfrm = kz.getCaseKey("hyfrm")
     hyto = kz.getCaseKey("hyto")
+    workers = kz.getCaseKey("workers")
 
     objective, options = kz.getSolveParameters()
     try:
         mybar = progress.Progress(None)
-        fig, summary = plan1.runHistoricalRange(objective, options, hyfrm, hyto, figure=True, progcall=mybar)
+        fig, summary = plan1.runHistoricalRange(objective, options, hyfrm, hyto, figure=True, progcall=mybar,
+                                                workers=workers)
         kz.storeCaseKey("histoPlot", fig)
         kz.storeCaseKey("histoSummary", summary)
     except Exception as e:
@@ -185,17 +192,47 @@ def runHistorical(plan):
         return
 
 
+def _runningSummary(running, N):
+    """
+    Return text describing running statistics of Monte Carlo simulations.
+    """
+    lo, hi = running.successInterval()
+    final = "Spending" if running.objective == "maxSpending" else "Bequest"
+    lines = [f"Completed {running.count} of {N} scenarios.",
+             f"Success rate: {100 * running.successRate():.1f}% (95% CI: {100 * lo:.1f}% - {100 * hi:.1f}%)"]
+    if running.successes > 0:
+        lines.append(f"{final} mean (today's $): ${running.mean():,.0f}")
+        for p in running.quantiles:
+            lines.append(f"{final} {100 * p:.0f}th percentile (today's $): ${running.quantile(p):,.0f}")
+
+    return "\n".join(lines)
+
+
 @_checkPlan
-def runMC(plan):
+def runMC(plan, placeholder=None):
+    """
+    Run Monte Carlo simulations, showing running statistics in ``placeholder`` as scenarios complete.
+    """
     plan1 = owl.clone(plan)
     prepareRun(plan1)
 
     N = kz.getCaseKey("MC_cases")
+    workers = kz.getCaseKey("workers")
+    precision = kz.getCaseKey("MC_precision") or 0
+    ciWidth = 2 * precision / 100 if precision > 0 else None
 
     objective, options = kz.getSolveParameters()
     try:
         mybar = progress.Progress(None)
-        fig, summary = plan1.runMC(objective, options, N, figure=True, progcall=mybar)
+        mybar.start()
+        for n, _, running in plan1.iterMC(objective, options, N, workers=workers, ciWidth=ciWidth):
+            mybar.show((n + 1) / N)
+            if placeholder is not None:
+                placeholder.code(_runningSummary(running, N), language=None)
+        mybar.finish()
+        if placeholder is not None:
+            placeholder.empty()
+        fig, summary = plan1.showScenarioResults(figure=True)
         kz.storeCaseKey("monteCarloPlot", fig)
         kz.storeCaseKey("monteCarloSummary", summary)
     except Exception as e:
@@ -240,7 +277,7 @@ def _setRates(plan):
                     st.warning(f"Using {yfrm} as starting year.")
                 yto = min(TO, yfrm + plan.N_n - 1)
                 kz.storeCaseKey("yto", yto)
-            plan.setRates(varyingType, yfrm, yto)
+            plan.setRates(varyingType, yfrm, yto, seed=kz.getCaseKey("rateSeed"))
             mean, stdev, corr, covar = owl.getRatesDistributions(yfrm, yto, plan.mylog)
             for j in range(4):
                 kz.storeCaseKey("mean" + str(j), 100 * mean[j])
@@ -260,7 +297,7 @@ def _setRates(plan):
                 stdev.append(kz.getCaseKey("stdev" + str(kk)))
             for q in range(1, 7):
                 corr.append(kz.getCaseKey("corr" + str(q)))
-            plan.setRates(varyingType, values=means, stdev=stdev, corr=corr)
+            plan.setRates(varyingType, values=means, stdev=stdev, corr=corr, seed=kz.getCaseKey("rateSeed"))
         else:
             raise RuntimeError("Logic error in setRates()")
 
@@ -747,6 +784,7 @@ def genDic(plan):
             for k2 in range(k1 + 1, plan.N_k):
                 dic["corr" + str(qq)] = plan.rateCorr[k1, k2]
                 qq += 1
+        dic["rateSeed"] = plan.rateSeed
 
     return plan._name, dic
 